@@ -81,6 +81,7 @@ sed -i 's/<replace_frontend_port>/'$project_frontend_port'/' .env.$project_name
 echo "DONE replacing the arguments in the .env.$project_name template"
 
 mkdir -p ./data/$project_name/neo4j/var/lib/neo4j/import/data/
+mkdir -p ./data/$project_name/neo4j/var/lib/neo4j/import/bulk/
 mkdir -p ./data/$project_name/neo4j/data
 touch ./data/$project_name/neo4j/var/lib/neo4j/import/data/citations.csv
 mkdir ./notebooks/$project_name
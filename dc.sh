@@ -41,6 +41,7 @@ if [ -f "$FILE" ]; then
     export GROUP_ID=$(id -g)
     ## run some preparation in case the data folder is empty or the project has never been initialized
     mkdir -p ./data/${COMPOSE_PROJECT_NAME}/neo4j/var/lib/neo4j/import/data/
+    mkdir -p ./data/${COMPOSE_PROJECT_NAME}/neo4j/var/lib/neo4j/import/bulk/
     touch ./data/$project_name/neo4j/var/lib/neo4j/import/data/citations.csv
     ADD_DOCKER_COMPOSE_YML=""
     if [ $PROJECT_JUPYTER_PORT -gt 0 ]; then
@@ -13,6 +13,8 @@ from flask_cors import CORS
 from flask_restplus import Api, Resource
 from flask_restplus import reqparse, inputs
 from helper.neo4j_helper import Neo4j_Manager
+from helper.api_cache import Api_Cache
+from helper.mention_matrix import Mention_Matrix
 
 ## setup the logger to print to stdout and to the file
 log_path = "/output"
@@ -50,6 +52,13 @@ app = Api(app = flask_app,
 		  description = "interact with the neo4j knowledge graph")
 name_space = app.namespace('api', description="Main APIs")
 
+## labels, properties and operators of the requests are checked by the
+# Neo4j_Manager before they are used in a query (ValueError if invalid)
+@app.errorhandler(ValueError)
+def handle_value_error(error):
+    return {'message': str(error), 'status': "Could not retrieve result",
+            'statusCode': "400"}, 400
+
 config_path = "/input/config.ini"
 ## general config
 config = configparser.ConfigParser()
@@ -70,6 +79,32 @@ logging.info("waiting "+ str(waittime)+" seconds before trying to connect to gra
       " on "+db_hostname)
 time.sleep(waittime)
 neo4j_manager = Neo4j_Manager(neo4j_bolt, neo4j_user, neo4j_password, logging = logging)
+## label abundance from the exported mention matrices (empty path = only
+# cypher), requests with article filters always use cypher
+mention_matrix_dir = config['RUN-settings'].get('mention_matrix_dir',
+    fallback = "/output/mention_matrix")
+mention_matrix = None
+if mention_matrix_dir != "":
+    mention_matrix = Mention_Matrix(mention_matrix_dir, logging = logging)
+## cache of the results (empty path = no caching), shared by the workers and
+# invalidated by the graph version of the manager
+api_cache_path = config['RUN-settings'].get('api_cache_path',
+    fallback = "/output/api_cache.sqlite")
+api_cache = None
+if api_cache_path != "":
+    api_cache = Api_Cache(api_cache_path,
+        max_size_bytes = int(config['RUN-settings'].get(
+            'api_cache_max_size', fallback = "536870912")),
+        get_graph_version = neo4j_manager.get_graph_version,
+        version_check_seconds = float(config['RUN-settings'].get(
+            'api_cache_version_check', fallback = "10")),
+        logging = logging)
+
+## the cached result of the request or the result of the function
+def get_cached_result(endpoint, args, function):
+    if api_cache == None:
+        return function()
+    return api_cache.get_or_compute(endpoint, args, function)
 
 ## define some argument parsers with argument definitions 
 parser_normal_search = reqparse.RequestParser()
@@ -211,7 +246,8 @@ parser_label_abundance.add_argument(
     'goal_entity_min_mentions', type=int, help="provide min mentions for goal entity", default=10, required=True)
 parser_label_abundance.add_argument(
     'sort_string', type=str, help="sort by "\
-    "(default = score)", default="score DESC", required=True)
+    "(default = score, also p_value or q_value, i.e. q_value ASC, score DESC)",
+    default="score DESC", required=True)
 parser_label_abundance.add_argument(
     'options', type=str, help="provide additional options (i.e. normalize_by_age for articles)", required=False)
 
@@ -273,12 +309,13 @@ class SearchClass(Resource):
                              status = "Could not retrieve result", 
                              statusCode = "400")
 
-        request_result = neo4j_manager.search(
+        request_result = get_cached_result("search", args,
+            lambda: neo4j_manager.search(
             entity_id = entity_id, entity_label = entity_label, 
             entity_fields = entity_fields, search_operators = search_operators,
             search_terms = search_terms, sort_by = sort_by, 
             sort_descending = sort_descending, result_limit = result_limit,
-            format = format)
+            format = format))
 
         if format == "csv":
             response = make_response(request_result, 200)
@@ -482,7 +519,8 @@ class TopNArticlesForLabelClass(Resource):
         #                     statusCode = "400")
         
         
-        request_result = neo4j_manager.get_top_n_articles_for_label(
+        request_result = get_cached_result("top_n_articles_for_label", args,
+            lambda: neo4j_manager.get_top_n_articles_for_label(
             list_filter_entity_labels_1 = list_filter_entity_labels_1,
             list_filter_entity_attributes_1 = list_filter_entity_attributes_1,
             list_filter_entity_operators_1 = list_filter_entity_operators_1,
@@ -493,7 +531,7 @@ class TopNArticlesForLabelClass(Resource):
             top_n = top_n, 
             metric_norm = norm_by_age_str, format = format,
             order_metric = order_metric, options = options
-            )
+            ))
         
         if format == "csv":
             #logging.info(request_result)
@@ -525,11 +563,13 @@ class TopN(Resource):
                              statusCode = "400")
         
         if not top_n:
-            request_result = neo4j_manager.get_top_entities(
-                concept_label=concept_label)
+            request_result = get_cached_result("top_entities", args,
+                lambda: neo4j_manager.get_top_entities(
+                concept_label=concept_label))
         else:
-            request_result = neo4j_manager.get_top_entities(
-                concept_label=concept_label, top_n = top_n)
+            request_result = get_cached_result("top_entities", args,
+                lambda: neo4j_manager.get_top_entities(
+                concept_label=concept_label, top_n = top_n))
 
         return jsonify(results = request_result)
 
@@ -693,26 +733,50 @@ class LabelAbundanceClass(Resource):
                     status = "Could not retrieve result", 
                     statusCode = "400")
 
-        request_result = neo4j_manager.get_label_abundance(
-            goal_entity_label = goal_entity_label,
-            goal_entity_attribute = goal_entity_attribute,
-            goal_entity_operator = goal_entity_operator,
-            goal_entity_value = goal_entity_value,
-            list_filter_entity_labels_1 = list_filter_entity_labels_1,
-            list_filter_entity_attributes_1 = list_filter_entity_attributes_1,
-            list_filter_entity_operators_1 = list_filter_entity_operators_1,
-            list_filter_entity_values_1 = list_filter_entity_values_1,
-            list_filter_entity_labels_2 = list_filter_entity_labels_2,
-            list_filter_entity_attributes_2 = list_filter_entity_attributes_2,
-            list_filter_entity_operators_2 = list_filter_entity_operators_2,
-            list_filter_entity_values_2 = list_filter_entity_values_2,
-            list_article_attributes = list_article_attributes,
-            list_article_operators = list_article_operators,
-            list_article_values = list_article_values,
-            goal_entity_min_mentions = goal_entity_min_mentions,
-            sort_string = sort_string,
-            options = options,
-        )
+        ## matrices first, cypher for the requests they don't support
+        def get_label_abundance_result():
+            request_result = None
+            if mention_matrix != None and options == None:
+                request_result = mention_matrix.get_label_abundance(
+                    goal_entity_label = goal_entity_label,
+                    list_filter_entity_labels_1 = list_filter_entity_labels_1,
+                    list_filter_entity_attributes_1 = list_filter_entity_attributes_1,
+                    list_filter_entity_operators_1 = list_filter_entity_operators_1,
+                    list_filter_entity_values_1 = list_filter_entity_values_1,
+                    list_filter_entity_labels_2 = list_filter_entity_labels_2,
+                    list_filter_entity_attributes_2 = list_filter_entity_attributes_2,
+                    list_filter_entity_operators_2 = list_filter_entity_operators_2,
+                    list_filter_entity_values_2 = list_filter_entity_values_2,
+                    goal_entity_attribute = goal_entity_attribute,
+                    list_article_attributes = list_article_attributes,
+                    goal_entity_min_mentions = goal_entity_min_mentions,
+                    sort_string = sort_string,
+                )
+            if request_result == None:
+                request_result = neo4j_manager.get_label_abundance(
+                    goal_entity_label = goal_entity_label,
+                    goal_entity_attribute = goal_entity_attribute,
+                    goal_entity_operator = goal_entity_operator,
+                    goal_entity_value = goal_entity_value,
+                    list_filter_entity_labels_1 = list_filter_entity_labels_1,
+                    list_filter_entity_attributes_1 = list_filter_entity_attributes_1,
+                    list_filter_entity_operators_1 = list_filter_entity_operators_1,
+                    list_filter_entity_values_1 = list_filter_entity_values_1,
+                    list_filter_entity_labels_2 = list_filter_entity_labels_2,
+                    list_filter_entity_attributes_2 = list_filter_entity_attributes_2,
+                    list_filter_entity_operators_2 = list_filter_entity_operators_2,
+                    list_filter_entity_values_2 = list_filter_entity_values_2,
+                    list_article_attributes = list_article_attributes,
+                    list_article_operators = list_article_operators,
+                    list_article_values = list_article_values,
+                    goal_entity_min_mentions = goal_entity_min_mentions,
+                    sort_string = sort_string,
+                    options = options,
+                )
+            return request_result
+
+        request_result = get_cached_result("label_abundance", args,
+            get_label_abundance_result)
 
         response = make_response(request_result, 200)
         response.mimetype = "text/plain"
@@ -15,11 +15,32 @@ import logging
 from typing import List, Set, Dict, Tuple
 from neo4j import GraphDatabase
 from xml.etree import ElementTree
-from datetime import datetime, timedelta
-
-from helper.neo4j_helper import Neo4j_Manager
+from datetime import datetime
+
+from helper.neo4j_helper import Neo4j_Manager, get_citation_rows
+from helper.neo4j_import import Neo4j_Import_Writer, run_import
+from helper.esearch_harvester import Esearch_Harvester
+from helper.integration_pipeline import Integration_Pipeline
+from helper.fetch_engine import (
+    Fetch_Engine,
+    configure_rate_limits,
+    get_rate_limiter,
+    get_session,
+)
+from helper.article_registry import Integrated_Article_Registry
+from helper.mention_matrix import export_mention_matrices
+from helper.meta_data_store import Meta_Data_Store
+from helper.mygene_cache import Mygene_Cache
+from helper.pubtator_parser import get_bioc_annotation_string, parse_pubtator_text
+from helper.reference_index import MeSH_Index, Taxonomy_Index
+from helper.run_journal import Run_Journal
+from helper.response_cache import (
+    configure_response_cache,
+    get_response_cache,
+    parse_ttl_string,
+)
+from helper.scheduler import Cadence_Schedule, File_Watcher, parse_cadence
 
-import bioc
 
 
 ## setup the logger to print to stdout and to the file
@@ -186,12 +207,21 @@ def get_list_from_csv_string(
     return new_split
 
 
-## request something followed by a delay (pubmed allows 3 requests per second)
+## request something followed by a delay (pubmed allows 3 requests per second,
+# the shared rate limiter of the respective API keeps all threads within the quota)
+## responses that are still valid in the response cache are served from disk
+# (without taking a token of the rate limiter)
 def request_with_delay(
     url: str, api_delay: float = 0.0, my_timeout: float = 20.0
 ) -> requests.Response:
+    response_cache = get_response_cache()
+    if response_cache != None:
+        cached_response = response_cache.get(url)
+        if cached_response != None:
+            return cached_response
+    get_rate_limiter(url).acquire()
     try:
-        response = requests.get(url, timeout=my_timeout)
+        response = get_session().get(url, timeout=my_timeout)
     except (
         requests.exceptions.Timeout,
         requests.exceptions.ConnectionError,
@@ -200,36 +230,28 @@ def request_with_delay(
         # raise Exception("Request takes too long")
         return None  #'Server taking too long. Try again later'
     else:
+        if response_cache != None:
+            response_cache.put(url, response)
         time.sleep(api_delay)
         return response
 
 
-def halve_time_interval(start_date_str, end_date_str):
-    # Parse the input date strings into datetime objects
-    start_date = datetime.strptime(start_date_str, "%Y/%m/%d")
-    end_date = datetime.strptime(end_date_str, "%Y/%m/%d")
-
-    # Calculate the time interval in days
-    time_interval = (end_date - start_date).days
-
-    # Calculate the midpoint by adding half of the time interval to the start date
-    midpoint = start_date + timedelta(days=time_interval // 2)
-
-    # Format the midpoint and return it along with the start date
-    midpoint_str = midpoint.strftime("%Y/%m/%d")
-
-    return midpoint_str
+## the fetch engine sends the requests of get_meta_data_records concurrently
+# (configured in run_main_loop by the RUN-settings)
+fetch_engine = Fetch_Engine(request_with_delay, max_workers=8, logging=logging)
 
 
-def update_doi_csv_by_query(search_query: str, path_doi_list: str) -> None:
+def update_doi_csv_by_query(
+    search_query: str,
+    path_doi_list: str,
+    watermark_path: str = "/output/esearch_watermarks.json",
+) -> None:
     if len(search_query) > 0:
         logging.info("running query = " + search_query)
 
-        csv_out = "DOI"
-        min_date = "1900/01/01"
-        max_date_final = max_date = "2025/12/31"
-
-        ## if retmax <= 9999, one query is enough to get all the data
+        ## if retmax <= 9999, one query is enough to get all the data: the
+        # DOI-list is replaced by the result of the query (the first retmax
+        # records, no watermark), only larger harvests are incremental
         retmax_prepare = search_query.split("retmax=")
         if len(retmax_prepare) > 0:
             retmax = int(retmax_prepare[1].split("&")[0])
@@ -247,506 +269,243 @@ def update_doi_csv_by_query(search_query: str, path_doi_list: str) -> None:
                         f = open(path_doi_list, "w")
                         f.write(csv_out)
                         f.close()
-        ## if retmax > 9999: get all entries by defining smaller bins (time intervals)
+        ## if retmax > 9999: incremental harvest of all entries, which have been
+        # added since the last harvest (watermark), new ids are appended
         else:
-            # search_query = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?db=pubmed&retmode=json&retmax=10000&term=kidney+immune&sort=relevance"
-            total_results_query = (
-                search_query + f"""&mindate={min_date}&maxdate={max_date_final}"""
+            pubmed_ids_known = get_doi_list_ids(path_doi_list)
+            esearch_harvester = Esearch_Harvester(
+                request_with_delay,
+                watermark_path,
+                logging=logging,
+                map_function=fetch_engine.map,
             )
-            result = request_with_delay(total_results_query)
-            total_results = 0
-            if result != None:
-                if result.json() != None:
-                    if "esearchresult" in result.json():
-                        if "idlist" in result.json()["esearchresult"]:
-                            total_results = int(result.json()["esearchresult"]["count"])
-                            logging.info("Total results = " + str(total_results))
-
-            if total_results > 0:
-                current_results = 0
-                while current_results < total_results:
-                    search_query_interval = (
-                        search_query + f"""&mindate={min_date}&maxdate={max_date}"""
-                    )
-                    result = request_with_delay(search_query_interval)
-                    if "esearchresult" in result.json():
-                        count_results = int(result.json()["esearchresult"]["count"])
+            ## empty DOI-list (i.e. after delete_neo4j) -> full harvest
+            pubmed_ids = esearch_harvester.harvest(
+                search_query, full=len(pubmed_ids_known) == 0
+            )
+            pubmed_ids_new = [
+                pubmed_id for pubmed_id in pubmed_ids if pubmed_id not in pubmed_ids_known
+            ]
+            logging.info("new articles found by the query: " + str(len(pubmed_ids_new)))
+            if len(pubmed_ids_new) > 0:
+                append_doi_list_ids(path_doi_list, pubmed_ids_new)
+
+
+## the pubmed ids of the DOI-list (first column)
+def get_doi_list_ids(path_doi_list: str) -> Set[str]:
+    pubmed_ids = set()
+    if os.path.isfile(path_doi_list):
+        with open(path_doi_list, "r") as read_obj:
+            for index, line in enumerate(read_obj):
+                pubmed_id = line.strip().split(",")[0]
+                if index > 0 and pubmed_id != "":
+                    pubmed_ids.add(pubmed_id)
+    return pubmed_ids
+
+
+def append_doi_list_ids(path_doi_list: str, pubmed_ids: List[str]) -> None:
+    csv_out = ""
+    if os.path.isfile(path_doi_list):
+        with open(path_doi_list, "r") as read_obj:
+            content = read_obj.read()
+        if len(content) == 0:
+            csv_out = "DOI"
+        if not content.endswith("\n"):
+            csv_out += "\n"
+    else:
+        csv_out = "DOI\n"
+    csv_out += "\n".join(pubmed_ids)
+    with open(path_doi_list, "a") as f:
+        f.write(csv_out)
+
+
+## get the meta data from the esummary result of one pubmed_id
+## meta data = title, abstract, annotations, sortpubdate, epubdate, authors,
+# journal, pmc_id (title, abstract and annotations are taken from pubtator
+# if available)
+def get_meta_data_from_esummary(
+    pubmed_id: str, esummary_entry: dict, pubtator_meta: dict, bioconcepts_list
+) -> dict:
+    meta_entry = {}
+    if pubmed_id in pubtator_meta:
+        meta_entry["title"] = pubtator_meta[pubmed_id]["title"]
+        meta_entry["abstract"] = pubtator_meta[pubmed_id]["abstract"]
+        meta_entry["annotations"] = pubtator_meta[pubmed_id]["annotations"]
+    else:
+        meta_entry["title"] = get_field_or_default_value(
+            esummary_entry,
+            "title",
+            default="NA",
+        )
+        meta_entry["abstract"] = "NA"
+        meta_entry["annotations"] = "|".join(["Null" for _ in bioconcepts_list])
 
-                        if count_results < 9999:
-                            if "idlist" in result.json()["esearchresult"]:
-                                for doi in result.json()["esearchresult"]["idlist"]:
-                                    csv_out = "\n".join([csv_out, str(doi)])
-                            current_results = len(csv_out.split("\n")) - 1
-                            logging.info(
-                                "found interval: "
-                                + min_date
-                                + " - "
-                                + max_date
-                                + " | count_results = "
-                                + str(count_results)
-                                + ", total_results = "
-                                + str(current_results)
-                            )
-                            min_date = max_date
-                            max_date = max_date_final
-                        else:
-                            ## halve the time interval
-                            max_date = halve_time_interval(min_date, max_date)
-                    else:
-                        break
-                        ## just leave the result as is
-
-                list_DOIs = ["DOI"]
-                ## remove duplicates
-                list_DOIs.extend(list(set(csv_out.split("\n")[1:])))
-                logging.info("removing duplicates and writing to csv-file")
-                final_output_str = "\n".join(list_DOIs)
-                f = open(path_doi_list, "w")
-                f.write(final_output_str)
-                f.close()
-
-
-## get meta data from a pubmed_id
-## meta data = title, epubdate, abstract
-def get_meta_data(
+    sortpubdate_raw = get_field_or_default_value(
+        esummary_entry,
+        "sortpubdate",
+        default="NA",
+    )
+    ## transform to iso format
+    sortpubdate_processed = sortpubdate_raw.split(" ")[0].replace("/", "-")
+    meta_entry["sortpubdate"] = sortpubdate_processed
+    epubdate_raw = get_field_or_default_value(
+        esummary_entry,
+        "epubdate",
+        default="NA",
+    )
+    ## epubdate and sortpubdate are well defined /
+    # structured iso formats, but the pubdate is
+    # quite arbitrary, this is why the pubdate_raw is
+    # preprocessed and parsed quite attentive finally:
+    # if all fails, we fall back to the sortpubdate
+    if epubdate_raw == "NA" or epubdate_raw == "":
+        pubdate_raw = get_field_or_default_value(
+            esummary_entry,
+            "pubdate",
+            default="NA",
+        )
+        pubdate_processed = preprocess_date(pubdate_raw)
+        try:
+            pubdate = datetime.strptime(pubdate_processed, "%Y %b %d").strftime(
+                "%Y-%m-%d"
+            )
+        except ValueError as e:
+            logging.info(pubdate_raw)
+            logging.info(pubdate_processed)
+            logging.info(e)
+            logging.info(
+                "take the sortpubdate_processed " "version: " + sortpubdate_processed
+            )
+            epubdate_raw = datetime.strptime(
+                sortpubdate_processed, "%Y-%m-%d"
+            ).strftime("%Y %b %d")
+            logging.info("resulting epubdate_raw: " + epubdate_raw)
+    epubdate_iso = (
+        pubdate
+        if (epubdate_raw == "NA" or epubdate_raw == "")
+        else datetime.strptime(epubdate_raw, "%Y %b %d").strftime("%Y-%m-%d")
+    )
+    meta_entry["epubdate"] = epubdate_iso
+    meta_entry["authors"] = get_field_or_default_value(
+        esummary_entry,
+        "authors",
+        default="NA",
+    )
+    meta_entry["journal"] = get_field_or_default_value(
+        esummary_entry,
+        "fulljournalname",
+        default="NA",
+    )
+    pmc_id = "NA"
+    if "articleids" in esummary_entry:
+        for article_id in esummary_entry["articleids"]:
+            if article_id["idtype"] == "pmc":
+                pmc_id = article_id["value"]
+    meta_entry["pmc_id"] = pmc_id
+    return meta_entry
+
+
+## get the meta data records (pubmed_id -> meta data dict) of the pubmed_ids,
+# pubmed_ids without an esummary result are missing in the returned dict
+## all requests (pubtator, esummary and the pmc full texts) are sent
+# concurrently by the fetch_engine, the rate limiters keep the requests
+# within the NCBI quotas
+def get_meta_data_records(
     pubmed_ids_all_batches: list,
     bioconcepts: str = "none",
     batch_size: int = 100,
     run_pubtator: bool = True,
-) -> pd.DataFrame:
-    title_list = []
-    abstract_list = []
-    annotations_list = []
-    sortpubdate_list = []
-    epubdate_list = []
-    authors_list = []
-    journal_list = []
-    pmc_id_list = []
-
-    ## pubtator part: retrieve title, abstract and annotations
-    pubtator_text = None
-    pubtator_meta = {}
+) -> Dict[str, dict]:
     bioconcepts_list = bioconcepts.split(",")
 
     ## define batches
+    pubmed_ids_batches = []
     for pubmed_ids_batch in batch(range(0, len(pubmed_ids_all_batches)), batch_size):
-        pubmed_ids = [str(pubmed_ids_all_batches[i]) for i in list(pubmed_ids_batch)]
-        pubmed_ids_join = ",".join([str(pubmed_id_str) for pubmed_id_str in pubmed_ids])
-
-        if run_pubtator == True:
-            pubtator_url = (
-                "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/"
-                "publications/export/pubtator?pmids=" + pubmed_ids_join + "&concepts"
-                "=" + bioconcepts
-            )
-            successful_request = False
-            count_requests = 0
-            while successful_request != True:
-                pubtator_response = request_with_delay(pubtator_url)
-                count_requests += 1
-                if count_requests > 1:
-                    logging.info("count_requests = " + str(count_requests))
-                if pubtator_response != None:
-                    pubtator_text = pubtator_response.content.decode("utf-8")
-
-                    pubtator_text_split = pubtator_text.split("\n\n")[:-1]
-                    for entry in pubtator_text_split:
-                        concept_annotation = ""
-                        annotations_all = ""
-                        entry_meta = {}
-                        for index, text in enumerate(entry.split("\n")):
-                            if index > 1:
-                                break
-                            else:
-                                if index == 0:
-                                    if len(text.split("|")) == 3:
-                                        pubmed_id_pubtator = text.split("|")[0]
-                                        title_pubtator = text.split("|")[2]
-                                    else:
-                                        logging.info("error: not the pubtator format")
-                                        logging.info(text)
-                                else:
-                                    if len(text.split("|")) == 3:
-                                        abstract_pubtator = text.split("|")[2]
-                                    else:
-                                        logging.info("error: not the pubtator format")
-                                        logging.info(text)
-                        entry_meta["title"] = title_pubtator
-                        entry_meta["abstract"] = abstract_pubtator
-
-                        for bioconcept in bioconcepts_list:
-                            annotations_pubtator = "Null"
-                            for index, text in enumerate(entry.split("\n")):
-                                if index <= 1:
-                                    ## title and abstract -> skip
-                                    pass
-
-                                else:
-                                    if len(text.split("\t")) > 3:
-                                        annotation = text.split("\t")[3]
-                                        concept = text.split("\t")[4]
-                                        ## only treat the current bioconcept
-                                        # (we need to process the concepts in
-                                        # correct order)
-                                        if concept.lower() == bioconcept.lower():
-                                            normalized_annotation = text.split("\t")[5]
-                                            concept_annotation = (
-                                                concept
-                                                + ":"
-                                                + normalized_annotation
-                                                + ";"
-                                                + annotation
-                                            )
-                                            if annotations_pubtator.endswith(
-                                                concept_annotation
-                                            ):
-                                                continue
-                                            else:
-                                                if (
-                                                    concept_annotation + ","
-                                                    in annotations_pubtator
-                                                ):
-                                                    # skip if the annotation is
-                                                    # already part of the annotation
-                                                    # (we are only interested in unique annotations)
-                                                    continue
-                                                else:
-                                                    annotations_pubtator = ",".join(
-                                                        [
-                                                            annotations_pubtator,
-                                                            concept_annotation,
-                                                        ]
-                                                    )
-                                        else:
-                                            continue
-                            ## if there is more than just "Null"
-                            if len(annotations_pubtator) > 4:
-                                annotations_pubtator = annotations_pubtator[5:]
-                            annotations_all = "|".join(
-                                [annotations_all, annotations_pubtator]
-                            )
-                        if len(annotations_all) > 0:
-                            annotations_all = annotations_all[1:]
-                        entry_meta["annotations"] = annotations_all
-                        pubtator_meta[pubmed_id_pubtator] = entry_meta
-                    successful_request = True
-                else:
-                    logging.info("Request failed: " + pubtator_url)
+        pubmed_ids_batches.append(
+            [str(pubmed_ids_all_batches[i]) for i in list(pubmed_ids_batch)]
+        )
 
-        ## eutils part: retrieve sortpubdate, epubdate, authors, journal
-        meta_url = (
+    ## pubtator part: retrieve title, abstract and annotations
+    pubtator_urls = []
+    ## eutils part: retrieve sortpubdate, epubdate, authors, journal
+    meta_urls = []
+    for pubmed_ids in pubmed_ids_batches:
+        pubmed_ids_join = ",".join(pubmed_ids)
+        pubtator_urls.append(
+            "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/"
+            "publications/export/pubtator?pmids=" + pubmed_ids_join + "&concepts"
+            "=" + bioconcepts
+        )
+        meta_urls.append(
             "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
             "?db=pubmed&id=" + pubmed_ids_join + "&retmode=json&tool=my_tool"
             "&email=my_email@example.com"
         )
-        successful_request = False
-        count_requests = 0
-        while successful_request != True:
-            r_meta = request_with_delay(meta_url)
-            count_requests += 1
-            if count_requests > 1:
-                logging.info("count_requests = " + str(count_requests))
-            if r_meta != None:
-                if "result" in r_meta.json():
-                    for pubmed_id in pubmed_ids:
-                        if pubmed_id in r_meta.json()["result"]:
-                            if pubmed_id in pubtator_meta:
-                                title_list.append(pubtator_meta[pubmed_id]["title"])
-                                abstract_list.append(
-                                    pubtator_meta[pubmed_id]["abstract"]
-                                )
-                                annotations_list.append(
-                                    pubtator_meta[pubmed_id]["annotations"]
-                                )
-                                # sortpubdate.append(pubtator_meta[pubmed_id]['sortpubdate'])
-                                # epubdate.append(pubtator_meta[pubmed_id]['epubdate'])
-                                # authors.append(pubtator_meta[pubmed_id]['authors'])
-                                # journal.append(pubtator_meta[pubmed_id]['journal'])
-                                # pmc_id.append(pubtator_meta[pubmed_id]['pmc_id'])
-                            else:
-                                title_from_eutil = get_field_or_default_value(
-                                    r_meta.json()["result"][pubmed_id],
-                                    "title",
-                                    default="NA",
-                                )
-                                title_list.append(title_from_eutil)
-                                abstract_list.append("NA")
-                                bioconcepts_list = bioconcepts.split(",")
-                                annotations_all = ""
-                                for bioconcept in bioconcepts_list:
-                                    if len(annotations_all) > 0:
-                                        annotations_all = "|".join(
-                                            [annotations_all, "Null"]
-                                        )
-                                    else:
-                                        annotations_all = "Null"
-
-                                annotations_list.append(annotations_all)
-
-                            sortpubdate_raw = get_field_or_default_value(
-                                r_meta.json()["result"][pubmed_id],
-                                "sortpubdate",
-                                default="NA",
-                            )
-                            ## transform to iso format
-                            sortpubdate_processed = sortpubdate_raw.split(" ")[
-                                0
-                            ].replace("/", "-")
-                            sortpubdate_list.append(sortpubdate_processed)
-                            epubdate_raw = get_field_or_default_value(
-                                r_meta.json()["result"][pubmed_id],
-                                "epubdate",
-                                default="NA",
-                            )
-                            ## epubdate and sortpubdate are well defined /
-                            # structured iso formats, but the pubdate is
-                            # quite arbitrary, this is why the pubdate_raw is
-                            # preprocessed and parsed quite attentive finally:
-                            # if all fails, we fall back to the sortpubdate
-                            if epubdate_raw == "NA" or epubdate_raw == "":
-                                pubdate_raw = get_field_or_default_value(
-                                    r_meta.json()["result"][pubmed_id],
-                                    "pubdate",
-                                    default="NA",
-                                )
-                                pubdate_processed = preprocess_date(pubdate_raw)
-                                try:
-                                    pubdate = datetime.strptime(
-                                        pubdate_processed, "%Y %b %d"
-                                    ).strftime("%Y-%m-%d")
-                                except ValueError as e:
-                                    logging.info(pubdate_raw)
-                                    logging.info(pubdate_processed)
-                                    logging.info(e)
-                                    logging.info(
-                                        "take the sortpubdate_processed "
-                                        "version: " + sortpubdate_processed
-                                    )
-                                    epubdate_raw = datetime.strptime(
-                                        sortpubdate_processed, "%Y-%m-%d"
-                                    ).strftime("%Y %b %d")
-                                    logging.info(
-                                        "resulting epubdate_raw: " + epubdate_raw
-                                    )
-                            epubdate_iso = (
-                                pubdate
-                                if (epubdate_raw == "NA" or epubdate_raw == "")
-                                else datetime.strptime(
-                                    epubdate_raw, "%Y %b %d"
-                                ).strftime("%Y-%m-%d")
-                            )
-                            epubdate_list.append(epubdate_iso)
-                            authors = get_field_or_default_value(
-                                r_meta.json()["result"][pubmed_id],
-                                "authors",
-                                default="NA",
-                            )
-                            authors_list.append(authors)
-
-                            journal_list.append(
-                                get_field_or_default_value(
-                                    r_meta.json()["result"][pubmed_id],
-                                    "fulljournalname",
-                                    default="NA",
-                                )
-                            )
-                            pmc_id = "NA"
-                            if "articleids" in r_meta.json()["result"][pubmed_id]:
-                                for article_id in r_meta.json()["result"][pubmed_id][
-                                    "articleids"
-                                ]:
-                                    if article_id["idtype"] == "pmc":
-                                        pmc_id = article_id["value"]
-
-                                        if run_pubtator == True:
-                                            pubtator_url_pmc = (
-                                                "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/publications/export/biocxml?pmids="
-                                                + str(pubmed_id) + "&full=true"
-                                            )
-                                            successful_request = False
-                                            count_requests = 0
-                                            while successful_request != True:
-                                                pubtator_response = request_with_delay(
-                                                    pubtator_url_pmc
-                                                )
-                                                count_requests += 1
-                                                if count_requests > 1:
-                                                    logging.info(
-                                                        "count_requests = "
-                                                        + str(count_requests)
-                                                    )
-                                                if pubtator_response != None:
-                                                    successful_request = True
-                                                    ## write biocxml to temp file
-                                                    with open(
-                                                        "/output/pubtator_response.xml",
-                                                        "w",
-                                                    ) as f:
-                                                        f.write(pubtator_response.text)
-                                                    ner_dict = {}
-                                                    ## load biocxml file and put to collection
-                                                    with open(
-                                                        "/output/pubtator_response.xml",
-                                                        "r",
-                                                    ) as fp:
-                                                        collection = None
-                                                        try:
-                                                            collection = bioc.load(fp)
-                                                        except:
-                                                            logging.info(
-                                                                f"Error: collection for {pmc_id}: pubtator_url = {pubtator_url_pmc}"
-                                                            )
-                                                        if collection != None:
-                                                            # logging.info(f"Success: collection for {pmc_id}: pubtator_url = {pubtator_url_pmc}")
-                                                            if (
-                                                                len(
-                                                                    collection.documents
-                                                                )
-                                                                > 0
-                                                            ):
-                                                                for (
-                                                                    document
-                                                                ) in (
-                                                                    collection.documents
-                                                                ):
-                                                                    ## document.id is the pmc id
-                                                                    if (
-                                                                        len(
-                                                                            document.passages
-                                                                        )
-                                                                        > 0
-                                                                    ):
-                                                                        for (
-                                                                            passage
-                                                                        ) in (
-                                                                            document.passages
-                                                                        ):
-                                                                            if (
-                                                                                len(
-                                                                                    passage.annotations
-                                                                                )
-                                                                                > 0
-                                                                            ):
-                                                                                ## loop through all annotation
-                                                                                for annotation in (
-                                                                                    passage.annotations
-                                                                                ):
-                                                                                    ner_type = "Null"
-                                                                                    ner_identifier = "Null"
-                                                                                    if (
-                                                                                        "type"
-                                                                                        in annotation.infons
-                                                                                    ):
-                                                                                        ner_type = annotation.infons[
-                                                                                            "type"
-                                                                                        ]
-                                                                                    if (
-                                                                                        "identifier"
-                                                                                        in annotation.infons
-                                                                                    ):
-                                                                                        ner_identifier = annotation.infons[
-                                                                                            "identifier"
-                                                                                        ]
-                                                                                    ## ner-text for each entity
-                                                                                    try:
-                                                                                        ner_text = (
-                                                                                            str(ner_type)
-                                                                                            + ":"
-                                                                                            + str(ner_identifier)
-                                                                                            + ";"
-                                                                                            + str(annotation.text)
-                                                                                        )
-                                                                                    except:
-                                                                                        logging.info("error with ner_text")
-                                                                                        
-                                                                                    if (
-                                                                                        ner_type.lower()
-                                                                                        in ner_dict
-                                                                                    ):
-                                                                                        if ner_identifier:
-                                                                                            if (
-                                                                                                ner_identifier
-                                                                                                != "Null"
-                                                                                            ) and not (
-                                                                                                ner_identifier
-                                                                                                in ner_dict[
-                                                                                                    ner_type.lower()
-                                                                                                ]
-                                                                                            ):
-                                                                                                ner_dict[
-                                                                                                    ner_type.lower()
-                                                                                                ] += (
-                                                                                                    ","
-                                                                                                    + ner_text
-                                                                                                )
-                                                                                    else:
-                                                                                        ner_dict[
-                                                                                            ner_type.lower()
-                                                                                        ] = ner_text
-                                                                    ner_string = ""
-                                                                    ## for each concept, build the respective entity string
-                                                                    for (
-                                                                        index,
-                                                                        bioconcept,
-                                                                    ) in enumerate(
-                                                                        bioconcepts_list
-                                                                    ):
-                                                                        if (
-                                                                            bioconcept
-                                                                            in ner_dict
-                                                                        ):
-                                                                            ner_string += ner_dict[
-                                                                                bioconcept
-                                                                            ]
-                                                                        else:
-                                                                            ner_string += (
-                                                                                "Null"
-                                                                            )
-                                                                        ## add separator between entity types (and not at the end)
-                                                                        if (
-                                                                            index
-                                                                            < len(
-                                                                                bioconcepts_list
-                                                                            )
-                                                                            - 1
-                                                                        ):
-                                                                            ner_string += (
-                                                                                "|"
-                                                                            )
-                                                    ## replace the original pubtator annotation if there is a pmc annotation
-                                                    if len(ner_dict) > 0:
-                                                        annotations_list = (
-                                                            annotations_list[:-1]
-                                                        )
-                                                        annotations_list.append(
-                                                            ner_string
-                                                        )
-
-                            pmc_id_list.append(pmc_id)
-                successful_request = True
-            else:
-                logging.info("Request failed: " + meta_url)
-
-    df_content = {
-        "title": title_list,
-        "abstract": abstract_list,
-        "annotations": annotations_list,
-        "sortpubdate": sortpubdate_list,
-        "epubdate": epubdate_list,
-        "authors": authors_list,
-        "journal": journal_list,
-        "pmc_id": pmc_id_list,
-    }
+    if run_pubtator != True:
+        pubtator_urls = []
+    responses = fetch_engine.fetch_all(pubtator_urls + meta_urls)
+    pubtator_responses = responses[: len(pubtator_urls)]
+    meta_responses = responses[len(pubtator_urls) :]
 
-    if len(df_content["title"]) == len(pubmed_ids_all_batches):
-        return_df = pd.DataFrame(data=df_content, index=pubmed_ids_all_batches)
-    else:
-        return_df = pd.DataFrame()
-        logging.info(
-            "Error: index has not the same size as the metadata-dataframe -> skipping the following batch"
-            + str(pubmed_ids_all_batches)
+    pubtator_meta = {}
+    for pubtator_response in pubtator_responses:
+        ## failed after all attempts -> the articles have no annotations
+        if pubtator_response == None:
+            continue
+        pubtator_text = pubtator_response.content.decode("utf-8")
+        pubtator_meta.update(
+            parse_pubtator_text(pubtator_text, bioconcepts_list, logging=logging)
+        )
+
+    meta_data = {}
+    pmc_urls = {}
+    for index_batch, pubmed_ids in enumerate(pubmed_ids_batches):
+        ## failed after all attempts -> the articles of the batch are skipped
+        if meta_responses[index_batch] == None:
+            logging.info("no meta data for the pubmed ids " + str(pubmed_ids))
+            continue
+        r_meta_json = meta_responses[index_batch].json()
+        if "result" in r_meta_json:
+            for pubmed_id in pubmed_ids:
+                if pubmed_id in r_meta_json["result"]:
+                    meta_data[pubmed_id] = get_meta_data_from_esummary(
+                        pubmed_id,
+                        r_meta_json["result"][pubmed_id],
+                        pubtator_meta,
+                        bioconcepts_list,
+                    )
+                    if run_pubtator == True and meta_data[pubmed_id]["pmc_id"] != "NA":
+                        pmc_urls[pubmed_id] = (
+                            "https://www.ncbi.nlm.nih.gov/research/pubtator3-api/publications/export/biocxml?pmids="
+                            + str(pubmed_id)
+                            + "&full=true"
+                        )
+
+    ## full text annotations for all pmc articles (the in-memory parser
+    # allows fetching and parsing in the worker threads)
+    def get_pmc_annotation_string(pubmed_id: str) -> str:
+        pmc_response = fetch_engine.fetch_until_success(pmc_urls[pubmed_id])
+        if pmc_response == None:
+            return None
+        return get_bioc_annotation_string(
+            pmc_response.text,
+            bioconcepts_list,
+            logging=logging,
+            error_message=f"{meta_data[pubmed_id]['pmc_id']}: pubtator_url = "
+            f"{pmc_urls[pubmed_id]}",
         )
-    return return_df
+
+    ner_strings = fetch_engine.map(get_pmc_annotation_string, list(pmc_urls.keys()))
+    for pubmed_id, ner_string in zip(pmc_urls.keys(), ner_strings):
+        ## replace the original pubtator annotation if there is a pmc annotation
+        if ner_string != None:
+            meta_data[pubmed_id]["annotations"] = ner_string
+
+    return meta_data
+
+
+## every article (and every referenced article) is fetched only once per run
+meta_data_store = Meta_Data_Store(get_meta_data_records, logging=logging)
 
 
 def is_relevant(str_candidate: str, search_terms: List[str]) -> bool:
@@ -775,11 +534,71 @@ def get_relevant_keywords(str_candidate: str, search_terms: List[str]) -> List[s
     return relevant
 
 
-## this function takes in the json_response, and the csv_content and updates
-# the csv_content based on the json_response and article_data, that needs to
-# be provided
-def update_csv_content_by_json_response(
-    json_response: requests.Response,
+## batched elink: one request resolves the links (linkname =
+# pubmed_pubmed_citedin or pubmed_pubmed_refs) of many articles, every id=
+# parameter gets its own linkset in the response
+## returns a dict: article_id -> list of linked articles (empty list, if the
+# article has no links)
+def get_citation_links(
+    article_ids: List[str], linkname: str, batch_size: int = 100
+) -> Dict[str, List[str]]:
+    article_ids = [str(article_id) for article_id in article_ids]
+    citation_links = {article_id: [] for article_id in article_ids}
+    elink_urls = []
+    for article_ids_batch in batch(article_ids, batch_size):
+        elink_urls.append(
+            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+            "elink.fcgi?dbfrom=pubmed&linkname="
+            + linkname
+            + "".join(["&id=" + article_id for article_id in article_ids_batch])
+            + "&tool=my_tool&email=my_email@example.com&retmode=json"
+        )
+    for elink_url, json_response in zip(
+        elink_urls, fetch_engine.fetch_all(elink_urls)
+    ):
+        convert_json = None
+        try:
+            convert_json = json_response.json()
+        except:
+            logging.info(
+                "error occured: json response could not be decoded -> skip "
+                + elink_url
+            )
+        if convert_json != None and "linksets" in convert_json:
+            for linkset in convert_json["linksets"]:
+                if "ids" in linkset and "linksetdbs" in linkset:
+                    article_id = str(linkset["ids"][0])
+                    for linksetdb in linkset["linksetdbs"]:
+                        if linksetdb.get("linkname", linkname) == linkname:
+                            citation_links[article_id] = [
+                                str(link) for link in linksetdb["links"]
+                            ]
+    return citation_links
+
+
+## get the incoming (citedin) and outgoing (refs) links for all articles
+def get_citations_and_references(
+    article_ids: List[str], batch_size: int = 100
+) -> Dict[str, Dict[str, List[str]]]:
+    citing_links = get_citation_links(
+        article_ids, "pubmed_pubmed_citedin", batch_size=batch_size
+    )
+    reference_links = get_citation_links(
+        article_ids, "pubmed_pubmed_refs", batch_size=batch_size
+    )
+    return {
+        str(article_id): {
+            "citedin": citing_links[str(article_id)],
+            "refs": reference_links[str(article_id)],
+        }
+        for article_id in article_ids
+    }
+
+
+## update the csv_content by the linked articles (citing articles or
+# references) of the article (linked_articles = None or [] -> no changes)
+def update_csv_content_by_linked_articles(
+    linked_articles: List[str],
     csv_content: str,
     csv_header_column_count: int,
     reference_id: int,
@@ -799,156 +618,134 @@ def update_csv_content_by_json_response(
     article_annotations: pd.DataFrame,
     run_pubtator=True,
 ) -> Tuple[str, int]:
-    if json_response != None:
-        convert_json = None
-        try:
-            convert_json = json_response.json()
-        except:
-            logging.info(
-                "error occured: json response could not be decoded -> skip this entry"
-            )
-
-        if convert_json != None:
-            if "linksets" in json_response.json():
-                if len(json_response.json()["linksets"]) > 0:
-                    if "linksetdbs" in (json_response.json()["linksets"][0]).keys():
-                        length_keys = len(
-                            (json_response.json()["linksets"][0])["linksetdbs"][0][
-                                "links"
-                            ]
-                        )
-                        ## test_mode: only take the first three references / citations
-                        if test_mode:
-                            max_index = min(length_keys, 3)
-                        else:
-                            max_index = length_keys
-
-                        current_index = 0
-                        ## for every article, update the csv_content
-                        other_article_list = (json_response.json()["linksets"][0])[
-                            "linksetdbs"
-                        ][0]["links"][0:max_index]
-                        other_meta_df = get_meta_data(
-                            other_article_list,
-                            bioconcepts=bioconcepts,
-                            run_pubtator=run_pubtator,
-                        )
-                        if not other_meta_df.empty:
-                            for other_article in other_article_list:
-                                # start_time = time.time()
-                                other_meta = other_meta_df.loc[other_article]
-                                # end_time = time.time()
-                                # logging.info("get_meta_data took "+ str(end_time-start_time))
-                                other_title = other_meta["title"].replace("|", ";")
-                                other_epubdate = other_meta["epubdate"].replace(
-                                    "|", ";"
-                                )
-                                other_abstract = other_meta["abstract"].replace(
-                                    "|", ";"
-                                )
-                                other_authors = get_author_string(other_meta["authors"])
-                                other_journal = other_meta["journal"].replace("|", ";")
-                                other_annotations = other_meta["annotations"]
-                                other_pmc_id = other_meta["pmc_id"]
-                                candidate = " ".join([other_title, other_abstract])
-                                if is_relevant(candidate, filter_terms):
-                                    other_keywords = get_relevant_keywords(
-                                        candidate, additional_keywords
-                                    )
-                                    ## distinguish the order in the csv which determines
-                                    # the relationship direction (is cited by or is
-                                    # referencing)
-                                    if is_article_first:
-                                        ## article_id cites other_article
-                                        # logging.info("article_id = "+str(article_id) + " CITES other article = " \
-                                        # + str(other_article) + " | current index = " + str(current_index) \
-                                        # + " ; max = "+str(max_index-1))
-                                        csv_candidate = (
-                                            "|".join(
-                                                [
-                                                    str(reference_id),
-                                                    article_id,
-                                                    article_title,
-                                                    article_pmc_id,
-                                                    article_epubdate,
-                                                    article_authors,
-                                                    article_journal,
-                                                    article_abstract,
-                                                    ",".join(article_keywords),
-                                                    article_annotations,
-                                                    str(other_article),
-                                                    other_title,
-                                                    other_pmc_id,
-                                                    other_epubdate,
-                                                    other_authors,
-                                                    other_journal,
-                                                    other_abstract,
-                                                    ",".join(other_keywords),
-                                                    other_annotations,
-                                                ]
-                                            )
-                                            + "\n"
-                                        )
-                                    else:
-                                        ## article_id is cited by other_article
-                                        # logging.info("article_id = "+str(article_id) + " IS CITED BY other article = " \
-                                        # + str(other_article) + " | current index = " + str(current_index) \
-                                        # + " ; max = "+str(max_index-1))
-                                        csv_candidate = (
-                                            "|".join(
-                                                [
-                                                    str(reference_id),
-                                                    str(other_article),
-                                                    other_title,
-                                                    other_pmc_id,
-                                                    other_epubdate,
-                                                    other_authors,
-                                                    other_journal,
-                                                    other_abstract,
-                                                    ",".join(other_keywords),
-                                                    other_annotations,
-                                                    article_id,
-                                                    article_title,
-                                                    article_pmc_id,
-                                                    article_epubdate,
-                                                    article_authors,
-                                                    article_journal,
-                                                    article_abstract,
-                                                    ",".join(article_keywords),
-                                                    article_annotations,
-                                                ]
-                                            )
-                                            + "\n"
-                                        )
-                                    csv_column_count = len(csv_candidate.split("|"))
-                                    if csv_header_column_count == csv_column_count:
-                                        csv_content += csv_candidate
-                                        reference_id += 1
-                                    else:
-                                        logging.info(
-                                            f"Skipping row with incorrect column count: {csv_column_count} (expected {csv_header_column_count}). Data: {csv_candidate}"
-                                        )
-                                current_index += 1
-                        if is_article_first:
-                            logging.info(
-                                "article_id = "
-                                + str(article_id)
-                                + " CITES "
-                                + str(len(other_article_list))
-                                + " other articles"
+    if linked_articles:
+        length_keys = len(linked_articles)
+        ## test_mode: only take the first three references / citations
+        if test_mode:
+            max_index = min(length_keys, 3)
+        else:
+            max_index = length_keys
+
+        current_index = 0
+        ## for every article, update the csv_content
+        other_article_list = linked_articles[0:max_index]
+        other_meta_df = meta_data_store.get_meta_data(
+            other_article_list,
+            bioconcepts=bioconcepts,
+            run_pubtator=run_pubtator,
+        )
+        if not other_meta_df.empty:
+            for other_article in other_article_list:
+                # start_time = time.time()
+                other_meta = other_meta_df.loc[other_article]
+                # end_time = time.time()
+                # logging.info("get_meta_data took "+ str(end_time-start_time))
+                other_title = other_meta["title"].replace("|", ";")
+                other_epubdate = other_meta["epubdate"].replace("|", ";")
+                other_abstract = other_meta["abstract"].replace("|", ";")
+                other_authors = get_author_string(other_meta["authors"])
+                other_journal = other_meta["journal"].replace("|", ";")
+                other_annotations = other_meta["annotations"]
+                other_pmc_id = other_meta["pmc_id"]
+                candidate = " ".join([other_title, other_abstract])
+                if is_relevant(candidate, filter_terms):
+                    other_keywords = get_relevant_keywords(
+                        candidate, additional_keywords
+                    )
+                    ## distinguish the order in the csv which determines
+                    # the relationship direction (is cited by or is
+                    # referencing)
+                    if is_article_first:
+                        ## article_id cites other_article
+                        # logging.info("article_id = "+str(article_id) + " CITES other article = " \
+                        # + str(other_article) + " | current index = " + str(current_index) \
+                        # + " ; max = "+str(max_index-1))
+                        csv_candidate = (
+                            "|".join(
+                                [
+                                    str(reference_id),
+                                    article_id,
+                                    article_title,
+                                    article_pmc_id,
+                                    article_epubdate,
+                                    article_authors,
+                                    article_journal,
+                                    article_abstract,
+                                    ",".join(article_keywords),
+                                    article_annotations,
+                                    str(other_article),
+                                    other_title,
+                                    other_pmc_id,
+                                    other_epubdate,
+                                    other_authors,
+                                    other_journal,
+                                    other_abstract,
+                                    ",".join(other_keywords),
+                                    other_annotations,
+                                ]
                             )
-                        else:
-                            logging.info(
-                                "article_id = "
-                                + str(article_id)
-                                + " is CITED by "
-                                + str(len(other_article_list))
-                                + " other articles"
+                            + "\n"
+                        )
+                    else:
+                        ## article_id is cited by other_article
+                        # logging.info("article_id = "+str(article_id) + " IS CITED BY other article = " \
+                        # + str(other_article) + " | current index = " + str(current_index) \
+                        # + " ; max = "+str(max_index-1))
+                        csv_candidate = (
+                            "|".join(
+                                [
+                                    str(reference_id),
+                                    str(other_article),
+                                    other_title,
+                                    other_pmc_id,
+                                    other_epubdate,
+                                    other_authors,
+                                    other_journal,
+                                    other_abstract,
+                                    ",".join(other_keywords),
+                                    other_annotations,
+                                    article_id,
+                                    article_title,
+                                    article_pmc_id,
+                                    article_epubdate,
+                                    article_authors,
+                                    article_journal,
+                                    article_abstract,
+                                    ",".join(article_keywords),
+                                    article_annotations,
+                                ]
                             )
-                            # end_time = time.time()
-                            # logging.info("the whole other_article took " \
-                            # + str(end_time-start_time))
-        ## finally return the csv_content and the reference_id (index of the publication)
+                            + "\n"
+                        )
+                    csv_column_count = len(csv_candidate.split("|"))
+                    if csv_header_column_count == csv_column_count:
+                        csv_content += csv_candidate
+                        reference_id += 1
+                    else:
+                        logging.info(
+                            f"Skipping row with incorrect column count: {csv_column_count} (expected {csv_header_column_count}). Data: {csv_candidate}"
+                        )
+                current_index += 1
+        if is_article_first:
+            logging.info(
+                "article_id = "
+                + str(article_id)
+                + " CITES "
+                + str(len(other_article_list))
+                + " other articles"
+            )
+        else:
+            logging.info(
+                "article_id = "
+                + str(article_id)
+                + " is CITED by "
+                + str(len(other_article_list))
+                + " other articles"
+            )
+            # end_time = time.time()
+            # logging.info("the whole other_article took " \
+            # + str(end_time-start_time))
+    ## finally return the csv_content and the reference_id (index of the publication)
     return csv_content, reference_id
 
 
@@ -973,9 +770,9 @@ def get_author_string(author_list: List[str]) -> str:
     return authors
 
 
-## create the citation csv (incoming and outgoing citations for all DOIs in the doi_list)
-# and return the int value of the next article id (reference_id)
-def create_citation_csv(
+## create the citation csv text (incoming and outgoing citations for the DOI)
+# and return it together with the int value of the next article id (reference_id)
+def create_citation_csv_text(
     doi: str,
     article_meta: pd.DataFrame,
     reference_id_start: int,
@@ -984,7 +781,8 @@ def create_citation_csv(
     test_mode: bool,
     bioconcepts: str,
     run_pubtator: bool = True,
-) -> int:
+    citation_links: Dict[str, List[str]] = None,
+) -> Tuple[str, int]:
     article_annotations = "|".join(["article_" + a for a in bioconcepts.split(",")])
     reference_annotations = "|".join(["reference_" + a for a in bioconcepts.split(",")])
     csv_header = "|".join(
@@ -1034,17 +832,15 @@ def create_citation_csv(
 
         csv_content_old = csv_content
 
+        ## incoming and outgoing links (usually resolved for the whole batch
+        # by get_citations_and_references)
+        if citation_links == None:
+            citation_links = get_citations_and_references([article_id])[article_id]
+
         # citations (article is cited by the list of publications)
-        citing_articles_url = (
-            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
-            "elink.fcgi?dbfrom=pubmed&linkname=pubmed_pubmed_citedin&id="
-            + article_id
-            + "&tool=my_tool&email=my_email@example.com&retmode=json"
-        )
-        json_response_citing = request_with_delay(citing_articles_url)
         is_article_first = False
-        csv_content, reference_id = update_csv_content_by_json_response(
-            json_response_citing,
+        csv_content, reference_id = update_csv_content_by_linked_articles(
+            citation_links["citedin"],
             csv_content,
             csv_header_column_count,
             reference_id,
@@ -1066,17 +862,9 @@ def create_citation_csv(
         )
 
         # references (article cites the list of references)
-        references_url = (
-            "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
-            "elink.fcgi?dbfrom=pubmed&linkname=pubmed_pubmed_refs&id="
-            + article_id
-            + "&tool=my_tool&email=my_email@example.com&"
-            "retmode=json"
-        )
-        json_response_references = request_with_delay(references_url)
         is_article_first = True
-        csv_content, reference_id = update_csv_content_by_json_response(
-            json_response_references,
+        csv_content, reference_id = update_csv_content_by_linked_articles(
+            citation_links["refs"],
             csv_content,
             csv_header_column_count,
             reference_id,
@@ -1131,17 +919,51 @@ def create_citation_csv(
 
     csv_text = csv_header + "\n" + csv_content
     csv_text = csv_text.replace('"', "")
+    return csv_text, reference_id
 
-    ## write to file, that can be accessed from neo4j (neo4j is
-    # mapped to the neo4j container /var/lib/...)
+
+## write to file, that can be accessed from neo4j (neo4j is
+# mapped to the neo4j container /var/lib/...)
+def write_citation_csv(csv_text: str) -> None:
     f = open("/neo4j/citations.csv", "w")
     f.write(csv_text)
     f.close()
 
-    return reference_id
 
+## shift the reference_id (first column) of all lines of the citation csv
+def shift_reference_ids(csv_text: str, reference_id_start: int) -> str:
+    lines = csv_text.split("\n")
+    for index in range(1, len(lines)):
+        if lines[index] != "":
+            reference_id, line_rest = lines[index].split("|", 1)
+            lines[index] = str(int(reference_id) + reference_id_start) + "|" + line_rest
+    return "\n".join(lines)
+
+
+## the article is part of the graph: mark it as main article and add it to
+# the list of all integrated articles
+def mark_article_as_integrated(
+    neo4j_manager: Neo4j_Manager,
+    article_id: str,
+    article_registry: Integrated_Article_Registry,
+) -> None:
+    logging.info("DONE integrating article " + article_id)
+
+    neo4j_manager.set_node_attribute(
+        node_label="Article",
+        node_attribute="name",
+        node_value=article_id,
+        attribute_name="query",
+        attribute_value="main",
+    )
 
-def run_global_curation(neo4j_manager: Neo4j_Manager) -> None:
+    article_registry.add([article_id])
+
+
+## integration_run: the merged and renamed nodes are tagged with the run
+def run_global_curation(
+    neo4j_manager: Neo4j_Manager, integration_run: int = None
+) -> None:
     ## run the curation
     logging.info("run global curations")
     ## global curation file
@@ -1171,11 +993,11 @@ def run_global_curation(neo4j_manager: Neo4j_Manager) -> None:
                 ## execute the curation
                 if method == "merge":
                     response = neo4j_manager.merge_nodes(
-                        from_keys, from_values, to_keys, to_values
+                        from_keys, from_values, to_keys, to_values, integration_run
                     )
                 elif method == "rename":
                     response = neo4j_manager.rename_entity(
-                        from_keys, from_values, to_keys, to_values
+                        from_keys, from_values, to_keys, to_values, integration_run
                     )
                 else:
                     logging.info("curation method not known: " + method)
@@ -1247,14 +1069,60 @@ def get_global_graph_query() -> str:
     reactome_contains_gene: {orientation: 'UNDIRECTED'}});"""
 
 
+## the local indices of the MeSH XML and the taxonomy dumps (None if a dump
+# is not configured or missing, then the web pages are scraped)
+def get_reference_indices(
+    config: configparser.ConfigParser,
+) -> Tuple[MeSH_Index, Taxonomy_Index]:
+    index_dir = config["RUN-settings"].get("reference_index_dir", fallback="/output")
+    mesh_xml_paths = [
+        path.strip()
+        for path in config["RUN-settings"].get("mesh_xml_paths", fallback="").split(",")
+        if path.strip() != ""
+    ]
+    taxonomy_paths = [
+        config["RUN-settings"].get("taxonomy_names_path", fallback=""),
+        config["RUN-settings"].get("taxonomy_nodes_path", fallback=""),
+    ]
+    ## optional: the merged taxa (old tax id -> current tax id)
+    taxonomy_merged_path = config["RUN-settings"].get(
+        "taxonomy_merged_path", fallback=""
+    )
+    mesh_index = None
+    if len(mesh_xml_paths) > 0:
+        if all([os.path.isfile(path) for path in mesh_xml_paths]):
+            mesh_index = MeSH_Index(
+                os.path.join(index_dir, "mesh_index.sqlite"),
+                mesh_xml_paths,
+                logging=logging,
+            )
+        else:
+            logging.info("MeSH XML not found: " + str(mesh_xml_paths))
+    taxonomy_index = None
+    if all([path != "" for path in taxonomy_paths]):
+        if taxonomy_merged_path != "":
+            taxonomy_paths.append(taxonomy_merged_path)
+        if all([os.path.isfile(path) for path in taxonomy_paths]):
+            taxonomy_index = Taxonomy_Index(
+                os.path.join(index_dir, "taxonomy_index.sqlite"),
+                taxonomy_paths,
+                logging=logging,
+            )
+        else:
+            logging.info("taxonomy dump not found: " + str(taxonomy_paths))
+    return mesh_index, taxonomy_index
+
+
+## one integration run, clear_graph: rebuild the graph (delete_neo4j = True,
+# only the first run after the start or a config change clears the graph)
 def run_main_loop(
     config_path: str,
     waittime: int = 0,
+    clear_graph: bool = False,
 ) -> None:
     ## general config
     config = configparser.ConfigParser()
     config.read(config_path)
-    delete_neo4j = config["NEO4J-settings"]["delete_neo4j"].lower() == "true"
 
     project_name = config["GENERAL-settings"]["project_name"]
     db_hostname_base = config["NEO4J-settings"]["neo4j_hostname"]
@@ -1284,6 +1152,102 @@ def run_main_loop(
     test_mode = config["RUN-settings"]["test_mode"].lower() == "true"
     run_node_embedding = config["RUN-settings"]["run_node_embedding"].lower() == "true"
     run_pubtator = config["RUN-settings"]["run_pubtator"].lower() == "true"
+    ## concurrent requests (the rates are the NCBI quotas per second)
+    fetch_workers = int(config["RUN-settings"].get("fetch_workers", fallback="8"))
+    fetch_max_attempts = int(
+        config["RUN-settings"].get("fetch_max_attempts", fallback="10")
+    )
+    eutils_requests_per_second = float(
+        config["RUN-settings"].get("eutils_requests_per_second", fallback="3")
+    )
+    pubtator_requests_per_second = float(
+        config["RUN-settings"].get("pubtator_requests_per_second", fallback="3")
+    )
+    configure_rate_limits(eutils_requests_per_second, pubtator_requests_per_second)
+    fetch_engine.configure(fetch_workers, fetch_max_attempts)
+    ## persistent cache for the NCBI responses (empty path = no caching)
+    response_cache_path = config["RUN-settings"].get(
+        "response_cache_path", fallback="/output/response_cache.sqlite"
+    )
+    response_cache_max_size_mb = int(
+        config["RUN-settings"].get("response_cache_max_size_mb", fallback="2048")
+    )
+    response_cache_ttl = parse_ttl_string(
+        config["RUN-settings"].get("response_cache_ttl", fallback="")
+    )
+    configure_response_cache(
+        response_cache_path, response_cache_max_size_mb * 1024**2, response_cache_ttl
+    )
+    ## bulk import: the citation rows of a whole batch are imported with
+    # UNWIND transactions (instead of one LOAD CSV per article)
+    bulk_import = (
+        config["RUN-settings"].get("bulk_import", fallback="False").lower() == "true"
+    )
+    bulk_import_rows_per_transaction = int(
+        config["RUN-settings"].get(
+            "bulk_import_rows_per_transaction", fallback="1000"
+        )
+    )
+    ## cold build (only if the graph is cleared): write the whole graph as
+    # neo4j-admin import files and let the neo4j container swap the database
+    cold_build = clear_graph and (
+        config["RUN-settings"].get("cold_build", fallback="False").lower() == "true"
+    )
+    cold_build_import_dir = config["RUN-settings"].get(
+        "cold_build_import_dir", fallback="/neo4j/bulk"
+    )
+    cold_build_neo4j_import_dir = config["RUN-settings"].get(
+        "cold_build_neo4j_import_dir", fallback="/var/lib/neo4j/import/bulk"
+    )
+    ## staged integration: worker pools of the network bound stages and the
+    # number of batches in flight (1 = one batch after the other)
+    pipeline_meta_data_workers = int(
+        config["RUN-settings"].get("pipeline_meta_data_workers", fallback="2")
+    )
+    pipeline_citation_workers = int(
+        config["RUN-settings"].get("pipeline_citation_workers", fallback="2")
+    )
+    pipeline_row_workers = int(
+        config["RUN-settings"].get("pipeline_row_workers", fallback="2")
+    )
+    pipeline_max_pending_batches = int(
+        config["RUN-settings"].get("pipeline_max_pending_batches", fallback="4")
+    )
+    meta_data_store.configure(
+        int(
+            config["RUN-settings"].get(
+                "meta_data_store_max_entries", fallback="50000"
+            )
+        )
+    )
+    ## local reference dumps for the chemical and species information
+    mesh_index, taxonomy_index = get_reference_indices(config)
+    ## cache of the mygene documents (empty path = no caching)
+    mygene_cache_path = config["RUN-settings"].get(
+        "mygene_cache_path", fallback="/output/mygene_cache.sqlite"
+    )
+    mygene_cache_max_age = parse_cadence(
+        config["RUN-settings"].get("mygene_cache_max_age", fallback="2592000")
+    )
+    ## the post processing only handles the nodes of the integration run,
+    # the whole graph is processed with these cadences (seconds or @daily,
+    # @weekly, 0 = never)
+    article_rank_interval = parse_cadence(
+        config["RUN-settings"].get("article_rank_interval", fallback="@daily")
+    )
+    full_post_processing_interval = parse_cadence(
+        config["RUN-settings"].get("full_post_processing_interval", fallback="@weekly")
+    )
+    ## journal of the run (empty path = no journal): an interrupted run is
+    # resumed with the same articles and settings
+    run_journal_dir = config["RUN-settings"].get(
+        "run_journal_dir", fallback="/output/run_journal"
+    )
+    ## sparse article x entity matrices for the label abundance of the api
+    # (empty path = no export)
+    mention_matrix_dir = config["RUN-settings"].get(
+        "mention_matrix_dir", fallback="/output/mention_matrix"
+    )
 
     all_doi_list = "/input/DOI-list-all.csv"
     path_doi_list = "/input/DOI-list.csv"
@@ -1302,11 +1266,30 @@ def run_main_loop(
     neo4j_manager = Neo4j_Manager(
         neo4j_bolt, neo4j_user, neo4j_password, logging=logging
     )
-    if delete_neo4j:
+    ## all integrated articles (loaded once)
+    article_registry = Integrated_Article_Registry(all_doi_list)
+    ## resume the interrupted run (the graph and the article lists of the
+    # run are kept)
+    run_journal = None
+    run_settings = {
+        "bioconcepts": bioconcepts,
+        "run_pubtator": run_pubtator,
+        "test_mode": test_mode,
+        "filter_terms": filter_terms,
+        "additional_keywords": additional_keywords,
+        "bulk_import": bulk_import,
+        "cold_build": cold_build,
+    }
+    resumed_article_list = None
+    if run_journal_dir != "":
+        run_journal = Run_Journal(run_journal_dir, logging=logging)
+        resumed_article_list = run_journal.resume_run(run_settings)
+    if clear_graph and resumed_article_list == None:
         logging.info("--- clearing NEO4J ---")
-        neo4j_manager.clear_graph()
-        with open(all_doi_list, "w") as f:
-            f.write("DOI,integration_date\n")
+        ## the cold build replaces the whole database
+        if not cold_build:
+            neo4j_manager.clear_graph()
+        article_registry.reset()
         with open(path_doi_list, "w") as f:
             f.write("DOI,integration_date\n")
         with open(old_doi_list, "w") as f:
@@ -1319,135 +1302,355 @@ def run_main_loop(
     )
     neo4j_manager.setup_index()
     logging.info("Creating index - DONE")
-    
-    ## calculate and write the article rank for all articles
-    logging.info(
-        "Calculate and write the ARTICLE RANK for all articles"
+    ## all nodes of this run are tagged with the integration run id
+    integration_run = neo4j_manager.start_integration_run(
+        resume=resumed_article_list != None
     )
-    neo4j_manager.calculate_and_write_article_rank()
-    logging.info("calculating ARTICLE RANK - DONE")
-
+    logging.info("integration run: " + str(integration_run))
 
     ## refresh old articles based on their age in seconds
-    if refresh_old_articles:
+    if refresh_old_articles and resumed_article_list == None:
         ## delete articles with an old integration_date
-        doi_all_df = pd.read_csv(all_doi_list)
-        integration_date_list = list(doi_all_df["integration_date"])
-        delete_date_list = []
-        now = datetime.now()
-        for index, date_time in enumerate(integration_date_list):
-            date_object = datetime.strptime(date_time, "%Y-%m-%d|%H:%M:%S")
-            duration = (now - date_object).total_seconds()
-            if duration > max_integration_age_articles:
-                delete_date_list.append(index)
-            if len(delete_date_list) >= max_count_integration_batch:
-                break
-
-        drop_old_rows = doi_all_df.index[delete_date_list]
-        doi_all_df.drop(drop_old_rows, inplace=True)
-        doi_all_df.to_csv(all_doi_list, index=False)
+        old_articles = article_registry.remove_old_articles(
+            max_integration_age_articles, max_count_integration_batch
+        )
+        logging.info("REFRESH old articles: " + str(len(old_articles)))
 
     ## create the csv file, which is later imported into neo4j
     logging.info("creating the csv")
+    meta_data_store.clear()
     reference_id = 0
-    doi_df = pd.read_csv(path_doi_list)
-
-    ## get the new (non duplicated) articles
-    article_list_complete_pre = list(doi_df["DOI"])
-    article_list_complete = []
-    for article_ids_pre_int in article_list_complete_pre:
-        article_ids_pre_str = str(article_ids_pre_int)
-        skip_doi = False
-        ## unique ids sorted properly
-        if article_ids_pre_str not in article_list_complete:
-            with open(all_doi_list, "r") as read_obj:
-                # Read all lines in the file one by one
-                for line in read_obj:
-                    # For each line, check if line contains the string
-                    if article_ids_pre_str in line:
-                        skip_doi = True
-        else:
-            skip_doi = True
-        if not skip_doi:
-            article_list_complete.append(article_ids_pre_str)
+    if resumed_article_list != None:
+        article_list_complete = resumed_article_list
+        ## the cold build writes all import files again (from the journal)
+        if not cold_build:
+            reference_id = run_journal.get_next_reference_id()
+    else:
+        doi_df = pd.read_csv(path_doi_list)
+
+        ## get the new (non duplicated) articles
+        article_list_complete_pre = list(doi_df["DOI"])
+        article_list_complete = []
+        article_set_complete = set()
+        for article_ids_pre_int in article_list_complete_pre:
+            article_ids_pre_str = str(article_ids_pre_int)
+            ## unique ids sorted properly (and not integrated yet)
+            if (
+                article_ids_pre_str not in article_set_complete
+                and article_ids_pre_str not in article_registry
+            ):
+                article_list_complete.append(article_ids_pre_str)
+                article_set_complete.add(article_ids_pre_str)
+        logging.info(
+            "SKIPPED duplicated articles: "
+            + str(len(article_list_complete_pre) - len(article_list_complete))
+        )
+        if run_journal != None:
+            run_journal.start_run(article_list_complete, run_settings)
     count_DOIs = len(article_list_complete)
-    logging.info(
-        "SKIPPED duplicated articles: "
-        + str(len(article_list_complete_pre) - len(article_list_complete))
-    )
 
-    ## run article integration in batches of 100
-    for article_list_batch in batch(range(0, len(article_list_complete)), 100):
-        # logging.info([article_list[i] for i in list(x)] )
-        first_index = list(article_list_batch)[0]
-        logging.info("Starting batch with index = " + str(first_index))
-        article_ids = [str(article_list_complete[i]) for i in list(article_list_batch)]
-        article_meta = get_meta_data(
-            article_ids, bioconcepts=bioconcepts, run_pubtator=run_pubtator
+    if cold_build:
+        import_writer = Neo4j_Import_Writer(
+            cold_build_import_dir,
+            bioconcepts,
+            article_list_complete,
+            str(datetime.now().strftime("%Y-%m-%d")),
+            neo4j_import_dir=cold_build_neo4j_import_dir,
         )
 
-        if len(article_ids) > 0 and not article_meta.empty:
-            for index, doi in enumerate(article_ids):
-                article_id = str(doi)
-
+    ## run article integration in batches of 100: staged pipeline (meta data
+    # fetch -> citation link fetch -> row building) with a single writer for
+    # neo4j, so the requests of the next batches overlap with the writes
+    def journal_batch(batch_data: dict, stage: str, exclude: List[str] = []) -> None:
+        if run_journal != None:
+            payload = {
+                key: value for key, value in batch_data.items() if key not in exclude
+            }
+            payload["journal_stage"] = stage
+            run_journal.set_stage(batch_data["first_index"], stage, payload=payload)
+
+    def fetch_batch_meta_data(article_batch: Tuple[int, List[str]]) -> dict:
+        first_index, article_ids = article_batch
+        logging.info("Starting batch with index = " + str(first_index))
+        ## the batch continues after the last stage, which was done before
+        # the interruption (the meta data, the citation links or the rows)
+        if run_journal != None:
+            batch_data = run_journal.load_payload(first_index)
+            if batch_data != None and "journal_stage" in batch_data:
                 logging.info(
-                    "current article: "
-                    + str(article_id)
-                    + ": index/last_index = "
-                    + str(index + first_index)
-                    + "/"
-                    + str(count_DOIs - 1)
+                    "batch "
+                    + str(first_index)
+                    + " from the run journal (stage "
+                    + batch_data["journal_stage"]
+                    + ")"
                 )
-                reference_id_after = create_citation_csv(
-                    str(doi),
-                    article_meta,
-                    reference_id,
-                    filter_terms,
-                    additional_keywords,
-                    test_mode,
-                    bioconcepts,
-                    run_pubtator=run_pubtator,
+                batch_data["from_journal"] = batch_data["journal_stage"] == "rows"
+                return batch_data
+        batch_data = {
+            "first_index": first_index,
+            "article_ids": article_ids,
+            "article_meta": meta_data_store.get_meta_data(
+                article_ids, bioconcepts=bioconcepts, run_pubtator=run_pubtator
+            ),
+            "citation_links": None,
+            "articles": [],
+            "from_journal": False,
+        }
+        journal_batch(batch_data, "meta_data")
+        return batch_data
+
+    def fetch_batch_citation_links(batch_data: dict) -> dict:
+        article_ids = batch_data["article_ids"]
+        if (
+            batch_data["from_journal"]
+            or len(article_ids) == 0
+            or batch_data["article_meta"].empty
+        ):
+            return batch_data
+        ## citations and references of the whole batch (batched elink), a
+        # resumed batch has the citation links of the journal
+        citation_links = batch_data["citation_links"]
+        if citation_links == None:
+            citation_links = get_citations_and_references(article_ids)
+            batch_data["citation_links"] = citation_links
+            journal_batch(batch_data, "citation_links")
+        ## fetch the meta data of all linked articles of the batch at once
+        # (articles cited by many articles of the batch are fetched once, for
+        # a resumed batch the response cache answers the requests again)
+        linked_article_ids = []
+        for article_id in article_ids:
+            for linkname in ["citedin", "refs"]:
+                linked_articles = citation_links[article_id][linkname]
+                ## test_mode: only the first three references / citations
+                if test_mode:
+                    linked_articles = linked_articles[0:3]
+                linked_article_ids.extend(linked_articles)
+        meta_data_store.prefetch(
+            linked_article_ids, bioconcepts=bioconcepts, run_pubtator=run_pubtator
+        )
+        return batch_data
+
+    ## the csv of every article starts with reference_id 0, the writer
+    # numbers the rows of all articles consecutively
+    def build_batch_rows(batch_data: dict) -> dict:
+        if batch_data["from_journal"]:
+            return batch_data
+        if batch_data["citation_links"] == None:
+            article_ids = []
+        else:
+            article_ids = batch_data["article_ids"]
+        for article_id in article_ids:
+            csv_text, count_rows = create_citation_csv_text(
+                article_id,
+                batch_data["article_meta"],
+                0,
+                filter_terms,
+                additional_keywords,
+                test_mode,
+                bioconcepts,
+                run_pubtator=run_pubtator,
+                citation_links=batch_data["citation_links"][article_id],
+            )
+            if bulk_import or cold_build:
+                batch_data["articles"].append(
+                    (article_id, get_citation_rows(csv_text), count_rows)
                 )
-                reference_id = reference_id_after
+            else:
+                batch_data["articles"].append((article_id, csv_text, count_rows))
+        ## store the rows (without the meta data of the batch)
+        journal_batch(batch_data, "rows", exclude=["article_meta"])
+        return batch_data
+
+    def write_batch(batch_data: dict) -> None:
+        nonlocal reference_id
+        if batch_data["citation_links"] != None:
+            write_batch_rows(batch_data)
+        if run_journal != None:
+            run_journal.set_written(batch_data["first_index"], reference_id)
+
+    def write_batch_rows(batch_data: dict) -> None:
+        nonlocal reference_id
+        citation_rows = []
+        for index, (article_id, article_content, count_rows) in enumerate(
+            batch_data["articles"]
+        ):
+            logging.info(
+                "current article: "
+                + str(article_id)
+                + ": index/last_index = "
+                + str(index + batch_data["first_index"])
+                + "/"
+                + str(count_DOIs - 1)
+            )
+            if bulk_import or cold_build:
+                for row in article_content:
+                    row["reference_id"] = str(reference_id + int(row["reference_id"]))
+                citation_rows.extend(article_content)
+                reference_id += count_rows
+                continue
+
+            write_citation_csv(
+                shift_reference_ids(article_content, reference_id)
+            )
+            reference_id += count_rows
 
-                ## connect to neo4j and create the citation graph from the csv
-                neo4j_manager.create_citation_graph(bioconcepts)
+            ## connect to neo4j and create the citation graph from the csv
+            neo4j_manager.create_citation_graph(
+                bioconcepts, integration_run=integration_run
+            )
 
-                logging.info("DONE integrating article " + article_id)
+            mark_article_as_integrated(neo4j_manager, article_id, article_registry)
 
-                neo4j_manager.set_node_attribute(
-                    node_label="Article",
-                    node_attribute="name",
-                    node_value=article_id,
-                    attribute_name="query",
-                    attribute_value="main",
+        if cold_build:
+            import_writer.add_rows(citation_rows)
+        elif bulk_import:
+            ## one import for all citation rows of the batch
+            logging.info(
+                "bulk import of " + str(len(citation_rows)) + " citation rows"
+            )
+            neo4j_manager.create_citation_graph_bulk(
+                citation_rows,
+                bioconcepts,
+                rows_per_transaction=bulk_import_rows_per_transaction,
+                integration_run=integration_run,
+            )
+            for article_id in batch_data["article_ids"]:
+                mark_article_as_integrated(
+                    neo4j_manager, article_id, article_registry
                 )
 
-                now = datetime.now()
-                integration_date_time = now.strftime("%Y-%m-%d|%H:%M:%S")
-                with open(all_doi_list, "a") as f:
-                    f.write(article_id + "," + str(integration_date_time) + "\n")
-    logging.info("clean up all null nodes")
-    neo4j_manager.cleanup_null_nodes()
-    logging.info("add age for all articles")
-    neo4j_manager.add_age_for_all_articles()
-    ## calculate and write the article rank for all articles
+    integration_pipeline = Integration_Pipeline(
+        [
+            ("meta_data", fetch_batch_meta_data, pipeline_meta_data_workers),
+            ("citation_links", fetch_batch_citation_links, pipeline_citation_workers),
+            ("rows", build_batch_rows, pipeline_row_workers),
+        ],
+        write_batch,
+        max_pending_batches=pipeline_max_pending_batches,
+        logging=logging,
+    )
+    ## the batches, which are already in the graph (resumed run), are skipped
+    # (the cold build writes all batches again)
+    article_batches = []
+    for article_list_batch in batch(range(0, len(article_list_complete)), 100):
+        first_index = list(article_list_batch)[0]
+        if (
+            run_journal != None
+            and not cold_build
+            and run_journal.get_stage(first_index) == "written"
+        ):
+            continue
+        article_batches.append(
+            (
+                first_index,
+                [str(article_list_complete[i]) for i in list(article_list_batch)],
+            )
+        )
+    try:
+        integration_pipeline.run(article_batches)
+    finally:
+        integration_pipeline.close()
+    if cold_build:
+        import_writer.close()
+        logging.info("cold build: " + str(import_writer.get_statistics()))
+        if not run_import(cold_build_import_dir, logging=logging):
+            raise Exception(
+                "cold build: neo4j-admin import failed (see import.log in "
+                + cold_build_import_dir
+                + ")"
+            )
+        ## wait for the restarted neo4j
+        while neo4j_manager.query("RETURN 1", log_queries=False) == None:
+            time.sleep(5)
+        neo4j_manager.setup_index()
+        article_registry.add(article_list_complete)
+        logging.info("cold build - DONE")
+    if run_journal != None:
+        run_journal.finish_run()
+        run_journal.close()
+
+    ## post processing of the nodes of this integration run (None = the
+    # whole graph: the cold build has no run ids, or the full post
+    # processing is due)
+    full_post_processing = cold_build or neo4j_manager.is_global_task_due(
+        "last_full_post_processing", full_post_processing_interval
+    )
+    post_processing_run = None if full_post_processing else integration_run
     logging.info(
-        "calculate and write the ARTICLE RANK for all articles"
+        "post processing of "
+        + ("all nodes" if full_post_processing else "the integration run")
     )
-    neo4j_manager.calculate_and_write_article_rank()
-    logging.info("calculating ARTICLE RANK - DONE")
+    logging.info("clean up all null nodes")
+    if full_post_processing:
+        neo4j_manager.cleanup_null_nodes()
+    else:
+        neo4j_manager.cleanup_null_nodes(
+            ["Article", "Keyword"] + bioconcepts.split(","),
+            integration_run=post_processing_run,
+        )
+    logging.info("add age for all articles")
+    neo4j_manager.add_age_for_all_articles(integration_run=post_processing_run)
+    ## calculate and write the article rank for all articles (the rank
+    # depends on the whole citation graph -> periodically)
+    if cold_build or neo4j_manager.is_global_task_due(
+        "last_article_rank", article_rank_interval
+    ):
+        logging.info("calculate and write the ARTICLE RANK for all articles")
+        neo4j_manager.calculate_and_write_article_rank()
+        neo4j_manager.set_global_task_timestamp("last_article_rank")
+        logging.info("calculating ARTICLE RANK - DONE")
 
     logging.info("add chemical information (attributes) for all chemicals")
-    neo4j_manager.add_chemical_information()
+    neo4j_manager.add_chemical_information(
+        rows_per_transaction=bulk_import_rows_per_transaction,
+        mesh_index=mesh_index,
+        integration_run=post_processing_run,
+    )
     logging.info("add disease information (attributes) for all diseases")
-    neo4j_manager.add_disease_information()
+    neo4j_manager.add_disease_information(
+        rows_per_transaction=bulk_import_rows_per_transaction,
+        integration_run=post_processing_run,
+    )
     logging.info("add species information (attributes) for all species")
-    neo4j_manager.add_species_information()
+    neo4j_manager.add_species_information(
+        rows_per_transaction=bulk_import_rows_per_transaction,
+        taxonomy_index=taxonomy_index,
+        integration_run=post_processing_run,
+    )
     logging.info("add mygene information (attributes, pathways, ...) for all genes")
-    neo4j_manager.add_mygene_information()
+    mygene_cache = None
+    if mygene_cache_path != "":
+        mygene_cache = Mygene_Cache(
+            mygene_cache_path,
+            neo4j_manager.mg,
+            max_age_seconds=mygene_cache_max_age,
+            logging=logging,
+        )
+    neo4j_manager.add_mygene_information(
+        rows_per_transaction=bulk_import_rows_per_transaction,
+        mygene_cache=mygene_cache,
+        integration_run=post_processing_run,
+    )
+    if full_post_processing:
+        neo4j_manager.set_global_task_timestamp("last_full_post_processing")
+    if mygene_cache != None:
+        logging.info("mygene cache: " + str(mygene_cache.get_statistics()))
+        mygene_cache.close()
     logging.info("run global curation of annotated entities")
-    run_global_curation(neo4j_manager=neo4j_manager)
+    run_global_curation(
+        neo4j_manager=neo4j_manager, integration_run=post_processing_run
+    )
+    ## the label abundance uses the precomputed mention counts
+    logging.info("update the mention counts")
+    neo4j_manager.update_mention_counts(integration_run=post_processing_run)
+    if mention_matrix_dir != "":
+        logging.info("export the mention matrices")
+        export_mention_matrices(
+            neo4j_manager,
+            mention_matrix_dir,
+            graph_version=integration_run,
+            logging=logging,
+        )
 
     ## check if new embedding is necessary (based on max_integration_age_articles)
     run_embedding_now = False
@@ -1574,6 +1777,14 @@ def run_main_loop(
     # logging.info("cache cytoscape results")
     # neo4j_manager.cache_cytoscape_results(run_node_embedding = run_node_embedding)
 
+    ## the cached results of the api are outdated now
+    graph_version = neo4j_manager.increment_graph_version()
+    logging.info("graph version: " + str(graph_version))
+
+    logging.info("meta data store: " + str(meta_data_store.get_statistics()))
+    meta_data_store.clear()
+    if get_response_cache() != None:
+        logging.info("response cache: " + str(get_response_cache().get_statistics()))
     logging.info("DONE with all articles")
     # close neo4j after integrating all csvs
     neo4j_manager.close()
@@ -1585,60 +1796,102 @@ def main() -> None:
     doi_list_path = "/input/DOI-list.csv"
     old_doi_list_path = "/input/DOI-list-old.csv"
     config_path = "/input/config.ini"
-    # compare_to_doi_list = "/input/DOI-list-"
-    # shutil.copy(doi_list,current_doi_list)
 
-    big_loop_wait_time = 2
-    wait_counter_new_integration = 0
     logging.info("########## starting knowledge-graph manager ##########")
     ## wait for neo4j to start
     logging.info("wait for neo4j to start")
     time.sleep(30)
+
+    ## the config is only read again, if the file has changed
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    watch_interval_seconds = float(
+        config["RUN-settings"].get("watch_interval_seconds", fallback="2")
+    )
+    esearch_schedule = Cadence_Schedule(
+        parse_cadence(config["RUN-settings"].get("esearch_cadence", fallback="@hourly"))
+    )
+    file_watcher = File_Watcher([doi_list_path, config_path])
+    ## first run: integrate the DOI-list if it has changed while the manager
+    # was not running (or rebuild the graph if delete_neo4j), the later runs
+    # (timer, search query, DOI-list) don't clear the graph again
+    clear_graph = config["NEO4J-settings"]["delete_neo4j"].lower() == "true"
+    run_integration = (
+        not os.path.isfile(old_doi_list_path)
+        or not os.path.isfile(doi_list_path)
+        or not filecmp.cmp(old_doi_list_path, doi_list_path, shallow=False)
+        or clear_graph
+    )
+    last_integration = time.time()
     logging.info(
-        "check if the DOI-list has changed (every "
-        + str(big_loop_wait_time)
+        "watching "
+        + doi_list_path
+        + " and "
+        + config_path
+        + " (every "
+        + str(watch_interval_seconds)
         + " seconds)"
     )
     while True:
-        ## first run the query, if it exists
-        config = configparser.ConfigParser()
-        config.read(config_path)
-        search_query = config["FILTER-criteria"]["search_query"]
-        delete_neo4j = config["NEO4J-settings"]["delete_neo4j"].lower() == "true"
+        changed_paths = file_watcher.get_changed_paths()
+        if config_path in changed_paths:
+            logging.info("config has changed -> reread " + config_path)
+            config = configparser.ConfigParser()
+            config.read(config_path)
+            watch_interval_seconds = float(
+                config["RUN-settings"].get("watch_interval_seconds", fallback="2")
+            )
+            esearch_schedule.configure(
+                parse_cadence(
+                    config["RUN-settings"].get("esearch_cadence", fallback="@hourly")
+                )
+            )
+            ## a changed query or delete_neo4j = True take effect immediately
+            esearch_schedule.run_now()
+            if config["NEO4J-settings"]["delete_neo4j"].lower() == "true":
+                clear_graph = True
+                run_integration = True
+
+        ## refresh the DOI-list by the search query (cron-like cadence)
+        if esearch_schedule.is_due():
+            update_doi_csv_by_query(
+                config["FILTER-criteria"]["search_query"],
+                doi_list_path,
+                watermark_path=config["RUN-settings"].get(
+                    "esearch_watermarks_path",
+                    fallback="/output/esearch_watermarks.json",
+                ),
+            )
+            esearch_schedule.mark_run()
+            changed_paths += file_watcher.get_changed_paths()
+
+        ## changes have been made to "DOI-list.csv"
+        if doi_list_path in changed_paths:
+            if not os.path.isfile(old_doi_list_path) or not filecmp.cmp(
+                old_doi_list_path, doi_list_path, shallow=False
+            ):
+                run_integration = True
+
+        ## check the old integrations regularly (refresh_old_articles)
         max_seconds_check_old_integration = int(
             config["RUN-settings"]["max_seconds_check_old_integration"]
         )
-        update_doi_csv_by_query(search_query, doi_list_path)
+        if time.time() - last_integration >= max_seconds_check_old_integration:
+            run_integration = True
 
-        # logging.info("check if the DOI-list has changed")
-        if os.path.isfile(old_doi_list_path):
-            if (
-                ((filecmp.cmp(old_doi_list_path, doi_list_path)) == True)
-                & (wait_counter_new_integration < max_seconds_check_old_integration)
-                & (delete_neo4j == False)
-            ):
-                # no change -> do nothing
-                wait_counter_new_integration += big_loop_wait_time
-                big_loop_wait_time += 2
-                big_loop_wait_time = min([60, big_loop_wait_time])
-                logging.info("waiting for " + str(big_loop_wait_time) + " seconds")
-            else:
-                ## changes have been made to "DOI-list.csv"
-                # -> start creating the csv and import it to graph
-                run_main_loop(config_path=config_path, waittime=0)
+        if run_integration:
+            # -> start creating the csv and import it to graph
+            run_main_loop(
+                config_path=config_path, waittime=0, clear_graph=clear_graph
+            )
+            clear_graph = False
+            if os.path.isfile(doi_list_path):
                 shutil.copy(doi_list_path, old_doi_list_path)
-                big_loop_wait_time = 2
-                wait_counter_new_integration = 0
-        else:
-            logging.info("old_doi_list is missing")
-            ## this means, it is the first run
-            # -> start creating the csv and graph
-            run_main_loop(config_path=config_path, waittime=10)
-            shutil.copy(doi_list_path, old_doi_list_path)
-            big_loop_wait_time = 2
-        # logging.info("checking again in {waittime} seconds"\
-        #   .format(waittime=big_loop_wait_time))
-        time.sleep(big_loop_wait_time)
+            ## ignore the changes of the integration itself
+            file_watcher.get_changed_paths()
+            run_integration = False
+            last_integration = time.time()
+        time.sleep(watch_interval_seconds)
 
 
 ## __main__ function
@@ -0,0 +1,48 @@
+#!/bin/bash
+## wrapper around the neo4j entrypoint for the cold build of the manager:
+# when the manager has written the neo4j-admin import files (and the
+# import.ready marker), neo4j is stopped, the database is replaced by
+# "neo4j-admin database import full" and neo4j is started again
+IMPORT_DIR=/var/lib/neo4j/import/bulk
+NEO4J_PID=""
+
+stop_neo4j() {
+    if [ -n "$NEO4J_PID" ]; then
+        kill -TERM "$NEO4J_PID" 2>/dev/null
+        wait "$NEO4J_PID"
+    fi
+}
+trap 'stop_neo4j; exit 0' TERM INT
+
+run_import() {
+    echo "cold build: importing $(grep -c . "$IMPORT_DIR/import.args") files"
+    if /startup/docker-entrypoint.sh neo4j-admin database import full \
+            --overwrite-destination=true --skip-duplicate-nodes=true \
+            $(cat "$IMPORT_DIR/import.args") neo4j \
+            > "$IMPORT_DIR/import.log" 2>&1; then
+        touch "$IMPORT_DIR/import.done"
+    else
+        touch "$IMPORT_DIR/import.failed"
+    fi
+    rm -f "$IMPORT_DIR/import.ready"
+}
+
+while true; do
+    if [ -f "$IMPORT_DIR/import.ready" ]; then
+        run_import
+    fi
+    /startup/docker-entrypoint.sh "$@" &
+    NEO4J_PID=$!
+    while kill -0 "$NEO4J_PID" 2>/dev/null; do
+        if [ -f "$IMPORT_DIR/import.ready" ]; then
+            stop_neo4j
+            break
+        fi
+        sleep 5
+    done
+    ## neo4j stopped on its own -> exit with its exit code
+    if [ ! -f "$IMPORT_DIR/import.ready" ]; then
+        wait "$NEO4J_PID"
+        exit $?
+    fi
+done
@@ -0,0 +1,134 @@
+## api_cache.py
+## persistent (sqlite) cache for the results of the api: the results are
+# keyed by the endpoint and the normalized request arguments and tagged with
+# the graph version (on the global stats node, the manager sets it to the
+# timestamp of each run, which also increases across a cleared graph),
+# results of an older graph version are never returned, the least recently
+# used results are evicted (size bound)
+import hashlib
+import json
+import pickle
+import time
+from logging import Logger
+from typing import Callable, Tuple
+
+from helper.sqlite_blob_store import Sqlite_Blob_Store
+
+
+## increase the version to invalidate all cached results (i.e. if the format
+# of the results changes)
+API_CACHE_VERSION = "1"
+
+
+## the order of the arguments does not change the result
+def normalize_arguments(arguments: dict) -> str:
+    return json.dumps(dict(arguments), sort_keys=True, default=str)
+
+
+## only successful results are cached: the neo4j manager returns None, an
+# empty result, a message (i.e. "no result found") or an error string (i.e.
+# "error: wrong goal_entity_operator") for a failed query
+def is_result_cachable(result: object) -> bool:
+    if result is None:
+        return False
+    if isinstance(result, (str, bytes, list, dict)) and len(result) == 0:
+        return False
+    if isinstance(result, str) and (result.startswith("message'")
+                                    or result.startswith("error")):
+        return False
+    if isinstance(result, dict):
+        if "message" in result:
+            return False
+        if "results" in result:
+            return is_result_cachable(result["results"])
+    if isinstance(result, list) and isinstance(result[0], dict) \
+            and "message" in result[0]:
+        return False
+    return True
+
+
+class Api_Cache(Sqlite_Blob_Store):
+    def __init__(self, path: str, max_size_bytes: int = 512 * 1024 ** 2,
+                 get_graph_version: Callable = None,
+                 version_check_seconds: float = 10,
+                 logging: Logger = None) -> None:
+        super().__init__(path, "results",
+                         ["endpoint TEXT", "graph_version TEXT",
+                          "created_at REAL"], max_size_bytes)
+        ## returns the current graph version (i.e. from the global stats)
+        self.get_graph_version_function = get_graph_version
+        self.version_check_seconds = version_check_seconds
+        self.logging = logging
+        self.graph_version = None
+        self.version_checked_at = None
+
+    def _log(self, message: str) -> None:
+        if self.logging != None:
+            self.logging.info(message)
+
+    ## the graph version is checked at most every version_check_seconds,
+    # results of the older versions are deleted, when the version changes (a
+    # failed read keeps the last known version, None = unknown)
+    def get_graph_version(self) -> str:
+        if self.get_graph_version_function == None:
+            return None
+        now = time.monotonic()
+        if self.version_checked_at != None \
+                and now - self.version_checked_at < self.version_check_seconds:
+            return self.graph_version
+        graph_version = self.get_graph_version_function()
+        if graph_version == None:
+            self._log("api cache: the graph version could not be read")
+            return self.graph_version
+        graph_version = str(graph_version)
+        self.version_checked_at = now
+        if graph_version != self.graph_version:
+            self._log("api cache: graph version " + graph_version)
+            self.graph_version = graph_version
+            self.delete_rows("graph_version != ?", (graph_version,))
+        return graph_version
+
+    def get_key(self, endpoint: str, arguments: dict) -> str:
+        key_string = API_CACHE_VERSION + "|" + endpoint + "|" \
+            + normalize_arguments(arguments)
+        return hashlib.sha256(key_string.encode("utf-8")).hexdigest()
+
+    ## (True, result) for a cached result of the graph version, else
+    # (False, None)
+    def get(self, endpoint: str, arguments: dict,
+            graph_version: str = None) -> Tuple[bool, object]:
+        row = self.get_row(self.get_key(endpoint, arguments),
+                           ["graph_version"],
+                           lambda columns: columns[0] == str(graph_version))
+        if row == None:
+            return False, None
+        return True, pickle.loads(row[1])
+
+    def put(self, endpoint: str, arguments: dict, result: object,
+            graph_version: str = None) -> None:
+        self.put_row(self.get_key(endpoint, arguments),
+                     {"endpoint": endpoint,
+                      "graph_version": str(graph_version),
+                      "created_at": time.time()},
+                     pickle.dumps(result))
+
+    ## the cached result or the result of the function (which is cached, if
+    # it is successful and the graph version is known)
+    def get_or_compute(self, endpoint: str, arguments: dict,
+                       function: Callable,
+                       is_cachable: Callable = is_result_cachable) -> object:
+        graph_version = self.get_graph_version()
+        if graph_version == None:
+            return function()
+        found, result = self.get(endpoint, arguments, graph_version)
+        if found:
+            return result
+        result = function()
+        if is_cachable(result):
+            self.put(endpoint, arguments, result, graph_version)
+        return result
+
+    def get_statistics(self) -> dict:
+        statistics = super().get_statistics()
+        statistics["graph_version"] = self.graph_version
+        return statistics
@@ -0,0 +1,78 @@
+## article_registry.py
+## registry of the integrated articles (DOI-list-all.csv): the csv is loaded
+# once into a dict (pubmed_id -> integration date), so the lookups are O(1)
+# and exact (no substring matching)
+import os
+from datetime import datetime
+from typing import Dict, List
+
+
+INTEGRATION_DATE_FORMAT = "%Y-%m-%d|%H:%M:%S"
+CSV_HEADER = "DOI,integration_date\n"
+
+
+class Integrated_Article_Registry:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.articles = {}
+        self.load()
+
+    def load(self) -> None:
+        self.articles = {}
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "r") as read_obj:
+            for index, line in enumerate(read_obj):
+                line = line.strip()
+                if index == 0 or line == "":
+                    continue
+                article_id, _, integration_date = line.partition(",")
+                self.articles[article_id] = integration_date
+
+    def __contains__(self, article_id: str) -> bool:
+        return str(article_id) in self.articles
+
+    def __len__(self) -> int:
+        return len(self.articles)
+
+    ## only write the header (empty registry)
+    def reset(self) -> None:
+        self.articles = {}
+        with open(self.path, "w") as f:
+            f.write(CSV_HEADER)
+
+    ## add the articles with the current date (appended to the csv)
+    def add(self, article_ids: List[str]) -> None:
+        integration_date = datetime.now().strftime(INTEGRATION_DATE_FORMAT)
+        with open(self.path, "a") as f:
+            for article_id in article_ids:
+                self.articles[str(article_id)] = integration_date
+                f.write(str(article_id) + "," + integration_date + "\n")
+
+    ## remove the (at most max_count) articles, which are older than
+    # max_age_seconds, so they will be integrated again (returns the
+    # removed articles)
+    def remove_old_articles(self, max_age_seconds: float,
+                            max_count: int) -> List[str]:
+        old_articles = []
+        now = datetime.now()
+        for article_id, integration_date in self.articles.items():
+            if len(old_articles) >= max_count:
+                break
+            date_object = datetime.strptime(integration_date,
+                                            INTEGRATION_DATE_FORMAT)
+            if (now - date_object).total_seconds() > max_age_seconds:
+                old_articles.append(article_id)
+        for article_id in old_articles:
+            del self.articles[article_id]
+        self.save()
+        return old_articles
+
+    def save(self) -> None:
+        with open(self.path, "w") as f:
+            f.write(CSV_HEADER)
+            for article_id, integration_date in self.articles.items():
+                f.write(article_id + "," + integration_date + "\n")
+
+    def get_integration_dates(self) -> Dict[str, str]:
+        return dict(self.articles)
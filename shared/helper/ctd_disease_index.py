@@ -0,0 +1,94 @@
+## ctd_disease_index.py
+## lookup index of the CTD diseases (ctdbase_disease.csv): every primary and
+# alternative disease id points to its disease row, the index is stored as
+# pickle next to the csv and rebuilt when the csv changes (mtime / size)
+import os
+import pickle
+from logging import Logger
+from typing import List
+
+import pandas as pd
+
+
+CTD_DISEASE_HEADER = ["DiseaseName", "DiseaseID", "AltDiseaseIDs",
+                      "Definition", "ParentIDs", "TreeNumbers",
+                      "ParentTreeNumbers", "Synonyms", "SlimMappings"]
+## the comment lines at the beginning of the csv
+CTD_DISEASE_SKIPROWS = 29
+## disease attribute (of the graph) -> column of the csv
+DISEASE_ATTRIBUTES = {
+    "disease_id": "DiseaseID",
+    "disease_name": "DiseaseName",
+    "disease_definition": "Definition",
+    "disease_altids": "AltDiseaseIDs",
+    "disease_synonyms": "Synonyms",
+}
+
+
+class CTD_Disease_Index:
+    def __init__(self, path: str, index_path: str = None,
+                 logging: Logger = None) -> None:
+        self.path = path
+        self.index_path = index_path if index_path != None \
+            else path + ".index.pkl"
+        self.logging = logging
+        self.index = None
+        self.load()
+
+    def _log(self, message: str) -> None:
+        if self.logging != None:
+            self.logging.info(message)
+
+    def _get_file_signature(self) -> tuple:
+        stat_result = os.stat(self.path)
+        return (stat_result.st_mtime, stat_result.st_size)
+
+    ## lookup id -> disease attributes (primary ids win over alternative
+    # ids, otherwise the first row of an id wins)
+    def build(self) -> pd.DataFrame:
+        df_diseases = pd.read_csv(self.path, skiprows=CTD_DISEASE_SKIPROWS,
+                                  names=CTD_DISEASE_HEADER)
+        df_attributes = pd.DataFrame({
+            attribute: df_diseases[column]
+            for attribute, column in DISEASE_ATTRIBUTES.items()})
+        df_primary = df_attributes.assign(lookup_id=df_diseases["DiseaseID"])
+        df_alternative = df_attributes.assign(
+            lookup_id=df_diseases["AltDiseaseIDs"].fillna("").str.split("|")) \
+            .explode("lookup_id")
+        df_alternative = df_alternative[df_alternative["lookup_id"] != ""]
+        df_index = pd.concat([df_primary, df_alternative])
+        df_index = df_index.drop_duplicates(subset="lookup_id", keep="first")
+        return df_index.set_index("lookup_id")
+
+    def load(self) -> None:
+        signature = self._get_file_signature()
+        if os.path.isfile(self.index_path):
+            try:
+                with open(self.index_path, "rb") as f:
+                    stored_index = pickle.load(f)
+                if stored_index["signature"] == signature:
+                    self.index = stored_index["index"]
+                    return
+            except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+                pass
+        self._log("build the disease index of " + self.path)
+        self.index = self.build()
+        ## the index is only a cache (i.e. read only /global)
+        try:
+            index_path_temp = self.index_path + ".tmp"
+            with open(index_path_temp, "wb") as f:
+                pickle.dump({"signature": signature, "index": self.index}, f)
+            os.replace(index_path_temp, self.index_path)
+        except OSError as err:
+            self._log("could not store the disease index: " + str(err))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    ## resolve all disease ids at once (join with the index), returns the
+    # attributes of the found diseases (with the requested id as lookup_id)
+    def resolve(self, disease_ids: List[str]) -> List[dict]:
+        df_resolved = self.index.reindex(pd.Index(disease_ids,
+                                                  name="lookup_id"))
+        df_resolved = df_resolved[df_resolved["disease_id"].notna()]
+        return df_resolved.reset_index().to_dict("records")
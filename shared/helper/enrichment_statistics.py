@@ -0,0 +1,209 @@
+## enrichment_statistics.py
+## significance of the label abundance: hypergeometric (one sided Fisher)
+# or two sided Fisher's exact p-values of all candidate entities and the
+# Benjamini-Hochberg q-values, computed for the whole count vectors at once
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.special import gammaln
+
+
+STATISTIC_COLUMNS = ["p_value", "q_value"]
+
+
+def _log_binomial(n: np.ndarray, k: np.ndarray) -> np.ndarray:
+    return gammaln(n + 1) - gammaln(k + 1) - gammaln(n - k + 1)
+
+
+## sum of the hypergeometric probabilities from x upwards (or downwards),
+# starting with the probability term of x: the terms are updated by their
+# ratio (a = K, b = n, c = N - K - n), the converged series are dropped every
+# few steps (behind the support the terms are 0)
+def _sum_series(term: np.ndarray, x: np.ndarray, a: np.ndarray,
+                b: np.ndarray, c: np.ndarray, upwards: bool,
+                tolerance: float, steps: int = 16) -> np.ndarray:
+    total = term.copy()
+    active = np.flatnonzero(term > 0)
+    term, x, a, b, c = term[active], x[active], a[active], b[active], \
+        c[active]
+    partial = total[active]
+    while len(active) > 0:
+        for _ in range(steps):
+            if upwards:
+                term = term * ((a - x) * (b - x) / ((x + 1) * (c + x + 1)))
+                x = x + 1
+            else:
+                term = term * (x * (c + x) / ((a - x + 1) * (b - x + 1)))
+                x = x - 1
+            partial = partial + term
+        total[active] = partial
+        running = term > tolerance * partial
+        active, term, x, a, b, c, partial = active[running], \
+            term[running], x[running], a[running], b[running], \
+            c[running], partial[running]
+    return total
+
+
+## P(X >= k) (upper = True) or P(X <= k) of the hypergeometric distribution
+# (population N, K successes, n draws): the tail is summed from k outwards
+# (the terms decrease geometrically behind the mode), the tail across the
+# mode is the complement of the other tail
+def hypergeometric_tail(k: np.ndarray, N: np.ndarray, K: np.ndarray,
+                        n: np.ndarray, upper: bool = True,
+                        tolerance: float = 1e-15) -> np.ndarray:
+    k, N, K, n = [np.atleast_1d(np.asarray(_, dtype=np.float64))
+                  for _ in np.broadcast_arrays(k, N, K, n)]
+    low = np.maximum(0, n - (N - K))
+    high = np.minimum(K, n)
+    mean = n * K / np.maximum(N, 1)
+    ## the summed series runs away from the mode of the distribution:
+    # P(X >= k) = 1 - P(X <= k - 1) and P(X <= k) = 1 - P(X >= k + 1)
+    if upper:
+        sum_upper = k >= mean
+        start = np.where(sum_upper, k, k - 1)
+    else:
+        sum_upper = k > mean
+        start = np.where(sum_upper, k + 1, k)
+    inside = (start >= low) & (start <= high)
+    x = np.clip(start, low, high)
+    term = np.where(inside, np.exp(_log_binomial(K, x)
+                                   + _log_binomial(N - K, n - x)
+                                   - _log_binomial(N, n)), 0.0)
+    total = np.zeros(len(k))
+    for upwards, selected in [(True, sum_upper), (False, ~sum_upper)]:
+        total[selected] = _sum_series(term[selected], x[selected],
+                                      K[selected], n[selected],
+                                      (N - K - n)[selected], upwards,
+                                      tolerance)
+    ## the series is P(X >= start) or P(X <= start)
+    if upper:
+        tail = np.where(sum_upper, total, 1.0 - total)
+    else:
+        tail = np.where(sum_upper, 1.0 - total, total)
+    return np.clip(tail, 0.0, 1.0)
+
+
+## two sided Fisher's exact test (like scipy.stats.fisher_exact): the sum of
+# the probabilities of all tables, which are at most as probable as the
+# observed one (k successes in n draws of N with K successes), the
+# probabilities increase up to the mode and decrease behind it, so these
+# tables are the tail of k and a tail on the other side of the mode, whose
+# bound is found by a (vectorized) binary search
+def fisher_two_sided(k: np.ndarray, N: np.ndarray, K: np.ndarray,
+                     n: np.ndarray) -> np.ndarray:
+    k, N, K, n = [np.atleast_1d(np.asarray(_, dtype=np.float64))
+                  for _ in np.broadcast_arrays(k, N, K, n)]
+    low = np.maximum(0, n - (N - K))
+    high = np.minimum(K, n)
+    mode = np.clip(np.floor((n + 1) * (K + 1) / (N + 2)), low, high)
+    ## log probability of x without the terms, which don't depend on x
+    def log_probability(x, K, n, c):
+        return -(gammaln(x + 1) + gammaln(K - x + 1) + gammaln(n - x + 1)
+                 + gammaln(c + x + 1))
+
+    c = N - K - n
+    ## relative tolerance of scipy for tables with the same probability
+    threshold = log_probability(k, K, n, c) + np.log1p(1e-7)
+    right = k > mode
+    ## right: the last x of [low, mode] below the threshold (low - 1 =
+    # none), left: the first x of [mode, high] below it (high + 1 = none)
+    lower_bound = np.where(right, low - 1, mode - 1)
+    upper_bound = np.where(right, mode + 1, high + 1)
+    active = np.flatnonzero(upper_bound - lower_bound > 1)
+    while len(active) > 0:
+        middle = np.floor((lower_bound[active] + upper_bound[active]) / 2)
+        below = log_probability(middle, K[active], n[active], c[active]) \
+            <= threshold[active]
+        ## the probabilities increase on the left side of the mode
+        move_lower = below == right[active]
+        lower_bound[active] = np.where(move_lower, middle,
+                                       lower_bound[active])
+        upper_bound[active] = np.where(move_lower, upper_bound[active],
+                                       middle)
+        active = active[upper_bound[active] - lower_bound[active] > 1]
+    other = np.where(right, lower_bound, upper_bound)
+    ## the upper tails start at k (right) or at the other bound (left)
+    upper_start = np.where(right, k, other)
+    lower_start = np.where(right, other, k)
+    p_values = np.zeros(len(k))
+    for start, upper in [(upper_start, True), (lower_start, False)]:
+        inside = (start >= low) & (start <= high)
+        p_values[inside] += hypergeometric_tail(
+            start[inside], N[inside], K[inside], n[inside], upper=upper)
+    ## the observed table is the mode: all tables are at most as probable
+    p_values = np.where(k == mode, 1.0, p_values)
+    return np.minimum(p_values, 1.0)
+
+
+## Benjamini-Hochberg q-values of the p-values
+def get_q_values(p_values: np.ndarray) -> np.ndarray:
+    p_values = np.asarray(p_values, dtype=np.float64)
+    count_tests = len(p_values)
+    if count_tests == 0:
+        return p_values
+    order = np.argsort(p_values, kind="mergesort")
+    q_values = p_values[order] * count_tests / np.arange(1, count_tests + 1)
+    q_values = np.minimum.accumulate(q_values[::-1])[::-1]
+    result = np.empty(count_tests)
+    result[order] = np.minimum(q_values, 1.0)
+    return result
+
+
+## p-values and q-values of the label abundance: enrichment of the goal
+# entities in subset 1 (against all articles, one sided) or, for two
+# subsets, the two sided Fisher's exact test of subset 2 against subset 1
+# (the mentions are counted like the articles, they are capped at the counts
+# of the articles)
+def add_enrichment_statistics(df_result: pd.DataFrame, count_articles: int,
+                              count_subset_1: int,
+                              count_subset_2: int = None) -> pd.DataFrame:
+    mentions_1 = df_result["absolute_subset_mentions_1"].to_numpy(
+        dtype=np.float64)
+    if count_subset_2 == None:
+        N = np.full(len(df_result), float(count_articles))
+        n = np.minimum(float(count_subset_1), N)
+        K = np.minimum(df_result["absolute_mentions"].to_numpy(
+            dtype=np.float64), N)
+        k = np.minimum(np.minimum(mentions_1, K), n)
+        p_values = hypergeometric_tail(k, N, K, n, upper=True)
+    else:
+        mentions_2 = df_result["absolute_subset_mentions_2"].to_numpy(
+            dtype=np.float64)
+        n_1 = float(count_subset_1)
+        n = float(count_subset_2)
+        k = np.minimum(mentions_2, n)
+        N = np.full(len(df_result), n_1 + n)
+        K = np.minimum(mentions_1, n_1) + k
+        p_values = fisher_two_sided(k, N, K, n)
+    df_result["p_value"] = p_values
+    df_result["q_value"] = get_q_values(p_values)
+    return df_result
+
+
+## [(column, ascending), ...] of a sort string like "q_value, score DESC"
+def get_sort_columns(sort_string: str) -> List[Tuple[str, bool]]:
+    sort_columns = []
+    for sort_part in sort_string.split(","):
+        sort_split = sort_part.split()
+        if len(sort_split) == 0 or len(sort_split) > 2 \
+                or (len(sort_split) == 2
+                    and sort_split[1].upper() not in ["ASC", "DESC"]):
+            raise ValueError("not a valid sort string: " + sort_string)
+        sort_columns.append((sort_split[0], len(sort_split) == 1
+                             or sort_split[1].upper() == "ASC"))
+    return sort_columns
+
+
+## sort the label abundance (stable, missing values last)
+def sort_label_abundance(df_result: pd.DataFrame,
+                         sort_string: str) -> pd.DataFrame:
+    sort_columns = get_sort_columns(sort_string)
+    for column, ascending in sort_columns:
+        if column not in df_result.columns:
+            raise ValueError("not a valid sort column: " + column)
+    ## mergesort per column (last key first) keeps the order of equal rows
+    for column, ascending in reversed(sort_columns):
+        df_result = df_result.sort_values(column, ascending=ascending,
+                                          kind="mergesort")
+    return df_result.reset_index(drop=True)
@@ -0,0 +1,278 @@
+## esearch_harvester.py
+## incremental harvesting of the pubmed ids of a search query: the last
+# harvested (entrez) date of every query is stored as watermark, the next
+# harvest only asks for the records since the watermark
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from logging import Logger
+from typing import Callable, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+
+DATE_FORMAT = "%Y/%m/%d"
+MIN_DATE = "1900/01/01"
+## esearch only returns the first 9999 records of a query (also with the
+# history server), larger date windows are split
+MAX_RECORDS_PER_WINDOW = 9999
+## parameters, which are set by the harvester (they don't define the query)
+HARVESTER_PARAMETERS = ["retmax", "retstart", "mindate", "maxdate",
+                        "datetype", "usehistory", "WebEnv", "query_key"]
+
+
+def set_query_parameters(search_query: str, parameters: dict) -> str:
+    parsed_url = urlparse(search_query)
+    query_parameters = [(key, value) for key, value in parse_qsl(
+        parsed_url.query, keep_blank_values=True) if key not in parameters]
+    query_parameters.extend(parameters.items())
+    return parsed_url._replace(query=urlencode(query_parameters,
+                                               safe="/,:")).geturl()
+
+
+## the watermark key does not depend on the harvester parameters (i.e. a new
+# retmax does not start a new full harvest)
+def get_query_key(search_query: str) -> str:
+    parsed_url = urlparse(search_query)
+    query_parameters = sorted([(key, value) for key, value in parse_qsl(
+        parsed_url.query, keep_blank_values=True)
+        if key not in HARVESTER_PARAMETERS and key != "sort"])
+    key_string = parsed_url.path + "?" + urlencode(query_parameters)
+    return hashlib.sha256(key_string.encode("utf-8")).hexdigest()
+
+
+def previous_date(date: str) -> str:
+    return (datetime.strptime(date, DATE_FORMAT) - timedelta(days=1)) \
+        .strftime(DATE_FORMAT)
+
+
+## split the date window into years or months (the first and last period
+# are cut at min_date and max_date)
+def split_into_periods(min_date: str, max_date: str,
+                       unit: str) -> List[Tuple[str, str]]:
+    periods = []
+    start_date = datetime.strptime(min_date, DATE_FORMAT)
+    end_date = datetime.strptime(max_date, DATE_FORMAT)
+    period_start = start_date
+    while period_start <= end_date:
+        if unit == "year":
+            next_start = datetime(period_start.year + 1, 1, 1)
+        else:
+            next_start = datetime(period_start.year + period_start.month // 12,
+                                  period_start.month % 12 + 1, 1)
+        period_end = min(end_date, next_start - timedelta(days=1))
+        periods.append((period_start.strftime(DATE_FORMAT),
+                        period_end.strftime(DATE_FORMAT)))
+        period_start = next_start
+    return periods
+
+
+## the map_function (i.e. Fetch_Engine.map) runs the count probes and the
+# planned windows concurrently, the request_function has to respect the
+# rate limits
+class Esearch_Harvester:
+    def __init__(self, request_function: Callable, watermark_path: str,
+                 page_size: int = MAX_RECORDS_PER_WINDOW,
+                 logging: Logger = None, map_function: Callable = None) -> None:
+        self.request_function = request_function
+        self.map_function = map_function if map_function != None \
+            else lambda function, items: list(map(function, items))
+        self.count_requests = 0
+        self.watermark_path = watermark_path
+        self.page_size = min(page_size, MAX_RECORDS_PER_WINDOW)
+        self.logging = logging
+        self.failed_windows = []
+        self.watermarks = {}
+        if os.path.isfile(watermark_path):
+            with open(watermark_path, "r") as f:
+                self.watermarks = json.load(f)
+
+    def _log(self, message: str) -> None:
+        if self.logging != None:
+            self.logging.info(message)
+
+    ## the esearchresult of the response (None, if the request failed)
+    def _request_json(self, url: str) -> dict:
+        result = self.request_function(url)
+        if result == None:
+            return None
+        try:
+            result_json = result.json()
+        except ValueError:
+            return None
+        if result_json == None or "esearchresult" not in result_json:
+            return None
+        return result_json["esearchresult"]
+
+    def get_watermark(self, search_query: str) -> str:
+        watermark = self.watermarks.get(get_query_key(search_query))
+        return watermark["last_date"] if watermark != None else None
+
+    def set_watermark(self, search_query: str, last_date: str) -> None:
+        self.watermarks[get_query_key(search_query)] = {
+            "query": search_query, "last_date": last_date}
+        watermark_path_temp = self.watermark_path + ".tmp"
+        with open(watermark_path_temp, "w") as f:
+            json.dump(self.watermarks, f, indent=2)
+        os.replace(watermark_path_temp, self.watermark_path)
+
+    ## all pubmed ids of the query in the date window (entrez date), the
+    # first request stores the result on the history server, further pages
+    # are requested by WebEnv and query_key; returns the pubmed ids (None if
+    # the window has too many records) and the number of requests
+    def fetch_window(self, search_query: str, min_date: str,
+                     max_date: str) -> Tuple[List[str], int]:
+        esearch_result = self._request_json(set_query_parameters(
+            search_query, {"datetype": "edat", "mindate": min_date,
+                           "maxdate": max_date, "usehistory": "y",
+                           "retstart": "0", "retmax": str(self.page_size)}))
+        if esearch_result == None:
+            self.failed_windows.append((min_date, max_date))
+            return [], 1
+        count_results = int(esearch_result.get("count", 0))
+        if count_results > MAX_RECORDS_PER_WINDOW and min_date != max_date:
+            return None, 1
+        ## a single day with too many records can't be split: only the first
+        # records are fetched, the window is failed (the watermark is kept)
+        if count_results > MAX_RECORDS_PER_WINDOW:
+            self._log("esearch: " + str(count_results) + " records on "
+                      + min_date + ", only the first "
+                      + str(MAX_RECORDS_PER_WINDOW) + " can be fetched")
+            self.failed_windows.append((min_date, max_date))
+        pubmed_ids = list(esearch_result.get("idlist", []))
+        count_requests = 1
+        retstart = len(pubmed_ids)
+        while retstart < min(count_results, MAX_RECORDS_PER_WINDOW):
+            ## a failed (or empty) page leaves records of the window unfetched:
+            # the window is failed, so the watermark is kept
+            if "webenv" not in esearch_result:
+                self.failed_windows.append((min_date, max_date))
+                break
+            esearch_page = self._request_json(set_query_parameters(
+                search_query, {"WebEnv": esearch_result["webenv"],
+                               "query_key": esearch_result["querykey"],
+                               "usehistory": "y", "retstart": str(retstart),
+                               "retmax": str(self.page_size)}))
+            count_requests += 1
+            if esearch_page == None or len(esearch_page.get("idlist", [])) == 0:
+                self.failed_windows.append((min_date, max_date))
+                break
+            pubmed_ids.extend(esearch_page["idlist"])
+            retstart += len(esearch_page["idlist"])
+        return pubmed_ids, count_requests
+
+    ## number of records of the query in the date window (None = failed)
+    def probe_count(self, search_query: str, min_date: str,
+                    max_date: str) -> int:
+        esearch_result = self._request_json(set_query_parameters(
+            search_query, {"datetype": "edat", "mindate": min_date,
+                           "maxdate": max_date, "retstart": "0",
+                           "retmax": "0"}))
+        if esearch_result == None:
+            return None
+        return int(esearch_result.get("count", 0))
+
+    ## plan the date windows of a large harvest up front: the counts of all
+    # years (and of the months of the years with too many records) are
+    # probed concurrently, consecutive periods are merged into windows with
+    # at most MAX_RECORDS_PER_WINDOW records
+    def plan_windows(self, search_query: str, min_date: str,
+                     max_date: str) -> List[Tuple[str, str]]:
+        periods = split_into_periods(min_date, max_date, "year")
+        windows = []
+        for level in ["year", "month"]:
+            counts = self.map_function(
+                lambda period: self.probe_count(search_query, *period),
+                periods)
+            self.count_requests += len(periods)
+            large_periods = []
+            current_window = None
+            current_count = 0
+            for period, count in zip(periods, counts):
+                ## failed probes are fetched as their own window
+                if count == None:
+                    count = MAX_RECORDS_PER_WINDOW
+                if count > MAX_RECORDS_PER_WINDOW and level == "year":
+                    large_periods.append(period)
+                    continue
+                if current_window != None and current_window[1] \
+                        == previous_date(period[0]) and current_count + count \
+                        <= MAX_RECORDS_PER_WINDOW:
+                    current_window = (current_window[0], period[1])
+                    current_count += count
+                else:
+                    if current_window != None:
+                        windows.append(current_window)
+                    current_window = period
+                    current_count = count
+            if current_window != None:
+                windows.append(current_window)
+            ## the months of the large years
+            periods = [month for year in large_periods
+                       for month in split_into_periods(*year, "month")]
+            if len(periods) == 0:
+                break
+        return sorted(windows)
+
+    ## harvest all pubmed ids of the query, which have been added since the
+    # watermark (full harvest, if there is no watermark or full = True)
+    def harvest(self, search_query: str, full: bool = False) -> List[str]:
+        today = datetime.now().strftime(DATE_FORMAT)
+        watermark = None if full else self.get_watermark(search_query)
+        ## the day of the watermark is requested again (records of that day
+        # may have been added after the last harvest)
+        min_date = watermark if watermark != None else MIN_DATE
+        pubmed_ids = []
+        self.count_requests = 0
+        self.failed_windows = []
+        ## usually (incremental harvest) one window is enough
+        window_ids, count_window = self.fetch_window(search_query, min_date,
+                                                     today)
+        self.count_requests += count_window
+        windows = []
+        if window_ids != None:
+            pubmed_ids.extend(window_ids)
+        else:
+            ## large harvest: plan the windows and fetch them concurrently
+            planned_windows = self.plan_windows(search_query, min_date, today)
+            self._log("esearch: planned " + str(len(planned_windows))
+                      + " date windows")
+            results = self.map_function(
+                lambda window: self.fetch_window(search_query, *window),
+                planned_windows)
+            for window, (window_ids, count_window) in zip(planned_windows,
+                                                          results):
+                self.count_requests += count_window
+                if window_ids == None:
+                    windows.append(window)
+                else:
+                    pubmed_ids.extend(window_ids)
+        ## windows, which are still too large (i.e. the records have changed
+        # since the planning or a month with too many records)
+        while len(windows) > 0:
+            min_date, max_date = windows.pop(0)
+            window_ids, count_window = self.fetch_window(search_query,
+                                                         min_date, max_date)
+            self.count_requests += count_window
+            if window_ids == None:
+                ## too many records -> halve the date window
+                start_date = datetime.strptime(min_date, DATE_FORMAT)
+                end_date = datetime.strptime(max_date, DATE_FORMAT)
+                middle_date = start_date + timedelta(
+                    days=(end_date - start_date).days // 2)
+                windows.insert(0, ((middle_date + timedelta(days=1))
+                                   .strftime(DATE_FORMAT), max_date))
+                windows.insert(0, (min_date,
+                                   middle_date.strftime(DATE_FORMAT)))
+                continue
+            pubmed_ids.extend(window_ids)
+        self._log("harvested " + str(len(pubmed_ids)) + " pubmed ids since "
+                  + str(watermark) + " with " + str(self.count_requests)
+                  + " requests")
+        ## failed windows are requested again with the next harvest
+        if len(self.failed_windows) == 0:
+            self.set_watermark(search_query, today)
+        else:
+            self._log("esearch failed for the windows "
+                      + str(self.failed_windows) + " -> keep the watermark")
+        return list(dict.fromkeys(pubmed_ids))
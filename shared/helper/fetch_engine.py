@@ -0,0 +1,148 @@
+## fetch_engine.py
+## concurrent, rate limited fetching of the NCBI APIs (PubTator3 and E-utilities)
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
+
+
+## NCBI allows 3 requests per second for E-utilities without an API key,
+# PubTator3 asks for the same limit
+DEFAULT_REQUESTS_PER_SECOND = 3.0
+
+
+## token bucket: every request takes one token, tokens are refilled with
+# a constant rate, the capacity allows short bursts
+class Rate_Limiter:
+    def __init__(self, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                 capacity: float = None) -> None:
+        self.lock = threading.Lock()
+        self.configure(requests_per_second, capacity)
+
+    def configure(self, requests_per_second: float,
+                  capacity: float = None) -> None:
+        with self.lock:
+            self.rate = float(requests_per_second)
+            self.capacity = float(capacity) if capacity != None \
+                else max(1.0, self.rate)
+            self.tokens = min(getattr(self, "tokens", self.capacity),
+                              self.capacity)
+            self.last_refill = time.monotonic()
+
+    ## block until a token is available
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens \
+                                  + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait_time = (1.0 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+## one rate limiter per API (the quotas are counted per service)
+rate_limiters = {
+    "eutils": Rate_Limiter(DEFAULT_REQUESTS_PER_SECOND),
+    "pubtator": Rate_Limiter(DEFAULT_REQUESTS_PER_SECOND),
+    "default": Rate_Limiter(0),
+}
+
+
+def get_api_name(url: str) -> str:
+    parsed_url = urlparse(url)
+    if parsed_url.netloc == "eutils.ncbi.nlm.nih.gov":
+        return "eutils"
+    elif "/research/pubtator" in parsed_url.path:
+        return "pubtator"
+    else:
+        return "default"
+
+
+def get_rate_limiter(url: str) -> Rate_Limiter:
+    return rate_limiters[get_api_name(url)]
+
+
+def configure_rate_limits(eutils_requests_per_second: float,
+                          pubtator_requests_per_second: float) -> None:
+    rate_limiters["eutils"].configure(eutils_requests_per_second)
+    rate_limiters["pubtator"].configure(pubtator_requests_per_second)
+
+
+## requests.Session is not guaranteed to be thread safe -> one session
+# (with its own connection pool / keep-alive) per thread
+thread_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    if not hasattr(thread_local, "session"):
+        thread_local.session = requests.Session()
+    return thread_local.session
+
+
+## the fetch engine runs the requests of a batch concurrently, the shared
+# rate limiters (used by the request_function) keep the engine within the
+# NCBI quotas
+class Fetch_Engine:
+    def __init__(self, request_function: Callable, max_workers: int = 8,
+                 max_attempts: int = 10, logging: Logger = None) -> None:
+        self.request_function = request_function
+        self.logging = logging
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def configure(self, max_workers: int, max_attempts: int = None) -> None:
+        if max_attempts != None:
+            self.max_attempts = max_attempts
+        if max_workers != self.max_workers:
+            self.executor.shutdown(wait=True)
+            self.max_workers = max_workers
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+    ## request the url until the request was successful, at most
+    # max_attempts times (None = failed, the worker is not blocked forever by
+    # a url, which always fails)
+    def fetch_until_success(self, url: str) -> requests.Response:
+        for count_requests in range(1, self.max_attempts + 1):
+            response = self.request_function(url)
+            if count_requests > 1 and self.logging != None:
+                self.logging.info("count_requests = " + str(count_requests))
+            ## quota exceeded or server error -> try again after a short wait
+            if response != None and (response.status_code == 429
+                                     or response.status_code >= 500):
+                response = None
+            if response != None:
+                return response
+            if self.logging != None:
+                self.logging.info("Request failed: " + url)
+            if count_requests < self.max_attempts:
+                time.sleep(min(count_requests, 10))
+        if self.logging != None:
+            self.logging.info("giving up after " + str(self.max_attempts)
+                              + " attempts: " + url)
+        return None
+
+    ## fetch all urls concurrently, the responses keep the order of the urls
+    def fetch_all(self, urls: List[str]) -> List[requests.Response]:
+        return list(self.executor.map(self.fetch_until_success, urls))
+
+    ## fetch all (unique) urls concurrently and return a url -> response dict
+    def fetch_dict(self, urls: List[str]) -> Dict[str, requests.Response]:
+        unique_urls = list(dict.fromkeys(urls))
+        return dict(zip(unique_urls, self.fetch_all(unique_urls)))
+
+    ## apply any function concurrently on a list of items (keeps the order)
+    def map(self, function: Callable, items: list) -> list:
+        return list(self.executor.map(function, items))
@@ -0,0 +1,117 @@
+## integration_pipeline.py
+## staged pipeline for the article integration: every stage (i.e. meta data
+# fetch, citation link fetch, row building) has its own worker pool and the
+# results are handed to a single writer in the order of the batches, so the
+# network bound stages of the next batches overlap with the database writes
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import Logger
+from typing import Callable, Iterable, List, Tuple
+
+
+## a stage is (name, function, workers): the function gets the result of the
+# previous stage (the first stage gets the batch), the writer gets the result
+# of the last stage
+class Integration_Pipeline:
+    def __init__(self, stages: List[Tuple[str, Callable, int]],
+                 writer: Callable, max_pending_batches: int = 4,
+                 logging: Logger = None) -> None:
+        self.stages = [(name, function,
+                        ThreadPoolExecutor(max_workers=max(1, workers),
+                                           thread_name_prefix=name))
+                       for name, function, workers in stages]
+        self.writer = writer
+        ## batches in flight (bounds the memory of the fetched meta data)
+        self.max_pending_batches = max(1, max_pending_batches)
+        self.logging = logging
+        self.failed = threading.Event()
+        self.lock = threading.Lock()
+        self.statistics = {name: {"batches": 0, "seconds": 0.0}
+                           for name in [stage[0] for stage in self.stages]
+                           + ["writer", "writer_waiting"]}
+
+    def _log(self, message: str) -> None:
+        if self.logging != None:
+            self.logging.info(message)
+
+    def _add_time(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.statistics[name]["batches"] += 1
+            self.statistics[name]["seconds"] += seconds
+
+    def _run_stage(self, stage_index: int, value: object) -> object:
+        ## skip the remaining work of a failed run
+        if self.failed.is_set():
+            raise RuntimeError("integration pipeline stopped")
+        name, function, executor = self.stages[stage_index]
+        start_time = time.monotonic()
+        result = function(value)
+        self._add_time(name, time.monotonic() - start_time)
+        return result
+
+    ## submit the value to the stage, the next stage is submitted when the
+    # stage is done (the result_future gets the result of the last stage)
+    def _submit(self, stage_index: int, value: object,
+                result_future: Future) -> None:
+        executor = self.stages[stage_index][2]
+
+        def on_done(future: Future) -> None:
+            try:
+                if future.exception() != None:
+                    result_future.set_exception(future.exception())
+                elif stage_index + 1 < len(self.stages):
+                    self._submit(stage_index + 1, future.result(),
+                                 result_future)
+                else:
+                    result_future.set_result(future.result())
+            except Exception as err:
+                if not result_future.done():
+                    result_future.set_exception(err)
+
+        executor.submit(self._run_stage, stage_index, value) \
+            .add_done_callback(on_done)
+
+    def _start(self, batch: object) -> Future:
+        result_future = Future()
+        if len(self.stages) == 0:
+            result_future.set_result(batch)
+        else:
+            self._submit(0, batch, result_future)
+        return result_future
+
+    def _write(self, result_future: Future) -> None:
+        start_time = time.monotonic()
+        value = result_future.result()
+        self._add_time("writer_waiting", time.monotonic() - start_time)
+        start_time = time.monotonic()
+        self.writer(value)
+        self._add_time("writer", time.monotonic() - start_time)
+
+    ## run all batches through the stages, the writer runs in the calling
+    # thread (the first error stops the pipeline and is raised)
+    def run(self, batches: Iterable) -> None:
+        pending = deque()
+        try:
+            for batch in batches:
+                pending.append(self._start(batch))
+                if len(pending) >= self.max_pending_batches:
+                    self._write(pending.popleft())
+            while len(pending) > 0:
+                self._write(pending.popleft())
+        except BaseException:
+            self.failed.set()
+            raise
+        finally:
+            self._log("integration pipeline: " + str(self.get_statistics()))
+
+    def get_statistics(self) -> dict:
+        with self.lock:
+            return {name: {"batches": values["batches"],
+                           "seconds": round(values["seconds"], 2)}
+                    for name, values in self.statistics.items()}
+
+    def close(self) -> None:
+        for name, function, executor in self.stages:
+            executor.shutdown(wait=True)
@@ -0,0 +1,433 @@
+## mention_matrix.py
+## sparse article x entity matrices for the label abundance: the mentions
+# (Article -> entity) and the gene jumps (GO term / pathway / drug -> gene)
+# are exported from neo4j into CSR matrices (numpy files, memory mapped),
+# the enrichment of a subset is then a sum over the rows of its articles
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+from logging import Logger
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from helper.enrichment_statistics import add_enrichment_statistics, \
+    sort_label_abundance
+
+
+## labels with precomputed mention counts (the number of article paths of the
+# label abundance): mentioned by the articles directly or via the genes
+MENTION_COUNT_LABELS = ["Article", "gene", "disease", "chemical", "species",
+                        "mutation", "cellline"]
+MENTION_COUNT_GENE_LABELS = ["GO_BP", "GO_CC", "GO_MF", "pathway_reactome",
+                             "pathway_wikipathways", "pathway_kegg",
+                             "pathway_netpath", "pathway_biocarta",
+                             "pathway_pid", "drug"]
+## the entity labels of the matrices (the articles are the rows)
+MATRIX_LABELS = [label for label in MENTION_COUNT_LABELS if label != "Article"]
+MATRIX_OPERATORS = ["=", "<>", "contains", "starts with", "ends with",
+                    "is null", "is not null"]
+
+
+## returned attributes of the goal entities of the label abundance:
+# [(property, column), ...]
+def get_label_abundance_attributes(goal_entity_label: str) \
+        -> List[Tuple[str, str]]:
+    if goal_entity_label == "Article":
+        return [("name", "pubmed_id"), ("pmc_id", "pmc_id"),
+                ("label", "label"), ("b_title", "title"),
+                ("age_in_days", "age_in_days"), ("epubdate", "epubdate"),
+                ("journal", "journal"), ("authors", "authors"),
+                ("date_integration", "date_integration"), ("name", "db_name")]
+    if goal_entity_label == "gene":
+        return [("entrezgene", "entrez_gene"), ("label", "label"),
+                ("symbol", "symbol"), ("ensembl_ids", "ensembl_ids"),
+                ("name", "db_name"), ("alias", "alias")]
+    if goal_entity_label == "chemical":
+        return [("name", "mesh_chemical"), ("label", "label"),
+                ("name", "db_name")]
+    if goal_entity_label == "disease":
+        return [("name", "mesh_disease"), ("label", "label"),
+                ("name", "db_name")]
+    if goal_entity_label in ["GO_BP", "GO_CC", "GO_MF"]:
+        return [("name", "name"), ("term", "term"), ("evidence", "evidence"),
+                ("qualifier", "qualifier"), ("gocategory", "gocategory")]
+    if goal_entity_label in MENTION_COUNT_GENE_LABELS \
+            and goal_entity_label != "drug":
+        return [("name", "name"), ("label", "label"), ("id", "id")]
+    if goal_entity_label == "drug":
+        return [("name", "name"), ("label", "label"), ("approved", "approved")]
+    return [("name", "name"), ("label", "label")]
+
+
+## one csv field like apoc.export.csv (lists and maps as json)
+def get_csv_field(value: object) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, separators=(",", ":"))
+    return str(value).replace('"', '""')
+
+
+## the label abundance response of get_label_abundance: the apoc csv with
+# the same replacements (";" separated, no quotes)
+def get_label_abundance_csv(df_result: pd.DataFrame) -> str:
+    lines = ['"' + '","'.join(df_result.columns) + '"']
+    for row in df_result.itertuples(index=False):
+        lines.append('"' + '","'.join([get_csv_field(value)
+                                       for value in row]) + '"')
+    response_string = "\n".join(lines) + "\n"
+    return response_string.replace('","', '|').replace('"', '')\
+        .replace(";", ",").replace("|", ";")
+
+
+def _save_csr(matrix_dir: str, name: str, matrix: sparse.csr_matrix) -> dict:
+    for part in ["data", "indices", "indptr"]:
+        np.save(os.path.join(matrix_dir, name + "_" + part + ".npy"),
+                getattr(matrix, part))
+    return {"shape": list(matrix.shape)}
+
+
+def _load_csr(matrix_dir: str, name: str, shape: List[int]) \
+        -> sparse.csr_matrix:
+    data, indices, indptr = [
+        np.load(os.path.join(matrix_dir, name + "_" + part + ".npy"),
+                mmap_mode="r")
+        for part in ["data", "indices", "indptr"]]
+    return sparse.csr_matrix((data, indices, indptr), shape=tuple(shape),
+                             copy=False)
+
+
+## stream the (integer) columns of the query result into numpy arrays
+def _fetch_id_columns(driver: object, query: str,
+                      columns: List[str]) -> List[np.ndarray]:
+    values = [array("q") for _ in columns]
+    with driver.session() as session:
+        for record in session.run(query):
+            for index, column in enumerate(columns):
+                values[index].append(record[column])
+    return [np.frombuffer(column_values, dtype=np.int64)
+            if len(column_values) > 0 else np.zeros(0, dtype=np.int64)
+            for column_values in values]
+
+
+## position of the node ids in the sorted ids of the rows / columns
+def _get_positions(sorted_ids: np.ndarray, node_ids: np.ndarray) \
+        -> np.ndarray:
+    return np.searchsorted(sorted_ids, node_ids).astype(np.int32)
+
+
+## export the mention matrices of the graph into a new directory and switch
+# the manifest of matrix_dir to it (the readers keep the old files until
+# they reload)
+def export_mention_matrices(neo4j_manager: object, matrix_dir: str,
+                            graph_version: int = None,
+                            logging: Logger = None) -> dict:
+    start_time = time.time()
+    os.makedirs(matrix_dir, exist_ok=True)
+    build_name = "build_" + str(int(start_time * 1000))
+    build_dir = os.path.join(matrix_dir, build_name)
+    os.makedirs(build_dir)
+    driver = neo4j_manager.driver
+    (article_ids,) = _fetch_id_columns(
+        driver, "MATCH (a:Article) RETURN ID(a) AS id ORDER BY id", ["id"])
+    np.save(os.path.join(build_dir, "articles.npy"), article_ids)
+    manifest = {"build": build_name, "graph_version": graph_version,
+                "count_articles": int(len(article_ids)), "labels": {}}
+    entity_ids = {}
+    for label in MATRIX_LABELS + MENTION_COUNT_GENE_LABELS:
+        attributes = get_label_abundance_attributes(label)
+        properties = list(dict.fromkeys(["name", "label"] + [
+            attribute for attribute, column in attributes]))
+        with driver.session() as session:
+            df_entities = pd.DataFrame(
+                [record.values() for record in session.run(
+                    "MATCH (e:" + label + ") RETURN ID(e) AS db_id, "
+                    + ", ".join(["e." + attribute + " AS " + attribute
+                                 for attribute in properties])
+                    + " ORDER BY db_id")],
+                columns=["db_id"] + properties)
+        df_entities.to_pickle(os.path.join(build_dir, label + ".pkl"))
+        entity_ids[label] = df_entities["db_id"].to_numpy(dtype=np.int64)
+        manifest["labels"][label] = {"count_entities": len(df_entities)}
+
+    ## direct mentions: article x entity
+    for label in MATRIX_LABELS:
+        start_ids, end_ids = _fetch_id_columns(
+            driver, "MATCH (a:Article)-->(e:" + label + ") "
+            "RETURN ID(a) AS start_id, ID(e) AS end_id",
+            ["start_id", "end_id"])
+        shape = (len(article_ids), len(entity_ids[label]))
+        ## duplicated pairs (several relationships) are summed like paths
+        matrix = sparse.csr_matrix(
+            (np.ones(len(start_ids), dtype=np.int32),
+             (_get_positions(article_ids, start_ids),
+              _get_positions(entity_ids[label], end_ids))), shape=shape)
+        manifest["labels"][label]["matrix"] = _save_csr(
+            build_dir, "mentions_" + label, matrix)
+    ## gene jumps: object x gene
+    for label in MENTION_COUNT_GENE_LABELS:
+        start_ids, end_ids = _fetch_id_columns(
+            driver, "MATCH (e:" + label + ")-->(g:gene) "
+            "RETURN ID(e) AS start_id, ID(g) AS end_id",
+            ["start_id", "end_id"])
+        shape = (len(entity_ids[label]), len(entity_ids["gene"]))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(start_ids), dtype=np.int32),
+             (_get_positions(entity_ids[label], start_ids),
+              _get_positions(entity_ids["gene"], end_ids))), shape=shape)
+        manifest["labels"][label]["matrix"] = _save_csr(
+            build_dir, "genes_" + label, matrix)
+
+    manifest_path = os.path.join(matrix_dir, "manifest.json")
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    ## remove the older builds, but the previous one (the running requests
+    # of the readers may still load its files, open memory maps stay valid)
+    build_names = sorted([name for name in os.listdir(matrix_dir)
+                          if name.startswith("build_")],
+                         key=lambda name: int(name[len("build_"):]))
+    for name in build_names[:-2]:
+        shutil.rmtree(os.path.join(matrix_dir, name), ignore_errors=True)
+    if logging != None:
+        logging.info("exported the mention matrices in "
+                     + str(round(time.time() - start_time, 2)) + " seconds: "
+                     + str(manifest["count_articles"]) + " articles")
+    return manifest
+
+
+## one export of the matrices (the manifest and its lazily loaded files):
+# a request keeps the build, which it has started with
+class Mention_Matrix_Build:
+    def __init__(self, matrix_dir: str, manifest: dict) -> None:
+        self.manifest = manifest
+        self.build_dir = os.path.join(matrix_dir, manifest["build"])
+        self.entities = {}
+        self.matrices = {}
+        self.mention_counts = {}
+
+    def get_entities(self, label: str) -> pd.DataFrame:
+        if label not in self.entities:
+            self.entities[label] = pd.read_pickle(
+                os.path.join(self.build_dir, label + ".pkl"))
+        return self.entities[label]
+
+    def get_matrix(self, label: str) -> sparse.csr_matrix:
+        if label not in self.matrices:
+            name = ("genes_" if label in MENTION_COUNT_GENE_LABELS
+                    else "mentions_") + label
+            self.matrices[label] = _load_csr(
+                self.build_dir, name,
+                self.manifest["labels"][label]["matrix"]["shape"])
+        return self.matrices[label]
+
+    ## mentions (article paths) of each goal entity in the articles (row
+    # indices, None = all articles)
+    def get_mentions(self, label: str, rows: np.ndarray = None) -> np.ndarray:
+        if label in MENTION_COUNT_GENE_LABELS:
+            gene_mentions = self.get_mentions("gene", rows)
+            return self.get_matrix(label).dot(gene_mentions)
+        if rows is None:
+            if label not in self.mention_counts:
+                self.mention_counts[label] = np.asarray(
+                    self.get_matrix(label).sum(axis=0)).ravel()
+            return self.mention_counts[label]
+        return np.asarray(self.get_matrix(label)[rows].sum(axis=0)).ravel()
+
+    ## entities of the label, which fulfill toLower(attribute) operator value
+    # (like cypher: a comparison with null is never true, only "is null"
+    # matches the missing attributes)
+    def _get_entity_indicator(self, label: str, attribute: str,
+                              operator: str, value: str) -> np.ndarray:
+        raw_values = self.get_entities(label)[attribute]
+        is_null = raw_values.isna()
+        if operator == "is null":
+            return is_null.to_numpy(dtype=np.int64)
+        if operator == "is not null":
+            return (~is_null).to_numpy(dtype=np.int64)
+        if value == None:
+            return np.zeros(len(raw_values), dtype=np.int64)
+        values = raw_values.where(~is_null, "").astype(str).str.lower()
+        value = value.lower()
+        if operator == "=":
+            mask = values == value
+        elif operator == "<>":
+            mask = values != value
+        elif operator == "contains":
+            mask = values.str.contains(value, regex=False)
+        elif operator == "starts with":
+            mask = values.str.startswith(value)
+        else:
+            mask = values.str.endswith(value)
+        return (mask & ~is_null).to_numpy(dtype=np.int64)
+
+    ## rows of the subset and the number of rows of the cypher subset query
+    # (the product of the matching filter entities of each article)
+    def get_subset(self, labels: List[str], attributes: List[str],
+                   operators: List[str], values: List[str]) \
+            -> Tuple[np.ndarray, int]:
+        multiplicity = np.ones(self.manifest["count_articles"], dtype=np.int64)
+        for label, attribute, operator, value in zip(labels, attributes,
+                                                     operators, values):
+            indicator = self._get_entity_indicator(
+                label, attribute, " ".join(operator.lower().split()), value)
+            multiplicity *= self.get_matrix(label).dot(indicator)
+        return np.flatnonzero(multiplicity), int(multiplicity.sum())
+
+
+## answers the label abundance from the exported matrices (None = the
+# request needs the cypher query, i.e. article filters)
+class Mention_Matrix:
+    def __init__(self, matrix_dir: str, logging: Logger = None) -> None:
+        self.matrix_dir = matrix_dir
+        self.manifest_path = os.path.join(matrix_dir, "manifest.json")
+        self.logging = logging
+        self.manifest_signature = None
+        self.build = None
+        ## the api threads share the current build
+        self.lock = threading.Lock()
+
+    ## the current build, (re)loaded if the export has changed (None = no
+    # export): the new build replaces the old one, once its manifest is read
+    def load(self) -> Mention_Matrix_Build:
+        with self.lock:
+            try:
+                stat_result = os.stat(self.manifest_path)
+            except FileNotFoundError:
+                self.build = None
+                self.manifest_signature = None
+                return None
+            signature = (stat_result.st_mtime, stat_result.st_size)
+            if signature != self.manifest_signature:
+                with open(self.manifest_path, "r") as f:
+                    build = Mention_Matrix_Build(self.matrix_dir,
+                                                 json.load(f))
+                self.build = build
+                self.manifest_signature = signature
+            return self.build
+
+    def is_supported(self, goal_entity_label: str, filters: list,
+                     goal_entity_attribute: str = None,
+                     list_article_attributes: List[str] = None) -> bool:
+        if goal_entity_label not in MATRIX_LABELS + MENTION_COUNT_GENE_LABELS:
+            return False
+        if goal_entity_attribute or list_article_attributes:
+            return False
+        for labels, attributes, operators, values in filters:
+            for label, attribute, operator in zip(labels, attributes,
+                                                  operators):
+                if label not in MATRIX_LABELS \
+                        or attribute not in ["name", "label"] \
+                        or " ".join(operator.lower().split()) \
+                        not in MATRIX_OPERATORS:
+                    return False
+        return True
+
+    ## same result as Neo4j_Manager.get_label_abundance (None = not
+    # supported by the matrices)
+    def get_label_abundance_frame(self, goal_entity_label: str,
+            list_filter_entity_labels_1: List[str],
+            list_filter_entity_attributes_1: List[str],
+            list_filter_entity_operators_1: List[str],
+            list_filter_entity_values_1: List[str],
+            list_filter_entity_labels_2: List[str] = None,
+            list_filter_entity_attributes_2: List[str] = None,
+            list_filter_entity_operators_2: List[str] = None,
+            list_filter_entity_values_2: List[str] = None,
+            goal_entity_attribute: str = None,
+            list_article_attributes: List[str] = None,
+            goal_entity_min_mentions: int = 10,
+            sort_string: str = "score DESC") -> pd.DataFrame:
+        filters = [(list_filter_entity_labels_1,
+                    list_filter_entity_attributes_1,
+                    list_filter_entity_operators_1,
+                    list_filter_entity_values_1)]
+        if list_filter_entity_labels_2 != None:
+            filters.append((list_filter_entity_labels_2,
+                            list_filter_entity_attributes_2,
+                            list_filter_entity_operators_2,
+                            list_filter_entity_values_2))
+        if not self.is_supported(goal_entity_label, filters,
+                                 goal_entity_attribute,
+                                 list_article_attributes):
+            return None
+        build = self.load()
+        if build == None:
+            return None
+        count_articles = build.manifest["count_articles"]
+        subsets = [build.get_subset(*subset_filter)
+                   for subset_filter in filters]
+
+        absolute_mentions = build.get_mentions(goal_entity_label)
+        subset_mentions = [build.get_mentions(goal_entity_label, rows)
+                           for rows, count_rows in subsets]
+        selected = (absolute_mentions > goal_entity_min_mentions) \
+            & (subset_mentions[0] > 0)
+        if len(subsets) > 1:
+            selected &= subset_mentions[1] > 0
+        df_entities = build.get_entities(goal_entity_label)[selected]
+        absolute_mentions = absolute_mentions[selected]
+        expected_mentions = absolute_mentions / count_articles
+        absolute_subset_mentions_1 = subset_mentions[0][selected]
+        relative_subset_mentions_1 = absolute_subset_mentions_1 / subsets[0][1]
+        score_1 = np.round(relative_subset_mentions_1 / expected_mentions, 4)
+
+        columns = {"score": score_1}
+        if len(subsets) > 1:
+            absolute_subset_mentions_2 = subset_mentions[1][selected]
+            relative_subset_mentions_2 = absolute_subset_mentions_2 \
+                / subsets[1][1]
+            columns["score"] = relative_subset_mentions_2 \
+                / expected_mentions / score_1
+            ## like the cypher query: ascending by the ratio of the subsets
+            sort_string = "score"
+        for attribute, column in get_label_abundance_attributes(
+                goal_entity_label):
+            columns[column] = df_entities[attribute].to_numpy()
+        columns["absolute_mentions"] = absolute_mentions
+        columns["expected_mentions"] = expected_mentions
+        columns["absolute_subset_mentions_1"] = absolute_subset_mentions_1
+        columns["relative_subset_mentions_1"] = relative_subset_mentions_1
+        columns["db_id"] = df_entities["db_id"].to_numpy()
+        if len(subsets) > 1:
+            columns["absolute_subset_mentions_2"] = absolute_subset_mentions_2
+            columns["relative_subset_mentions_2"] = relative_subset_mentions_2
+        df_result = pd.DataFrame(columns)
+        df_result = add_enrichment_statistics(
+            df_result, count_articles,
+            *[count_rows for rows, count_rows in subsets])
+        return sort_label_abundance(df_result, sort_string)
+
+    ## the csv response of get_label_abundance (None = not supported)
+    def get_label_abundance(self, *args, **kwargs) -> str:
+        df_result = self.get_label_abundance_frame(*args, **kwargs)
+        if df_result is None:
+            return None
+        if len(df_result) == 0:
+            return "message':'no result found'"
+        return get_label_abundance_csv(df_result)
+
+
+## compare the cypher query with the matrices (seconds per request)
+def benchmark_label_abundance(neo4j_manager: object,
+                              mention_matrix: Mention_Matrix,
+                              requests: List[dict],
+                              repeats: int = 3) -> List[Dict[str, float]]:
+    timings = []
+    for request in requests:
+        timing = {}
+        for name, function in [
+                ("cypher", neo4j_manager.get_label_abundance),
+                ("matrix", mention_matrix.get_label_abundance)]:
+            start_time = time.perf_counter()
+            for _ in range(repeats):
+                function(**request)
+            timing[name] = (time.perf_counter() - start_time) / repeats
+        timings.append(timing)
+    return timings
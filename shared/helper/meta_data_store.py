@@ -0,0 +1,135 @@
+## meta_data_store.py
+## per run store of the article meta data: every pubmed_id is fetched only
+# once per run (the responses of the NCBI APIs are additionally kept in the
+# on-disk response cache across runs), the store keeps at most max_entries
+# articles (the least recently used are evicted and fetched again if needed)
+import threading
+from collections import OrderedDict
+import pandas as pd
+from logging import Logger
+from typing import Callable, Dict, List
+
+
+META_DATA_COLUMNS = [
+    "title",
+    "abstract",
+    "annotations",
+    "sortpubdate",
+    "epubdate",
+    "authors",
+    "journal",
+    "pmc_id",
+]
+
+
+## build the meta data frame (index = pubmed_ids) from the meta data records,
+# if any pubmed_id is missing, the whole frame is empty
+def get_meta_data_frame(meta_data: Dict[str, dict], pubmed_ids: list,
+                        logging: Logger = None) -> pd.DataFrame:
+    pubmed_ids_all = [str(pubmed_id) for pubmed_id in pubmed_ids]
+    if all(meta_data.get(pubmed_id) != None for pubmed_id in pubmed_ids_all):
+        df_content = {}
+        for column in META_DATA_COLUMNS:
+            df_content[column] = [
+                meta_data[pubmed_id][column] for pubmed_id in pubmed_ids_all
+            ]
+        return_df = pd.DataFrame(data=df_content, index=pubmed_ids)
+    else:
+        return_df = pd.DataFrame()
+        if logging != None:
+            logging.info(
+                "Error: index has not the same size as the metadata-dataframe "
+                "-> skipping the following batch" + str(pubmed_ids)
+            )
+    return return_df
+
+
+## the fetch_function(pubmed_ids, bioconcepts=..., run_pubtator=...) returns
+# the meta data records (pubmed_id -> dict) of the found pubmed_ids
+class Meta_Data_Store:
+    def __init__(self, fetch_function: Callable, max_entries: int = 50000,
+                 logging: Logger = None) -> None:
+        self.fetch_function = fetch_function
+        self.max_entries = max_entries
+        self.logging = logging
+        self.lock = threading.Lock()
+        self.meta_data = OrderedDict()
+        self.settings = None
+        self.count_requested = 0
+        self.count_fetched = 0
+        self.count_evicted = 0
+
+    def configure(self, max_entries: int) -> None:
+        with self.lock:
+            self.max_entries = max_entries
+            self._evict()
+
+    ## start a new run (forget all meta data)
+    def clear(self) -> None:
+        with self.lock:
+            self.meta_data = OrderedDict()
+            self.settings = None
+            self.count_requested = 0
+            self.count_fetched = 0
+            self.count_evicted = 0
+
+    ## remove the least recently used articles above max_entries (the lock
+    # is held by the caller)
+    def _evict(self) -> None:
+        while len(self.meta_data) > self.max_entries:
+            self.meta_data.popitem(last=False)
+            self.count_evicted += 1
+
+    ## fetch the meta data of all unknown pubmed_ids (missing pubmed_ids are
+    # stored as None, so they are not requested again)
+    def prefetch(self, pubmed_ids: List[str], bioconcepts: str = "none",
+                 run_pubtator: bool = True) -> None:
+        with self.lock:
+            ## the annotations depend on the settings
+            if self.settings != (bioconcepts, run_pubtator):
+                self.meta_data = OrderedDict()
+                self.settings = (bioconcepts, run_pubtator)
+            pubmed_ids_new = []
+            for pubmed_id in dict.fromkeys([str(_) for _ in pubmed_ids]):
+                if pubmed_id in self.meta_data:
+                    self.meta_data.move_to_end(pubmed_id)
+                else:
+                    pubmed_ids_new.append(pubmed_id)
+            self.count_requested += len(pubmed_ids)
+            self.count_fetched += len(pubmed_ids_new)
+        if len(pubmed_ids_new) == 0:
+            return
+        meta_data_new = self.fetch_function(
+            pubmed_ids_new, bioconcepts=bioconcepts, run_pubtator=run_pubtator)
+        with self.lock:
+            for pubmed_id in pubmed_ids_new:
+                self.meta_data[pubmed_id] = meta_data_new.get(pubmed_id)
+            self._evict()
+
+    ## same result as get_meta_data: a data frame with the meta data of all
+    # pubmed_ids (empty, if the meta data of any pubmed_id is missing)
+    def get_meta_data(self, pubmed_ids: List[str], bioconcepts: str = "none",
+                      run_pubtator: bool = True) -> pd.DataFrame:
+        self.prefetch(pubmed_ids, bioconcepts=bioconcepts,
+                      run_pubtator=run_pubtator)
+        with self.lock:
+            meta_data = {str(pubmed_id): self.meta_data.get(str(pubmed_id))
+                         for pubmed_id in pubmed_ids}
+            ## evicted in the meantime (more articles in flight than
+            # max_entries)
+            missing_ids = [pubmed_id for pubmed_id in meta_data
+                           if pubmed_id not in self.meta_data]
+        if len(missing_ids) > 0:
+            meta_data.update(self.fetch_function(
+                missing_ids, bioconcepts=bioconcepts,
+                run_pubtator=run_pubtator))
+        return get_meta_data_frame(meta_data, pubmed_ids, logging=self.logging)
+
+    def get_statistics(self) -> dict:
+        with self.lock:
+            return {
+                "requested": self.count_requested,
+                "fetched": self.count_fetched,
+                "stored": len(self.meta_data),
+                "evicted": self.count_evicted,
+            }
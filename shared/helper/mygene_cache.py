@@ -0,0 +1,153 @@
+## mygene_cache.py
+## local cache of the mygene documents (keyed by entrez id, with the fetch
+# timestamp): new genes are queried in large batches, known genes are served
+# from the cache and stale entries are refreshed (before the enrichment or
+# in the background)
+import json
+import sqlite3
+import threading
+import time
+from logging import Logger
+from typing import Dict, List
+
+
+MYGENE_FIELDS = "symbol,name,alias,entrezgene,refseq.rna,ensembl.gene,taxid,"\
+                "pathway.kegg,pathway.reactome,pathway.biocarta,"\
+                "pathway.netpath,pathway.wikipathways,pathway.pid,"\
+                "go,type_of_gene,summary"
+
+
+## the client needs querymany (like mygene.MyGeneInfo), the documents of a
+# gene (mygene can return several hits per query, or a notfound document)
+# are stored as json list
+class Mygene_Cache:
+    def __init__(self, path: str, client: object,
+                 max_age_seconds: float = 30 * 24 * 3600,
+                 batch_size: int = 1000, fields: str = MYGENE_FIELDS,
+                 logging: Logger = None) -> None:
+        self.path = path
+        self.client = client
+        self.max_age_seconds = max_age_seconds
+        self.batch_size = batch_size
+        self.fields = fields
+        self.logging = logging
+        self.lock = threading.Lock()
+        ## one client call at a time (foreground and background refresh)
+        self.client_lock = threading.Lock()
+        self.refresh_thread = None
+        self.count_hits = 0
+        self.count_queried = 0
+        self.count_refreshed = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS genes (entrez_id TEXT PRIMARY KEY, "
+                "documents TEXT, fetched_at REAL)")
+            self.connection.commit()
+
+    def _log(self, message: str) -> None:
+        if self.logging != None:
+            self.logging.info(message)
+
+    def _load(self, entrez_ids: List[str]) -> Dict[str, tuple]:
+        entries = {}
+        with self.lock:
+            for index in range(0, len(entrez_ids), 500):
+                batch = entrez_ids[index:index + 500]
+                for entrez_id, documents, fetched_at in self.connection.execute(
+                        "SELECT entrez_id, documents, fetched_at FROM genes "
+                        "WHERE entrez_id IN ("
+                        + ",".join(["?"] * len(batch)) + ")", batch):
+                    entries[entrez_id] = (json.loads(documents), fetched_at)
+        return entries
+
+    ## query mygene in batches and store the documents (returns them per
+    # entrez id)
+    def _query(self, entrez_ids: List[str]) -> Dict[str, List[dict]]:
+        documents = {}
+        for index in range(0, len(entrez_ids), self.batch_size):
+            batch = entrez_ids[index:index + self.batch_size]
+            with self.client_lock:
+                result = self.client.querymany(batch, scopes="entrezgene",
+                                               fields=self.fields,
+                                               returnall=True)
+            batch_documents = {entrez_id: [] for entrez_id in batch}
+            for document in result["out"]:
+                batch_documents.setdefault(str(document["query"]), []) \
+                    .append(document)
+            fetched_at = time.time()
+            with self.lock:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO genes VALUES (?, ?, ?)",
+                    [(entrez_id, json.dumps(gene_documents), fetched_at)
+                     for entrez_id, gene_documents in batch_documents.items()])
+                self.connection.commit()
+            documents.update(batch_documents)
+        return documents
+
+    ## the mygene documents of the genes (like querymany(...)["out"]), only
+    # the genes, which are not in the cache, are queried
+    def get_documents(self, entrez_ids: List[str]) -> List[dict]:
+        entrez_ids = list(dict.fromkeys([str(_) for _ in entrez_ids]))
+        entries = self._load(entrez_ids)
+        documents = {entrez_id: entry[0] for entrez_id, entry in entries.items()}
+        new_ids = [entrez_id for entrez_id in entrez_ids
+                   if entrez_id not in documents]
+        self.count_hits += len(documents)
+        self.count_queried += len(new_ids)
+        if len(new_ids) > 0:
+            self._log("mygene: query " + str(len(new_ids)) + " new genes, "
+                      + str(len(documents)) + " genes from the cache")
+            documents.update(self._query(new_ids))
+        return [document for entrez_id in entrez_ids
+                for document in documents.get(entrez_id, [])]
+
+    def get_stale_ids(self, max_count: int = None) -> List[str]:
+        query = "SELECT entrez_id FROM genes WHERE fetched_at < ? " \
+                "ORDER BY fetched_at"
+        parameters = [time.time() - self.max_age_seconds]
+        if max_count != None:
+            query += " LIMIT ?"
+            parameters.append(max_count)
+        with self.lock:
+            return [row[0] for row in self.connection.execute(query,
+                                                              parameters)]
+
+    ## query the stale entries again (returns the refreshed entrez ids)
+    def refresh_stale(self, max_count: int = None) -> List[str]:
+        stale_ids = self.get_stale_ids(max_count)
+        if len(stale_ids) > 0:
+            self._log("mygene: refresh " + str(len(stale_ids))
+                      + " stale genes")
+            self._query(stale_ids)
+            self.count_refreshed += len(stale_ids)
+        return stale_ids
+
+    ## refresh the stale entries in a daemon thread (if no refresh is
+    # running)
+    def start_background_refresh(self, max_count: int = None) -> None:
+        if self.refresh_thread != None and self.refresh_thread.is_alive():
+            return
+
+        def refresh() -> None:
+            try:
+                self.refresh_stale(max_count)
+            except Exception as err:
+                self._log("mygene: background refresh failed: " + str(err))
+
+        self.refresh_thread = threading.Thread(target=refresh, daemon=True)
+        self.refresh_thread.start()
+
+    def get_statistics(self) -> dict:
+        with self.lock:
+            count_entries = self.connection.execute(
+                "SELECT count(*) FROM genes").fetchone()[0]
+        return {"entries": count_entries, "hits": self.count_hits,
+                "queried": self.count_queried,
+                "refreshed": self.count_refreshed}
+
+    def close(self) -> None:
+        if self.refresh_thread != None:
+            self.refresh_thread.join()
+        self.connection.close()
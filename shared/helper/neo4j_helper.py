@@ -3,6 +3,7 @@
 import json
 from logging import Logger
 import os
+import re
 import time
 import traceback
 import sys
@@ -13,8 +14,17 @@ from datetime import datetime
 from neo4j import exceptions
 from neo4j import GraphDatabase
 from typing import List, Set, Dict, Tuple
-from pathlib import Path
+from helper.api_cache import Api_Cache, is_result_cachable
+from helper.ctd_disease_index import CTD_Disease_Index, DISEASE_ATTRIBUTES
+from helper.enrichment_statistics import add_enrichment_statistics, \
+    sort_label_abundance
 from helper.graph_classes import Node_Factory
+from helper.mention_matrix import MENTION_COUNT_GENE_LABELS, \
+    MENTION_COUNT_LABELS, get_label_abundance_attributes, \
+    get_label_abundance_csv
+from helper.mygene_cache import MYGENE_FIELDS, Mygene_Cache
+from helper.reference_index import MeSH_Index, Taxonomy_Index
+from helper.response_cache import get_response_cache
 import pandas as pd
 
 import matplotlib.pyplot as plt
@@ -27,12 +37,19 @@ import seaborn as sns
 
 ## request something followed by a delay (pubmed allows 3 requests per second)
 def request_with_delay(url, api_delay = 0.0, my_timeout = 8.0):#= 0.35):
+    response_cache = get_response_cache()
+    if response_cache != None:
+        cached_response = response_cache.get(url)
+        if cached_response != None:
+            return cached_response
     try:
         response = requests.get(url, timeout=my_timeout)
     except (requests.exceptions.Timeout, requests.exceptions.ConnectionError)\
             as err:
         return None#'Server taking too long. Try again later'
     else:
+        if response_cache != None:
+            response_cache.put(url, response)
         time.sleep(api_delay)
         return response  
 
@@ -58,11 +75,82 @@ def get_ensembl_genelist(entry: object) -> List[str]:
     
     return ensembl_genelist
 
-def add_quotes(str_in: str) -> str:
-    return "\'"+replace_quotes(str_in)+"\'"
+## transform the mygene results into rows for the batched writes: the gene
+# rows ({name, properties}) and the rows of the objects (GO terms, pathways)
+# per (object_label, relationship_str) ({gene, name, properties})
+def get_mygene_rows(gene_queries: List[dict]) \
+        -> Tuple[List[dict], Dict[Tuple[str, str], List[dict]]]:
+    gene_rows = []
+    object_rows = {}
+    for gene_query in gene_queries:
+        gene_name = "Gene:" + str(gene_query['query'])
+        ## if the gene cannot be found by mygene, don't search for it again
+        if 'notfound' in gene_query:
+            if gene_query['notfound'] == True:
+                gene_query['entrezgene'] = gene_query['query']
+
+        gene_properties = {}
+        if 'ensembl' in gene_query:
+            gene_properties["ensembl_ids"] = ", ".join(
+                get_ensembl_genelist(gene_query['ensembl']))
+        if 'alias' in gene_query:
+            if isinstance(gene_query['alias'], list):
+                gene_properties["alias"] = ", ".join(gene_query['alias'])
+            else:
+                gene_properties["alias"] = str(gene_query['alias'])
+        if 'refseq' in gene_query:
+            for refseq_attribute in gene_query['refseq']:
+                refseq_value = gene_query['refseq'][refseq_attribute]
+                if isinstance(refseq_value, list):
+                    refseq_value = ", ".join(refseq_value)
+                gene_properties['refseq_' + refseq_attribute] = \
+                    str(refseq_value)
+        for simple_field in ["taxid", "symbol", "type_of_gene", "summary",
+                             "entrezgene"]:
+            if simple_field in gene_query:
+                gene_properties[simple_field] = str(gene_query[simple_field])
+        gene_rows.append({"name": gene_name, "properties": gene_properties})
+
+        if 'go' in gene_query:
+            for go_category in gene_query['go']:
+                go_category_list = gene_query['go'][go_category]
+                if (isinstance(go_category_list, dict)):
+                    go_category_list = [go_category_list]
+                if go_category not in ["BP", "MF", "CC"]:
+                    raise Exception("wrong go category "+go_category)
+                object_key = ("GO_" + go_category,
+                              "-[:GO_" + go_category + "_contains_gene]->")
+                for go_term in go_category_list:
+                    object_rows.setdefault(object_key, []).append({
+                        "gene": gene_name, "name": go_term['id'],
+                        "properties": {
+                            "evidence": str(go_term.get('evidence',
+                                                        "empty_evidence")),
+                            "gocategory": go_category,
+                            "qualifier": str(go_term.get('qualifier',
+                                                         "empty_qualifier")),
+                            "term": str(go_term.get('term', "empty_term"))}})
+
+        if 'pathway' in gene_query:
+            for pathway_category in gene_query['pathway']:
+                pathway_category_list = gene_query['pathway']\
+                                        [pathway_category]
+                if (isinstance(pathway_category_list, dict)):
+                    pathway_category_list = [pathway_category_list]
+                if pathway_category not in ["kegg", "reactome",
+                                            "wikipathways", "netpath",
+                                            "pid", "biocarta"]:
+                    raise Exception("wrong pathway category " \
+                                    + pathway_category)
+                object_key = ("pathway_" + pathway_category,
+                              "-[:" + pathway_category + "_contains_gene]->")
+                for pathway_term in pathway_category_list:
+                    object_rows.setdefault(object_key, []).append({
+                        "gene": gene_name, "name": pathway_term['id'],
+                        "properties": {"id": str(pathway_term['id']),
+                                       "label": str(pathway_term['name'])}})
+    return gene_rows, object_rows
 
-def replace_quotes(str_in: str) -> str:
-    return str(str_in).replace("\\", "/").replace("'", "\\'")
 
 def is_attribute_string(attribute):
     bool_return = True
@@ -77,6 +165,67 @@ def is_convertible_to_float(value: str) -> bool:
   except:
     return False
 
+## labels, properties and relationship types can't be query parameters: they
+# are only templated into a query, if they are plain identifiers, all values
+# are passed as $parameters (so neo4j can reuse the cached query plans)
+CYPHER_IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+CYPHER_RELATIONSHIP_PATTERN = re.compile(
+    r"^<?-\[:[A-Za-z_][A-Za-z0-9_]*\]->?$")
+CYPHER_OPERATORS = ["=", "<", ">", ">=", "<=", "<>", "is null", "is not null",
+                    "starts with", "ends with", "contains"]
+## operators without a value
+CYPHER_NULL_OPERATORS = ["is null", "is not null"]
+
+def cypher_identifier(identifier: str) -> str:
+    if not isinstance(identifier, str) \
+            or not CYPHER_IDENTIFIER_PATTERN.match(identifier):
+        raise ValueError("not a valid label / property: " + str(identifier))
+    return identifier
+
+def cypher_relationship(relationship_str: str) -> str:
+    if not CYPHER_RELATIONSHIP_PATTERN.match(str(relationship_str)):
+        raise ValueError("not a valid relationship: " + str(relationship_str))
+    return relationship_str
+
+def cypher_operator(operator: str) -> str:
+    operator = " ".join(str(operator).lower().split())
+    if operator not in CYPHER_OPERATORS:
+        raise ValueError("operator not supported: " + str(operator))
+    return operator
+
+## i.e. "property ASC, other_property DESC"
+def cypher_sort_string(sort_string: str) -> str:
+    for sort_part in sort_string.split(","):
+        sort_split = sort_part.split()
+        if len(sort_split) == 0 or len(sort_split) > 2 \
+                or (len(sort_split) == 2
+                    and sort_split[1].upper() not in ["ASC", "DESC"]):
+            raise ValueError("not a valid sort string: " + sort_string)
+        cypher_identifier(sort_split[0])
+    return sort_string
+
+## comparison of an expression with the parameter $parameter_name (the
+# operators "is null" and "is not null" don't use the parameter)
+def get_cypher_comparison(expression: str, operator: str,
+                          parameter_name: str) -> str:
+    operator = cypher_operator(operator)
+    if operator in CYPHER_NULL_OPERATORS:
+        return expression + " " + operator
+    return expression + " " + operator + " $" + parameter_name
+
+## property assignments / equality checks for a node: ["n.key = $from_0", ...]
+# and the parameters {"from_0": value, ...}
+def get_cypher_properties(variable: str, keys: List[str], values: List[str],
+                          parameter_prefix: str) -> Tuple[List[str], dict]:
+    properties = []
+    parameters = {}
+    for index, key in enumerate(keys):
+        parameter_name = parameter_prefix + "_" + str(index)
+        properties.append(variable + "." + cypher_identifier(key) + " = $"
+                          + parameter_name)
+        parameters[parameter_name] = values[index]
+    return properties, parameters
+
 def neo4j_create_entities_command(bioconcepts: str) -> str:
         ret_string = ""
         anno_index = 0
@@ -88,7 +237,9 @@ def neo4j_create_entities_command(bioconcepts: str) -> str:
                 ", ',') | MERGE(a"+str_anno_index+":" + entity_class + \
                 " { name:split(annotation"+str_anno_index+",\";\")[0] })"\
                 " ON CREATE SET a"+str_anno_index+".label=split(annotation"\
-                + str_anno_index+",\";\")[1] MERGE (p1)-[:has_named_entity]"\
+                + str_anno_index+",\";\")[1] SET a" + str_anno_index + \
+                ".integration_run = $integration_run "\
+                "MERGE (p1)-[:has_named_entity]"\
                 "->(a" + str_anno_index + ") ) \n" + \
                 "FOREACH (annotation"+str_anno_index_plus_one+" in split(line."\
                 "reference_" + entity_class + ", ',') | MERGE(a" \
@@ -96,11 +247,83 @@ def neo4j_create_entities_command(bioconcepts: str) -> str:
                 " { name:split(annotation" + str_anno_index_plus_one \
                 + ",\";\")[0] }) ON CREATE SET a" + str_anno_index_plus_one \
                 + ".label=split(annotation" + str_anno_index_plus_one \
-                + ",\";\")[1] MERGE (p2)-[:has_named_entity]->(a" \
+                + ",\";\")[1] SET a" + str_anno_index_plus_one \
+                + ".integration_run = $integration_run "\
+                "MERGE (p2)-[:has_named_entity]->(a" \
                 + str_anno_index_plus_one + ") ) \n"
             anno_index += 2
         return ret_string
 
+## MERGE part of the citation graph import for each csv line (the line is
+# either a LOAD CSV line or a row of the bulk import), all merged articles
+# and entities are tagged with the $integration_run
+def neo4j_create_citation_graph_command(bioconcepts: str) -> str:
+    str_adding_annotations = neo4j_create_entities_command(bioconcepts)
+    date_now = str(datetime.now().strftime('%Y-%m-%d'))
+    return ("MERGE (p1:Article { name: line.article }) "
+            "ON CREATE SET p1.a_name = line.article, "\
+                "p1.label = line.article, "\
+                "p1.b_title = line.article_title, "\
+                "p1.pmc_id = line.article_pmc_id, "\
+                "p1.epubdate = line.article_epubdate, "\
+                "p1.authors = line.article_authors, "\
+                "p1.journal = line.article_journal, "\
+                "p1.z_abstract = line.article_abstract, "\
+                "p1.date_integration = '" + date_now + "' "
+            "ON MATCH SET p1.a_name = line.article, "\
+                "p1.label = line.article, "\
+                "p1.b_title = line.article_title, "\
+                "p1.pmc_id = line.article_pmc_id, "\
+                "p1.epubdate = line.article_epubdate, "\
+                "p1.authors = line.article_authors, "\
+                "p1.journal = line.article_journal, "\
+                "p1.z_abstract = line.article_abstract, "\
+                "p1.date_integration = '" + date_now + "' "
+            "SET p1.integration_run = $integration_run "
+            "MERGE (p2:Article { name: line.reference }) "
+            "ON CREATE SET p2.a_name = line.reference, "\
+                "p2.label = line.reference, "\
+                "p2.b_title = line.reference_title, "\
+                "p2.pmc_id = line.reference_pmc_id, "\
+                "p2.epubdate = line.reference_epubdate, "\
+                "p2.authors = line.reference_authors, "\
+                "p2.journal = line.reference_journal, "\
+                "p2.z_abstract = line.reference_abstract, "\
+                "p2.date_integration = '" + date_now + "' "
+            "ON MATCH SET p2.a_name = line.reference, "\
+                "p2.label = line.reference, "\
+                "p2.b_title = line.reference_title, "\
+                "p2.pmc_id = line.reference_pmc_id, "\
+                "p2.epubdate = line.reference_epubdate, "\
+                "p2.authors = line.reference_authors, "\
+                "p2.journal = line.reference_journal, "\
+                "p2.z_abstract = line.reference_abstract, "\
+                "p2.date_integration = '" + date_now + "' "
+            "SET p2.integration_run = $integration_run "
+            "FOREACH (keyword1 in split(line.article_keywords, ',') | "\
+                "MERGE (k1:Keyword { name: keyword1 }) MERGE "\
+                "(p1)-[:contains]->(k1) ) " ""
+            "FOREACH (keyword2 in split(line.reference_keywords, ',') | "\
+                "MERGE (k2:Keyword { name: keyword2 }) "\
+                "MERGE (p2)-[:contains]->(k2) ) " \
+                + str_adding_annotations \
+                + "MERGE (p1)-[:citing]->(p2)")
+
+## parse the citation csv text into rows (dicts) like LOAD CSV does: empty
+# and missing fields are null
+def get_citation_rows(csv_text: str) -> List[dict]:
+    lines = csv_text.split("\n")
+    header = lines[0].split("|")
+    rows = []
+    for line in lines[1:]:
+        if line == "":
+            continue
+        values = line.split("|")
+        rows.append({column: values[index] \
+                     if index < len(values) and values[index] != "" else None
+                     for index, column in enumerate(header)})
+    return rows
+
 def get_color_for_label(label: str = ""):
     color = "grey"
     if label == "chemical":
@@ -119,6 +342,8 @@ class Neo4j_Manager:
             logging: Logger = None) -> None:
         self.logging = logging
         self.mg = mygene.MyGeneInfo()
+        ## see get_cytoscape_cache
+        self.cytoscape_cache = None
         while True:
             try:
                 self.driver = GraphDatabase.driver(uri, auth=(user, password))
@@ -128,20 +353,40 @@ class Neo4j_Manager:
             break
 
     def close(self) -> None:
+        if self.cytoscape_cache != None:
+            self.cytoscape_cache.close()
         self.driver.close()
             
-    def create_citation_graph(self, bioconcepts: str) -> None:
+    def create_citation_graph(self, bioconcepts: str,
+                              integration_run: int = None) -> None:
         with self.driver.session() as session:
             session.write_transaction(self._create_citation_graph, 
-                                      bioconcepts)
+                                      bioconcepts, integration_run)
     
+    ## bulk import of the citation rows (see get_citation_rows) with
+    # rows_per_transaction rows per UNWIND transaction
+    def create_citation_graph_bulk(self, rows: List[dict], bioconcepts: str,
+                                   rows_per_transaction: int = 1000,
+                                   integration_run: int = None) -> None:
+        with self.driver.session() as session:
+            for index in range(0, len(rows), rows_per_transaction):
+                session.write_transaction(
+                    self._create_citation_graph_bulk,
+                    rows[index:index + rows_per_transaction], bioconcepts,
+                    integration_run)
+
     def clear_graph(self) -> None:
         with self.driver.session() as session:
             session.write_transaction(self._clear_graph)
     
-    def cleanup_null_nodes(self) -> None:
+    ## the "Null" nodes of the labels (uses the name indices) or of the
+    # whole graph (labels = None), the neighbors of the deleted nodes are
+    # tagged with the integration_run (their mention counts change)
+    def cleanup_null_nodes(self, labels: List[str] = None,
+                           integration_run: int = None) -> None:
         with self.driver.session() as session:
-            session.write_transaction(self._cleanup_null_nodes)
+            session.write_transaction(self._cleanup_null_nodes, labels,
+                                      integration_run)
 
     def cleanup_duplicated_edges(self) -> None:
         with self.driver.session() as session:
@@ -154,18 +399,121 @@ class Neo4j_Manager:
     def calculate_and_write_article_rank(self) -> None:
         with self.driver.session() as session:
             session.write_transaction(self._calculate_and_write_article_rank)
-   
-    ## send query to neo4j and return response
-    def query(self, query: str, db=None, log_queries = True) -> list:
+
+    ## next id of the integration runs (counter on the global stats node),
+    # a resumed run keeps the current id
+    def start_integration_run(self, resume: bool = False) -> int:
+        with self.driver.session() as session:
+            return session.write_transaction(self._start_integration_run,
+                                             0 if resume else 1)
+
+    ## a periodic task of the whole graph (i.e. the article rank) is due, if
+    # the timestamp property of the global stats node is older than
+    # interval_seconds (0 = never)
+    def is_global_task_due(self, timestamp_property: str,
+                           interval_seconds: int) -> bool:
+        if interval_seconds <= 0:
+            return False
+        result = self.query(
+            "MATCH (s:Stats {name: 'global_stats'}) "
+            "RETURN apoc.date.currentTimestamp() - s."
+            + cypher_identifier(timestamp_property) + " AS age",
+            log_queries=False)
+        if result == None or len(result) == 0 or result[0]["age"] == None:
+            return True
+        return result[0]["age"] / 1000 >= interval_seconds
+
+    def get_global_stats_property(self, stats_property: str):
+        result = self.query(
+            "MATCH (s:Stats {name: 'global_stats'}) "
+            "RETURN s." + cypher_identifier(stats_property) + " AS value",
+            log_queries=False)
+        if result == None or len(result) == 0:
+            return None
+        return result[0]["value"]
+
+    ## precompute the mention counts of the label abundance (the number of
+    # articles and the mentions of each entity), integration_run: only the
+    # entities tagged with the run (new mentions, merged by the curation or
+    # neighbors of deleted "Null" nodes) and the objects of the tagged genes
+    # (None = all entities)
+    def update_mention_counts(self, integration_run: int = None) -> None:
+        for label in MENTION_COUNT_LABELS:
+            match_clause = "MATCH (n:" + cypher_identifier(label) + ") "
+            if integration_run != None:
+                match_clause += "WHERE n.integration_run = $integration_run "
+            self.query(
+                match_clause + "CALL { WITH n SET n.mention_count = "
+                "COUNT { (n)<--(:Article) } } IN TRANSACTIONS OF 10000 ROWS",
+                log_queries=False,
+                parameters={"integration_run": integration_run})
+        for label in MENTION_COUNT_GENE_LABELS:
+            match_clause = "MATCH (n:" + cypher_identifier(label) + ") "
+            if integration_run != None:
+                match_clause = "CALL { MATCH (n:" + cypher_identifier(label)\
+                    + ") WHERE n.integration_run = $integration_run "\
+                    "RETURN n UNION MATCH (n:" + cypher_identifier(label) \
+                    + ")-->(g:gene) WHERE g.integration_run = "\
+                    "$integration_run RETURN n } WITH n "
+            self.query(
+                match_clause + "CALL { WITH n SET n.mention_count = "
+                "COUNT { (n)-->(:gene)<--(:Article) } } "
+                "IN TRANSACTIONS OF 10000 ROWS",
+                log_queries=False,
+                parameters={"integration_run": integration_run})
+        self.query(
+            "MATCH (a:Article) WITH count(a) AS count_articles "
+            "MERGE (s:Stats {name: 'global_stats'}) "
+            "SET s.count_articles = count_articles",
+            log_queries=False)
+
+    def set_global_task_timestamp(self, timestamp_property: str) -> None:
+        self.query(
+            "MERGE (s:Stats {name: 'global_stats'}) "
+            "SET s." + cypher_identifier(timestamp_property)
+            + " = apoc.date.currentTimestamp()", log_queries=False)
+
+    ## the graph version invalidates the cached results of the api, the
+    # manager increments it after each run (0 = never incremented, None = the
+    # read failed): the new version is the current timestamp (milliseconds,
+    # at least the last version + 1), so it increases, even if the graph has
+    # been cleared or replaced by a cold build since the results were cached
+    def get_graph_version(self) -> int:
+        result = self.query(
+            "MATCH (s:Stats {name: 'global_stats'}) "
+            "RETURN s.graph_version AS graph_version", log_queries=False)
+        if result == None:
+            return None
+        if len(result) == 0 or result[0]["graph_version"] == None:
+            return 0
+        return result[0]["graph_version"]
+
+    def increment_graph_version(self) -> int:
+        result = self.query(
+            "MERGE (s:Stats {name: 'global_stats'}) "
+            "WITH s, coalesce(s.graph_version, 0) + 1 AS next_version, "
+            "apoc.date.currentTimestamp() AS timestamp "
+            "SET s.graph_version = CASE WHEN timestamp > next_version "
+            "THEN timestamp ELSE next_version END "
+            "RETURN s.graph_version AS graph_version", log_queries=False)
+        if result == None or len(result) == 0:
+            return None
+        return result[0]["graph_version"]
+
+    ## send query (with its $parameters) to neo4j and return response
+    def query(self, query: str, db=None, log_queries = True,
+              parameters: dict = None) -> list:
         assert self.driver is not None, "Driver not initialized!"
         session = None
         response = None
-        try: 
+        try:
             if (log_queries == True):
                 self.logging.info("cypher-query = \n" + query)
+                if parameters:
+                    self.logging.info("parameters = " + str(parameters))
             session = self.driver.session(database=db) if db is not None \
-                else self.driver.session() 
-            response = list(session.run(query))
+                else self.driver.session()
+            response = list(session.run(query, parameters))
         except Exception as e:
             self.logging.info("Query failed: ", e)
         finally: 
@@ -173,15 +521,17 @@ class Neo4j_Manager:
                 session.close()
         return response
 
-    ## create a neo4j where clause for the normal search
-    def get_where_clause(self, entity_id: str = None, 
-                         entity_fields: List[str] = None, 
+    ## create a neo4j where clause (and its parameters) for the normal search
+    def get_where_clause(self, entity_id: str = None,
+                         entity_fields: List[str] = None,
                          search_operators: List[str] = None,
-                         search_terms: List[str] = None) -> str:
+                         search_terms: List[str] = None) -> Tuple[str, dict]:
         where_clause = "WHERE "
+        parameters = {}
         ## filter for search id
         if entity_id:
-            where_clause += "ID(a) = "+entity_id
+            where_clause += "ID(a) = $entity_id"
+            parameters["entity_id"] = int(entity_id)
         ## filter for search term (in entity_fields)
         if search_terms and isinstance(entity_fields, list):
             if entity_id:
@@ -192,21 +542,27 @@ class Neo4j_Manager:
                 if len(search_operators) == len(entity_fields) \
                         and len(search_operators) == len(search_terms) :
                     for index, search_field in enumerate(entity_fields):
-                        where_clause += "toLower(a."+search_field+") " \
-                                        + search_operators[index] +" "\
-                                        "toLower(\""+search_terms[index]+"\")"
+                        parameter_name = "search_term_" + str(index)
+                        where_clause += get_cypher_comparison(
+                            "toLower(a." + cypher_identifier(search_field)
+                            + ")", search_operators[index],
+                            parameter_name)
+                        parameters[parameter_name] = \
+                            search_terms[index].lower()
                         if index < (len(entity_fields)-1):
                             where_clause += " OR "
                     where_clause += ")"
                 else:
                     raise Exception("search operator length != entity fields length")
-        return where_clause
+        return where_clause, parameters
 
-    ## create a neo4j where clause for the neighbor search
-    def get_where_clause_neighbors(self, entity_id = None):
+    ## create a neo4j where clause (and its parameters) for the neighbor
+    # search
+    def get_where_clause_neighbors(self, entity_id = None) \
+            -> Tuple[str, dict]:
         ## filter only applies on id of entity a
-        where_clause = "WHERE ID(a)="+entity_id
-        return where_clause
+        where_clause = "WHERE ID(a) = $entity_id"
+        return where_clause, {"entity_id": int(entity_id)}
 
     ## check server status
     def get_status(self, uri: str, user: str, password: str) -> int:
@@ -282,13 +638,68 @@ class Neo4j_Manager:
         return response
 
 
-    def get_article_where_clause(self, article_variable, article_attributes, article_operators, article_values):
+    ## the parameters of the article where clause don't depend on the
+    # article_variable (they can be shared by the clauses of one query)
+    def get_article_where_clause(self, article_variable, article_attributes, article_operators, article_values) -> Tuple[str, dict]:
         return_where_clause = ""
+        parameters = {}
         for index, attribute in enumerate(article_attributes):
             if index > 0:
                 return_where_clause += " and"
-            return_where_clause += f" toLower({article_variable}.{attribute}) {article_operators[index]} \'{article_values[index].lower()}\'"
-        return return_where_clause
+            parameter_name = "article_value_" + str(index)
+            return_where_clause += " " + get_cypher_comparison(
+                f"toLower({article_variable}.{cypher_identifier(attribute)})",
+                article_operators[index], parameter_name)
+            parameters[parameter_name] = article_values[index].lower()
+        return return_where_clause, parameters
+
+    ## MATCH clauses (and parameters) of the articles, which mention the
+    # filter entities (subset_index: 1 or 2) and fulfill the article filters
+    def get_subset_articles_query(self, subset_index: int,
+            list_filter_entity_labels: List[str],
+            list_filter_entity_attributes: List[str],
+            list_filter_entity_operators: List[str],
+            list_filter_entity_values: List[str],
+            list_article_attributes: List[str] = None,
+            list_article_operators: List[str] = None,
+            list_article_values: List[str] = None) -> Tuple[str, dict]:
+        subset = str(subset_index)
+        subset_articles = "subset_articles_" + subset
+        subset_articles_query = ""
+        parameters = {}
+        article_where_clause = ""
+        if list_article_attributes != None:
+            if len(list_article_attributes) > 0:
+                article_where_clause, parameters = \
+                    self.get_article_where_clause(subset_articles,
+                                                  list_article_attributes,
+                                                  list_article_operators,
+                                                  list_article_values)
+        if len(list_filter_entity_labels) > 0:
+            for index, filter_entity_label in \
+                    enumerate(list_filter_entity_labels):
+                filter_entity = "s_" + subset + "_" + str(index)
+                parameter_name = filter_entity + "_value"
+                filter_entity_match_clause = f"MATCH ({filter_entity}:" \
+                    f"{cypher_identifier(filter_entity_label)})<--" \
+                    f"({subset_articles}:Article) "
+                filter_entity_where_clause = "WHERE " + get_cypher_comparison(
+                    f"toLower({filter_entity}."
+                    f"{cypher_identifier(list_filter_entity_attributes[index])})",
+                    list_filter_entity_operators[index], parameter_name)
+                parameters[parameter_name] = \
+                    list_filter_entity_values[index].lower()
+                if article_where_clause != "":
+                    filter_entity_where_clause += " and " \
+                        + article_where_clause
+                subset_articles_query += (
+                    filter_entity_match_clause \
+                    + filter_entity_where_clause + " ")
+        else:
+            subset_articles_query = f"MATCH ({subset_articles}:Article)"
+            if article_where_clause != "":
+                subset_articles_query += " WHERE " + article_where_clause
+        return subset_articles_query, parameters
 
     ## calculate gene abundance and return string (csv format)
     def get_label_abundance(self, goal_entity_label: str = None, 
@@ -313,7 +724,6 @@ class Neo4j_Manager:
 
         ## required parameters: goal_entity_label and s1_entity_label
         if (goal_entity_label != None):
-            return_attributes = "entity.name AS name,entity.label AS label"
             goal_entity_where_clause = ""
             goal_jump_entity = ""
             score_normalization = ""
@@ -325,49 +735,22 @@ class Neo4j_Manager:
 
             if goal_entity_label.lower() == "article":
                 goal_entity_label = "Article"
-                return_attributes = "entity.name AS pubmed_id, entity.pmc_id AS pmc_id, " \
-                                    "entity.label AS label, entity.b_title AS title, " \
-                                    "entity.age_in_days AS age_in_days, "\
-                                    "entity.epubdate AS epubdate, entity.journal AS journal, "\
-                                    "entity.authors AS authors, entity.date_integration AS date_integration, "\
-                                    "entity.name AS db_name"
                 if options != None:
                     if "normalize_by_age" in options.split(","):
                         score_normalization = "/ (toFloat(entity.age_in_days) / 365) "
                 sort_string = sort_string + ", epubdate "
-            if goal_entity_label == "gene":
-                return_attributes = "entity.entrezgene AS entrez_gene,entity.label AS label,"\
-                                    "entity.symbol AS symbol,entity.ensembl_ids "\
-                                    "AS ensembl_ids, entity.name AS "\
-                                    "db_name, entity.alias AS alias"
-            if goal_entity_label == "chemical":
-                return_attributes = "entity.name AS mesh_chemical,entity.label AS label,"\
-                                    "entity.name AS db_name"
-            if goal_entity_label == "disease":
-                return_attributes = "entity.name AS mesh_disease,entity.label AS label,"\
-                                    "entity.name AS db_name"                        
-            if goal_entity_label in ["GO_BP", "GO_CC", "GO_MF", 
-                                     "pathway_reactome",
-                                     "pathway_wikipathways", "pathway_kegg",
-                                     "pathway_netpath", "pathway_biocarta",
-                                     "pathway_pid"]:
-                ## pathways / GO terms are only indirectly connected
-                ## -> take genes as jump node
-                goal_jump_entity = "-->(:gene)"
-                if goal_entity_label in ["GO_BP", "GO_CC", "GO_MF"]:
-                    return_attributes = "entity.name AS name,entity.term AS term,"\
-                                    "entity.evidence AS evidence, entity.qualifier  "\
-                                    "AS qualifier, entity.gocategory AS gocategory"
-                else:
-                    return_attributes = "entity.name AS name,entity.label AS label,"\
-                                    "entity.id AS id  "
-            if goal_entity_label == "drug":
-                return_attributes = "entity.name AS name,entity.label AS label, "\
-                                    "entity.approved AS approved"
-                ## drugs are only indirectly connected
+            if goal_entity_label in MENTION_COUNT_GENE_LABELS:
+                ## pathways / GO terms / drugs are only indirectly connected
                 ## -> take genes as jump node
                 goal_jump_entity = "-->(:gene)"
-
+            return_attributes = ", ".join(
+                ["entity." + attribute + " AS " + column for attribute, column
+                 in get_label_abundance_attributes(goal_entity_label)])
+
+            parameters = {"goal_entity_min_mentions":
+                          int(goal_entity_min_mentions)}
+            goal_entity_label = cypher_identifier(goal_entity_label)
+            sort_string = cypher_sort_string(sort_string)
             if (goal_entity_attribute != None 
                     and goal_entity_operator != None
                     and goal_entity_value != None):
@@ -376,89 +759,44 @@ class Neo4j_Manager:
                     and len(goal_entity_operator) > 0
                     ):
                     if not goal_entity_operator.lower() in \
-                        ["=", "<", ">", ">=",
-                        ">=", "<=", "<>", "is null", 
-                        "is not null", "starts with", 
-                        "ends with", "contains"]:
+                        CYPHER_OPERATORS:
                         return f'''error: wrong goal_entity_operator (not supported): {goal_entity_operator}'''
 
-                    if is_attribute_string(goal_entity_attribute):
-                        goal_entity_value = f''' '{goal_entity_value}' '''
-                    if (len(goal_entity_attribute) > 0
-                            and len(goal_entity_operator) > 0):
-                        goal_entity_where_clause = f'''
-                            and entity.{goal_entity_attribute} \
-                                {goal_entity_operator} \
-                                {goal_entity_value} '''
+                    if is_attribute_string(goal_entity_attribute) \
+                            or not is_convertible_to_float(goal_entity_value):
+                        parameters["goal_entity_value"] = goal_entity_value
+                    else:
+                        parameters["goal_entity_value"] = \
+                            float(goal_entity_value)
+                    goal_entity_where_clause = " and " \
+                        + get_cypher_comparison(
+                            "entity." + cypher_identifier(goal_entity_attribute),
+                            goal_entity_operator, "goal_entity_value")
 
             subset_articles_query_1=""
             if list_filter_entity_labels_1 != None:
-                if len(list_filter_entity_labels_1) > 0:
-                    for index, filter_entity_label in \
-                            enumerate(list_filter_entity_labels_1):
-                        filter_entity_match_clause = f"MATCH (s_1_{str(index)}:\
-                            {filter_entity_label})<--\
-                                (subset_articles_1:Article)"
-                        filter_entity_where_clause = f"WHERE toLower(s_1_{str(index)}.\
-                            {list_filter_entity_attributes_1[index]}) \
-                            {list_filter_entity_operators_1[index]} \
-                                '{list_filter_entity_values_1[index].lower()}'"
-                        if list_article_attributes != None:
-                            if len(list_article_attributes) > 0:
-                                filter_entity_where_clause += " and " + self.get_article_where_clause( \
-                                    "subset_articles_1",
-                                    list_article_attributes, 
-                                    list_article_operators, 
-                                    list_article_values)
-                        subset_articles_query_1 += (
-                            filter_entity_match_clause \
-                            + filter_entity_where_clause )
-                else:
-                    subset_articles_query_1 = f"MATCH \
-                        (subset_articles_1:Article)"
-                    if list_article_attributes != None:
-                        if len(list_article_attributes) > 0:
-                            subset_articles_query_1 += " WHERE "
-                            subset_articles_query_1 += self.get_article_where_clause( \
-                                "subset_articles_1",
-                                list_article_attributes, 
-                                list_article_operators, 
-                                list_article_values)
-            
-            subset_articles_query_2=""
+                subset_articles_query_1, subset_parameters = \
+                    self.get_subset_articles_query(1,
+                        list_filter_entity_labels_1,
+                        list_filter_entity_attributes_1,
+                        list_filter_entity_operators_1,
+                        list_filter_entity_values_1,
+                        list_article_attributes,
+                        list_article_operators,
+                        list_article_values)
+                parameters.update(subset_parameters)
 
             if list_filter_entity_labels_2 != None:
-                if len(list_filter_entity_labels_2) > 0:
-                    for index, filter_entity_label in \
-                            enumerate(list_filter_entity_labels_2):
-                        filter_entity_match_clause = f"MATCH (s_2_{str(index)}:\
-                            {filter_entity_label})<--\
-                                (subset_articles_2:Article)"
-                        filter_entity_where_clause = f"WHERE toLower(s_2_{str(index)}.\
-                            {list_filter_entity_attributes_2[index]}) \
-                            {list_filter_entity_operators_2[index]} \
-                                '{list_filter_entity_values_2[index].lower()}'"
-                        if list_article_attributes != None:
-                            if len(list_article_attributes) > 0:
-                                filter_entity_where_clause += " and " + self.get_article_where_clause( \
-                                    "subset_articles_2",
-                                    list_article_attributes, 
-                                    list_article_operators, 
-                                    list_article_values)
-                        subset_articles_query_2 += (
-                            filter_entity_match_clause \
-                            + filter_entity_where_clause )
-                else:
-                    subset_articles_query_2 = f"MATCH \
-                        (subset_articles_2:Article)"
-                    if list_article_attributes != None:
-                        if len(list_article_attributes) > 0:
-                            subset_articles_query_2 += " WHERE "
-                            subset_articles_query_2 += self.get_article_where_clause( \
-                                "subset_articles_2",
-                                list_article_attributes, 
-                                list_article_operators, 
-                                list_article_values)
+                subset_articles_query_2, subset_parameters = \
+                    self.get_subset_articles_query(2,
+                        list_filter_entity_labels_2,
+                        list_filter_entity_attributes_2,
+                        list_filter_entity_operators_2,
+                        list_filter_entity_values_2,
+                        list_article_attributes,
+                        list_article_operators,
+                        list_article_values)
+                parameters.update(subset_parameters)
                 create_subset_2 = f'''
                     // subset_2: create subset, count its articles and collect 
                     // those articles
@@ -466,28 +804,43 @@ class Neo4j_Manager:
                     WITH count_articles, count_subset_articles_1, subset_list_1,
                         count(subset_articles_2) AS count_subset_articles_2, 
                         collect(subset_articles_2) AS subset_list_2
+
+                    // subset_2: observed mentions of the goal entities (map of 
+                    // the entity id -> mentions)
+                    UNWIND apoc.coll.toSet(subset_list_2) AS mentions_subset_2
+                    MATCH (entity_2:{goal_entity_label}){goal_jump_entity}<--(mentions_subset_2)
+                    WITH count_articles, count_subset_articles_1, subset_list_1,
+                        count_subset_articles_2, entity_2,
+                        count(mentions_subset_2) AS count_mentions_subset_2
+                    WITH count_articles, count_subset_articles_1, subset_list_1,
+                        count_subset_articles_2, apoc.map.fromPairs(collect(
+                            [toString(ID(entity_2)), count_mentions_subset_2]))
+                            AS subset_mentions_2
                     '''
 
-                subset_2_with_clause = "count_subset_articles_2, subset_list_2, "
+                subset_2_with_clause = "count_subset_articles_2, subset_mentions_2, "
 
                 calculate_subset_2 = f'''
-                    // subset_2: determine observed mentions for the goal entity in context of 
+                    // subset_2: observed mentions for the goal entity in context of 
                     // the subgraph (i.e. ALS + homo sapiens)
-                    MATCH (entity){goal_jump_entity}<--(mentions_subset_2)
-                    WHERE mentions_subset_2 IN subset_list_2 and absolute_mentions > {goal_entity_min_mentions}
                     WITH entity, absolute_mentions, expected_mentions, absolute_subset_mentions_1, relative_subset_mentions_1, score_1,
-                        count(mentions_subset_2) AS absolute_subset_mentions_2, 
-                        (toFloat(count(mentions_subset_2)) / count_subset_articles_2) 
+                        count_articles, count_subset_articles_1, count_subset_articles_2, 
+                        subset_mentions_2[toString(ID(entity))] AS absolute_subset_mentions_2
+                    WHERE absolute_subset_mentions_2 IS NOT NULL
+                    WITH entity, absolute_mentions, expected_mentions, absolute_subset_mentions_1, relative_subset_mentions_1, score_1,
+                        count_articles, count_subset_articles_1, count_subset_articles_2, 
+                        absolute_subset_mentions_2, 
+                        (toFloat(absolute_subset_mentions_2) / count_subset_articles_2) 
                             AS relative_subset_mentions_2, 
-                        round(((toFloat(count(mentions_subset_2)) / count_subset_articles_2)
+                        round(((toFloat(absolute_subset_mentions_2) / count_subset_articles_2)
                             /expected_mentions {score_normalization}), 4) as score_2,
-                        (((toFloat(count(mentions_subset_2)) / count_subset_articles_2)
+                        (((toFloat(absolute_subset_mentions_2) / count_subset_articles_2)
                             /expected_mentions) / score_1) AS score
                     '''
 
                 score_name = "score"
                 sort_string = "score"
-                return_subset_2 = ", absolute_subset_mentions_2, relative_subset_mentions_2"
+                return_subset_2 = ", absolute_subset_mentions_2, relative_subset_mentions_2, count_subset_articles_2"
             else:
                 create_subset_2 = ""
                 calculate_subset_2 = ""
@@ -498,26 +851,49 @@ class Neo4j_Manager:
             b_article_where = ""
             if list_article_attributes != None:
                 if len(list_article_attributes) > 0:
-                    a_article_where += " and "
-                    a_article_where += self.get_article_where_clause( \
-                        "a",
-                        list_article_attributes, 
-                        list_article_operators, 
-                        list_article_values)
-                    b_article_where += " WHERE "
-                    b_article_where += self.get_article_where_clause( \
-                        "b",
-                        list_article_attributes, 
-                        list_article_operators, 
-                        list_article_values)
-
+                    a_article_where_clause, article_parameters = \
+                        self.get_article_where_clause("a",
+                            list_article_attributes, 
+                            list_article_operators, 
+                            list_article_values)
+                    b_article_where_clause, _ = \
+                        self.get_article_where_clause("b",
+                            list_article_attributes, 
+                            list_article_operators, 
+                            list_article_values)
+                    a_article_where = " WHERE " + a_article_where_clause
+                    b_article_where = " WHERE " + b_article_where_clause
+                    parameters.update(article_parameters)
+
+            ## the global counts (all articles and the mentions of each 
+            # entity) are precomputed (see update_mention_counts), only the 
+            # article filters need the counts of the filtered articles
+            count_articles = None
+            if a_article_where == "":
+                count_articles = self.get_global_stats_property(
+                    "count_articles")
+            if count_articles != None:
+                parameters["count_articles"] = count_articles
+                count_articles_query = \
+                    "WITH $count_articles AS count_articles"
+                absolute_mentions = \
+                    "CASE WHEN entity.mention_count IS NULL THEN COUNT { " \
+                    f"(entity){goal_jump_entity}<--(a:Article) }} " \
+                    "ELSE entity.mention_count END"
+            else:
+                count_articles_query = \
+                    f"MATCH (b:Article) {b_article_where} " \
+                    "WITH count(b) AS count_articles"
+                absolute_mentions = \
+                    f"COUNT {{ (entity){goal_jump_entity}<--(a:Article) " \
+                    f"{a_article_where} }}"
             
-            ## define and run the final query
-            query_string = f'''
+            ## define and run the final query (the values are passed as 
+            # parameters, so neo4j can reuse the plan of the query), the goal
+            # entities are found from the articles of subset_1
+            label_abundance_query = f'''
             // count all articles
-            WITH "MATCH (b:Article)
-            {b_article_where}
-            WITH count(b) AS count_articles
+            {count_articles_query}
 
             // subset_1: create subset, count its articles and collect 
             // those articles
@@ -528,49 +904,53 @@ class Neo4j_Manager:
 
             {create_subset_2}
 
-            // determine expected mentions for the goal entity
-            MATCH (entity:{goal_entity_label}){goal_jump_entity}<--(a:Article)
-            WHERE 1=1 {goal_entity_where_clause} {a_article_where}
-            WITH count_articles, count_subset_articles_1, subset_list_1, {subset_2_with_clause}
-                entity,
-                count(a) AS absolute_mentions, 
-                (toFloat(count(a)) / count_articles) AS expected_mentions
-
             // subset_1: determine observed mentions for the goal entity in context of 
             // the subgraph (i.e. ALS + homo sapiens)
-            MATCH (entity){goal_jump_entity}<--(mentions_subset_1)
-            WHERE mentions_subset_1 IN subset_list_1 and absolute_mentions > {goal_entity_min_mentions}
-            WITH entity, absolute_mentions, expected_mentions, count_subset_articles_1, {subset_2_with_clause}
-                count(mentions_subset_1) AS absolute_subset_mentions_1, 
-                (toFloat(count(mentions_subset_1)) / count_subset_articles_1) 
+            UNWIND apoc.coll.toSet(subset_list_1) AS mentions_subset_1
+            MATCH (entity:{goal_entity_label}){goal_jump_entity}<--(mentions_subset_1)
+            WHERE 1=1 {goal_entity_where_clause}
+            WITH count_articles, count_subset_articles_1, {subset_2_with_clause}
+                entity, count(mentions_subset_1) AS absolute_subset_mentions_1
+
+            // determine expected mentions for the goal entity
+            WITH count_articles, count_subset_articles_1, {subset_2_with_clause}
+                entity, absolute_subset_mentions_1,
+                {absolute_mentions} AS absolute_mentions
+            WHERE absolute_mentions > $goal_entity_min_mentions
+            WITH entity, absolute_mentions, 
+                (toFloat(absolute_mentions) / count_articles) AS expected_mentions,
+                count_articles, count_subset_articles_1, {subset_2_with_clause}
+                absolute_subset_mentions_1, 
+                (toFloat(absolute_subset_mentions_1) / count_subset_articles_1) 
                     AS relative_subset_mentions_1, 
-                round(((toFloat(count(mentions_subset_1)) / count_subset_articles_1)
-                    /expected_mentions {score_normalization}), 4) as score_1
+                round(((toFloat(absolute_subset_mentions_1) / count_subset_articles_1)
+                    /(toFloat(absolute_mentions) / count_articles) {score_normalization}), 4) as score_1
 
             {calculate_subset_2}
             
             RETURN {score_name}, {return_attributes}, absolute_mentions, expected_mentions,
                 absolute_subset_mentions_1, relative_subset_mentions_1, ID(entity) as db_id
-                {return_subset_2}
-            ORDER BY {sort_string};
-            " AS query''' + '''
-            CALL apoc.export.csv.query(query, null, {stream: true})
-            YIELD file, nodes, relationships, properties, data
-            RETURN data;
+                {return_subset_2}, count_articles, count_subset_articles_1
             '''
-            response = self.query(query_string)
+            self.logging.info("cypher-query = \n" + label_abundance_query)
+            self.logging.info("parameters = " + str(parameters))
+            response = self.query(label_abundance_query, log_queries=False,
+                                  parameters=parameters)
             response_string = "message':'no result found'"
-            ## create list from reponse, if the response exists
+            ## p-values / q-values of all entities from the returned counts,
+            # then sorted (the statistics are sort keys, too)
             if (response):
                 if len(response) > 0:
-                    response_string = ""
-                    for response_part in response:
-                        response_string = response_string + response_part.data()['data']
-                    #response_string = response[0]
-                    #response_string = response_string.data()['data']
-                    response_string = response_string.replace('","', '|').\
-                                        replace('"', '').replace(";", ",").\
-                                        replace("|",";")
+                    df_result = pd.DataFrame([record.values() for record in response],
+                                             columns=response[0].keys())
+                    count_columns = ["count_articles", "count_subset_articles_1"]
+                    if return_subset_2 != "":
+                        count_columns.append("count_subset_articles_2")
+                    counts = [int(df_result[column].iloc[0]) for column in count_columns]
+                    df_result = df_result.drop(columns=count_columns)
+                    df_result = add_enrichment_statistics(df_result, *counts)
+                    df_result = sort_label_abundance(df_result, sort_string)
+                    response_string = get_label_abundance_csv(df_result)
         else: # goal_entity_label == None OR s1_entity_label == None
             response_string = "message':'no goal_entity_label or "\
                               "s1_entity_label (subset 1 entity label) "\
@@ -588,6 +968,7 @@ class Neo4j_Manager:
                format: str = "json") -> List[dict]:
         class_string = ""
         where_clause = ""
+        parameters = {}
         return_fields = "ID(a), count_links, apoc.map.removeKeys(a, ['embedding', 'embedding_global_x', 'embedding_global_y'] ) AS a "            
 
         ## filter on specific type / class of entity (disease, article, 
@@ -615,25 +996,28 @@ class Neo4j_Manager:
                 attributes = ["name", "label"]
                 attributes_labels = attributes
 
-            class_string = ":"+entity_label
+            class_string = ":"+cypher_identifier(entity_label)
             ## now filter for search_terms and / or id
             if (search_terms or entity_id):
-                where_clause = self.get_where_clause(entity_id, entity_fields,
-                                                     search_operators, search_terms)
+                where_clause, parameters = self.get_where_clause(
+                    entity_id, entity_fields, search_operators, search_terms)
         else:
             ## no type defined -> just filter for search_terms and / or id
             if (search_terms or entity_id):
-                where_clause = self.get_where_clause(
+                where_clause, parameters = self.get_where_clause(
                     entity_id, entity_fields, search_operators, search_terms)
         
         sort_statement = ""
         sort_desc_str = "DESC" if sort_descending else "ASC"
-        result_limit_str = "" if result_limit == None else " LIMIT " +str(result_limit)
+        result_limit_str = ""
+        if result_limit != None:
+            result_limit_str = " LIMIT $result_limit"
+            parameters["result_limit"] = int(result_limit)
         if sort_by != None:
             if sort_by == "count_links":
                 sort_statement = f'''ORDER BY {sort_by} {sort_desc_str} {result_limit_str}'''
             else:
-                sort_statement = f'''ORDER BY a.{sort_by} {sort_desc_str} {result_limit_str}'''
+                sort_statement = f'''ORDER BY a.{cypher_identifier(sort_by)} {sort_desc_str} {result_limit_str}'''
 
         ## define and run the final query
         query_string = f'''
@@ -642,7 +1026,7 @@ class Neo4j_Manager:
         WITH count(b) as count_links, a
         RETURN {return_fields} {sort_statement}'''
 
-        response = self.query(query_string)
+        response = self.query(query_string, parameters=parameters)
         response_list = [{'message':'no result found'}]
         ## create list from reponse, if the response exists
         if (response):
@@ -678,11 +1062,13 @@ class Neo4j_Manager:
                     #return_fields = return_fields + ", b.journal \
                     # as journal_name, b.iso_sortpubdate AS publication_date "
 
-                type_string = ":"+entity_label
-                where_clause = self.get_where_clause_neighbors(entity_id)
+                type_string = ":"+cypher_identifier(entity_label)
+                where_clause, parameters = \
+                    self.get_where_clause_neighbors(entity_id)
             else:
                 ## no type is given -> just filter for the id
-                where_clause = self.get_where_clause_neighbors(entity_id)
+                where_clause, parameters = \
+                    self.get_where_clause_neighbors(entity_id)
         else:
             #return #jsonify(results = {'message': 'Error: id is missing'})
             return {'results':{'message': 'Error: id is missing'}}
@@ -695,7 +1081,7 @@ class Neo4j_Manager:
         '''
         
         ## create list from reponse, if the response exists
-        response = self.query(query_string)
+        response = self.query(query_string, parameters=parameters)
         response_list = [{'message':'no result found'}]
         if (response):
             if len(response) > 0:
@@ -733,19 +1119,14 @@ class Neo4j_Manager:
                   + str(from_keys) +" - from_values="+str(from_values) \
                   + " - to_keys="+str(to_keys)+" - to_values="+str(to_values))
             return -1
-        ## create the query strings
-        string_from = ""
-        for index, from_key in enumerate(from_keys):
-            from_value = from_values[index]
-            string_from = string_from + "n."+from_key+" = '"+from_value+"'"
-            if index < len(from_keys)-1:
-                string_from = string_from + " AND "
-        string_to = ""
-        for index, to_key in enumerate(to_keys):
-            to_value = to_values[index]
-            string_to = string_to + "m."+to_key+" = '"+to_value+"'"
-            if index < len(to_keys)-1:
-                string_to = string_to + " AND " 
+        ## create the query strings (the values are parameters)
+        properties_from, parameters = get_cypher_properties(
+            "n", from_keys, from_values, "from")
+        properties_to, parameters_to = get_cypher_properties(
+            "m", to_keys, to_values, "to")
+        parameters.update(parameters_to)
+        string_from = " AND ".join(properties_from)
+        string_to = " AND ".join(properties_to)
                 
         ## create and run the final query
         query_string = '''MATCH (n), (m)
@@ -754,7 +1135,7 @@ class Neo4j_Manager:
         WITH n, m
         MATCH (n)<-[r]-()
         CALL apoc.refactor.to(r,m) YIELD output RETURN output;'''
-        response = self.query(query_string)
+        response = self.query(query_string, parameters=parameters)
         self.cleanup_duplicated_edges()
         return self.success_response + " - redirected incoming from_keys = " \
                 + str(from_keys) + " - from_values = " + str(from_values) \
@@ -772,19 +1153,14 @@ class Neo4j_Manager:
                   + str(from_keys) + " - from_values=" + str(from_values) \
                   + " - to_keys="+str(to_keys)+" - to_values="+str(to_values))
             return -1
-        ## create the query strings
-        string_from = ""
-        for index, from_key in enumerate(from_keys):
-            from_value = from_values[index]
-            string_from = string_from + "n."+from_key+" = '"+from_value+"'"
-            if index < len(from_keys)-1:
-                string_from = string_from + " AND "
-        string_to = ""
-        for index, to_key in enumerate(to_keys):
-            to_value = to_values[index]
-            string_to = string_to + "m."+to_key+" = '"+to_value+"'"
-            if index < len(to_keys)-1:
-                string_to = string_to + " AND " 
+        ## create the query strings (the values are parameters)
+        properties_from, parameters = get_cypher_properties(
+            "n", from_keys, from_values, "from")
+        properties_to, parameters_to = get_cypher_properties(
+            "m", to_keys, to_values, "to")
+        parameters.update(parameters_to)
+        string_from = " AND ".join(properties_from)
+        string_to = " AND ".join(properties_to)
                 
         ## create and run the final query
         query_string = '''MATCH (n), (m)
@@ -793,16 +1169,19 @@ class Neo4j_Manager:
         WITH n, m
         MATCH (n)-[r]->()
         CALL apoc.refactor.from(r,m) YIELD output RETURN output;'''
-        response = self.query(query_string)
+        response = self.query(query_string, parameters=parameters)
         self.cleanup_duplicated_edges()
         return self.success_response + " - redirected outgoing from_keys = " \
                + str(from_keys) + " - from_values = " + str(from_values) \
                + " to to_keys = "+ str(to_keys) + " - to_values = " \
                + str(to_values)
 
+    ## the merged node gets the relationships of both nodes, it is tagged
+    # with the integration_run (its mention count changes)
     def merge_nodes(self, from_keys: List[str], 
                                from_values: List[str], to_keys: List[str],
-                               to_values: List[str]) -> str:
+                               to_values: List[str],
+                               integration_run: int = None) -> str:
         ## check for inconsitency
         if (len(from_keys) != len(from_values) or \
                 len(to_keys) != len(to_values)):
@@ -810,19 +1189,18 @@ class Neo4j_Manager:
                 + " - from_values="+from_values+" - to_keys="+to_keys+" - "\
                 "to_values="+to_values)
             return -1
-        ## create the query strings
-        string_from = ""
-        for index, from_key in enumerate(from_keys):
-            from_value = from_values[index]
-            string_from = string_from + "n."+from_key+" = '"+from_value+"'"
-            if index < len(from_keys)-1:
-                string_from = string_from + " AND "
-        string_to = ""
-        for index, to_key in enumerate(to_keys):
-            to_value = to_values[index]
-            string_to = string_to + "m."+to_key+" = '"+to_value+"'"
-            if index < len(to_keys)-1:
-                string_to = string_to + " AND " 
+        ## create the query strings (the values are parameters)
+        properties_from, parameters = get_cypher_properties(
+            "n", from_keys, from_values, "from")
+        properties_to, parameters_to = get_cypher_properties(
+            "m", to_keys, to_values, "to")
+        parameters.update(parameters_to)
+        string_from = " AND ".join(properties_from)
+        string_to = " AND ".join(properties_to)
+        set_clause = ""
+        if integration_run != None:
+            set_clause = "SET node.integration_run = $integration_run"
+            parameters["integration_run"] = integration_run
                 
         ## create and run the final query
         query_string = '''MATCH (n), (m)
@@ -831,9 +1209,10 @@ class Neo4j_Manager:
         WITH head(collect([n,m])) as nodes
         CALL apoc.refactor.mergeNodes(nodes,{properties:"overwrite", mergeRels:true})
         YIELD node
+        ''' + set_clause + '''
         RETURN count(*)
         '''
-        response = self.query(query_string)
+        response = self.query(query_string, parameters=parameters)
         #self.cleanup_duplicated_edges()
         return self.success_response + " response = " + str(response) + \
             "- merging "\
@@ -843,7 +1222,8 @@ class Neo4j_Manager:
 
     def rename_entity(self, from_keys: List[str], 
                                from_values: List[str], to_keys: List[str],
-                               to_values: List[str]) -> str:
+                               to_values: List[str],
+                               integration_run: int = None) -> str:
         ## check for inconsitency
         if (len(from_keys) != len(from_values) or \
                 len(to_keys) != len(to_values)):
@@ -851,19 +1231,17 @@ class Neo4j_Manager:
                 + " - from_values="+from_values+" - to_keys="+to_keys+" - "\
                 "to_values="+to_values)
             return -1
-        ## create the query strings
-        string_from = ""
-        for index, from_key in enumerate(from_keys):
-            from_value = from_values[index]
-            string_from = string_from + "n."+from_key+" = '"+from_value+"'"
-            if index < len(from_keys)-1:
-                string_from = string_from + " AND "
-        string_to = ""
-        for index, to_key in enumerate(to_keys):
-            to_value = to_values[index]
-            string_to = string_to + "n."+to_key+" = '"+to_value+"'"
-            if index < len(to_keys)-1:
-                string_to = string_to + ", " 
+        ## create the query strings (the values are parameters)
+        properties_from, parameters = get_cypher_properties(
+            "n", from_keys, from_values, "from")
+        properties_to, parameters_to = get_cypher_properties(
+            "n", to_keys, to_values, "to")
+        parameters.update(parameters_to)
+        string_from = " AND ".join(properties_from)
+        string_to = ", ".join(properties_to)
+        if integration_run != None:
+            string_to += ", n.integration_run = $integration_run"
+            parameters["integration_run"] = integration_run
                 
         ## create and run the final query
         query_string = f'''MATCH (n)
@@ -871,7 +1249,7 @@ class Neo4j_Manager:
         SET {string_to}
         RETURN count(n)
         '''
-        response = self.query(query_string)
+        response = self.query(query_string, parameters=parameters)
         #self.cleanup_duplicated_edges()
         return self.success_response + " response = " + str(response) + \
             "- renaming "\
@@ -884,13 +1262,10 @@ class Neo4j_Manager:
             self.logging.info("error: inconsistent key / values: del_keys=" + del_keys \
                   + " - del_values="+del_values)
             return -1
-        ## create the query strings
-        string_del = ""
-        for index, del_key in enumerate(del_keys):
-            del_value = del_values[index]
-            string_del = string_del + "n." + del_key + " = '" + del_value+"'"
-            if index < len(del_keys)-1:
-                string_del = string_del + " AND "
+        ## create the query strings (the values are parameters)
+        properties_del, parameters = get_cypher_properties(
+            "n", del_keys, del_values, "del")
+        string_del = " AND ".join(properties_del)
         ## create and run the final query
         query_string = f'''
         MATCH (n)
@@ -898,7 +1273,7 @@ class Neo4j_Manager:
         DETACH DELETE n;
         '''
         ## run the query
-        response = self.query(query_string)
+        response = self.query(query_string, parameters=parameters)
         return self.success_response + " - deleted del_keys = " \
                + str(del_keys) + " - del_values = " + str(del_values)
 
@@ -909,11 +1284,12 @@ class Neo4j_Manager:
         ## create and run the final query
         query_string = f'''
         MATCH (n)
-        WHERE ID(n)={str(del_id)}
+        WHERE ID(n) = $del_id
         DETACH DELETE n;
         '''
         ## run the query
-        response = self.query(query_string)
+        response = self.query(query_string,
+                              parameters={"del_id": int(del_id)})
         return self.success_response + " - deleted ID = " + str(del_id)
 
     def get_top_n_articles_for_label(self, 
@@ -933,46 +1309,28 @@ class Neo4j_Manager:
         if order_metric == None:
             order_metric = "count_metric_age_norm" if \
                             metric_norm == True else "count_metric"
+        order_metric = cypher_identifier(order_metric)
         if options != None:
             pass
         return_fields = "ID(article), article{.*} "
+        parameters = {"weight_mention": int(weight_mention),
+                      "top_n": int(top_n)}
 
         ## filter on specific type / class of entity 
         # (disease, article, gene, ...)
         subset_articles_query_1=""
         if list_filter_entity_labels_1 != None:
-            if len(list_filter_entity_labels_1) > 0:
-                for index, filter_entity_label in \
-                        enumerate(list_filter_entity_labels_1):
-                    filter_entity_match_clause = f"MATCH (s_1_{str(index)}:\
-                        {filter_entity_label})<--\
-                            (subset_articles_1:Article)"
-                    filter_entity_where_clause = f"WHERE toLower(s_1_{str(index)}.\
-                        {list_filter_entity_attributes_1[index]}) \
-                        {list_filter_entity_operators_1[index]} \
-                            '{list_filter_entity_values_1[index].lower()}'"
-                    if list_article_attributes != None:
-                        if len(list_article_attributes) > 0:
-                            filter_entity_where_clause += " and " + self.get_article_where_clause( \
-                                "subset_articles_1",
-                                list_article_attributes, 
-                                list_article_operators, 
-                                list_article_values)
-                    subset_articles_query_1 += (
-                        filter_entity_match_clause \
-                        + filter_entity_where_clause )
-            else:
-                subset_articles_query_1 = f"MATCH \
-                    (subset_articles_1:Article)"
-                if list_article_attributes != None:
-                    if len(list_article_attributes) > 0:
-                        subset_articles_query_1 += " WHERE "
-                        subset_articles_query_1 += self.get_article_where_clause( \
-                            "subset_articles_1",
-                            list_article_attributes, 
-                            list_article_operators, 
-                            list_article_values)
-        
+            subset_articles_query_1, subset_parameters = \
+                self.get_subset_articles_query(1,
+                    list_filter_entity_labels_1,
+                    list_filter_entity_attributes_1,
+                    list_filter_entity_operators_1,
+                    list_filter_entity_values_1,
+                    list_article_attributes,
+                    list_article_operators,
+                    list_article_values)
+            parameters.update(subset_parameters)
+
         ## define and run the final query
         #query_string_1 = f'''
         #MATCH (subset_articles_1:Article)-->{optional_pathway_link}(g{class_string})
@@ -1006,21 +1364,21 @@ class Neo4j_Manager:
         UNWIND [mentions_subset_1_target.age_in_months, 1] AS age_to_one 
         WITH mentions_subset_1_target as article, count_all, count_target, \
                 max(age_to_one) AS age_norm,
-            (count_all + {str(weight_mention)} * count_target) as count_metric,
-            (toFloat(count_all + {str(weight_mention)} * count_target) / max(age_to_one)) \
+            (count_all + $weight_mention * count_target) as count_metric,
+            (toFloat(count_all + $weight_mention * count_target) / max(age_to_one)) \
                 as count_metric_age_norm
         RETURN {return_fields}, \
                count_all as f_total_citations, count_target as \
                f_total_citations_from_target, count_metric as \
                f_unnormalized_metric, count_metric_age_norm as \
                f_normalized_metric, age_norm as f_age_norm \
-        ORDER BY {order_metric} DESC LIMIT {str(top_n)}
+        ORDER BY {order_metric} DESC LIMIT $top_n
         '''
 
         query_string = query_string_1 + query_string_2 + query_string_3 \
                        + query_string_4
 
-        response = self.query(query_string)
+        response = self.query(query_string, parameters=parameters)
         response_list = [{'message':'no result found'}]
         ## create list from reponse, if the response exists
         if (response):
@@ -1081,7 +1439,7 @@ class Neo4j_Manager:
                                  "pathway_pid", "drug"]:
                 optional_pathway_link ="--(any_gene:gene)"
 
-            class_string = ":"+concept_label
+            class_string = ":"+cypher_identifier(concept_label)
         else:
             return {'results':{'message': 'Error: concept_label = None'}}
             
@@ -1089,10 +1447,10 @@ class Neo4j_Manager:
         query_string = f'''
         MATCH (entity{class_string}){optional_pathway_link}--(a:Article) 
         RETURN {return_fields}
-        ORDER BY count_mentions DESC LIMIT {str(top_n)}
+        ORDER BY count_mentions DESC LIMIT $top_n
         '''
 
-        response = self.query(query_string)
+        response = self.query(query_string, parameters={"top_n": int(top_n)})
         response_list = [{'message':'no result found'}]
         ## create list from reponse, if the response exists
         if (response):
@@ -1142,6 +1500,31 @@ class Neo4j_Manager:
             result = session.write_transaction(self._create_object_for_entity, entity_label, entity_name, object_label, object_name, object_attributes, object_values, relationship_str, entity_identifier)
             return result
 
+    ## batched version of set_tag_node_attribute: rows = [{name, properties}]
+    # (the nodes are matched by their name)
+    def set_node_properties_bulk(self, node_label: str, rows: List[dict],
+                                 rows_per_transaction: int = 1000) -> None:
+        with self.driver.session() as session:
+            for index in range(0, len(rows), rows_per_transaction):
+                session.write_transaction(
+                    self._set_node_properties_bulk, node_label,
+                    rows[index:index + rows_per_transaction])
+
+    ## batched version of create_object_for_entity: rows = [{gene, name,
+    # properties}] (gene is the name of the entity)
+    def create_objects_for_entities_bulk(self, entity_label: str,
+                                         object_label: str,
+                                         relationship_str: str,
+                                         rows: List[dict],
+                                         rows_per_transaction: int = 1000) \
+            -> None:
+        with self.driver.session() as session:
+            for index in range(0, len(rows), rows_per_transaction):
+                session.write_transaction(
+                    self._create_objects_for_entities_bulk, entity_label,
+                    object_label, relationship_str,
+                    rows[index:index + rows_per_transaction])
+
     def has_gene_any_pathway(self, gene_name: str):
         with self.driver.session() as session:
             result = session.read_transaction(self._has_gene_any_pathway, 
@@ -1174,22 +1557,33 @@ class Neo4j_Manager:
                         self._add_iso_sortpubdate_for_all_articles)
             return result
 
+    ## integration_run: only the nodes of the integration run
     def where_exists_field(self, concept_label: str, concept_field: str, 
-                           return_field: str, negate = False) -> list:
+                           return_field: str, negate = False,
+                           integration_run: int = None) -> list:
         with self.driver.session() as session:
             result = session.read_transaction(self._where_exists_field, 
                                               concept_label, concept_field, 
-                                              return_field, negate)
+                                              return_field, negate,
+                                              integration_run)
             return result
     
-    def add_age_for_all_articles(self) -> list:
+    def add_age_for_all_articles(self, integration_run: int = None) -> list:
         with self.driver.session() as session:
-            result = session.write_transaction(self._add_age_for_all_articles)
+            result = session.write_transaction(self._add_age_for_all_articles,
+                                               integration_run)
             return result
 
-    def add_mygene_information(self):
+    ## mygene information of the new genes (without entrezgene), with a
+    # cache the stale cached genes are queried again first and written, too
+    # (refresh_max_count limits the refreshed genes per run, None = all)
+    def add_mygene_information(self, rows_per_transaction: int = 1000,
+                               mygene_cache: Mygene_Cache = None,
+                               integration_run: int = None,
+                               refresh_max_count: int = None):
         gene_list = self.where_exists_field("gene", "entrezgene", "name", 
-                                            negate = True)
+                                            negate = True,
+                                            integration_run = integration_run)
         self.logging.info("genes without entrezgene: " + str(len(gene_list)))
         sum_normalized = 0
         sum_malformated = 0
@@ -1213,150 +1607,42 @@ class Neo4j_Manager:
         ## transform gene-names to entrez ids
         entrez_gene_ids = [ gene_id.split(":")[1] for gene_id in \
                             correct_gene_names]
-        ## start the query (batches of 1000 are processed)
-        ginfo = self.mg.querymany(entrez_gene_ids, scopes='entrezgene', 
-                                  fields="symbol,name,alias,entrezgene,"\
-                                         "refseq.rna,ensembl.gene,taxid,"\
-                                         "pathway.kegg,pathway.reactome,"\
-                                         "pathway.biocarta,pathway.netpath,"\
-                                         "pathway.wikipathways,pathway.pid,"\
-                                         "go,type_of_gene,summary",
-                                         returnall = True)
-
-        ## get all information for one gene by using the mygene-package
-        ## we are adding more entities: pathways, go-terms
-        index_ginfo = 0
-        for gene_query in ginfo['out']:
-            if (index_ginfo %50 == 0):
-                self.logging.info("index = "+str(index_ginfo))
-            gene_id = self.search_id_in_label("gene", "name", "=", "Gene:" \
-                                              + str(gene_query['query']))[0]
-            
-            ## if the gene cannot be found by mygene, don't search for it again
-            if 'notfound' in gene_query:
-                if gene_query['notfound'] == True:
-                    gene_query['entrezgene'] = gene_query['query']
-
-            if 'ensembl' in gene_query:
-                query_key = gene_query['ensembl']
-                ensembl_str = ", ".join(get_ensembl_genelist(query_key))
-                self.set_tag_node_attribute(gene_id, "ensembl_ids", 
-                                            add_quotes(ensembl_str))
-            if 'alias' in gene_query:
-                alias_value = "<empty>"
-                if isinstance(gene_query['alias'], list):
-                    alias_value = add_quotes(", ".join(gene_query['alias']))
-                else:
-                    alias_value = add_quotes(gene_query['alias'])
-                    
-                self.set_tag_node_attribute(gene_id, "alias", alias_value)
-            if 'refseq' in gene_query:
-                for refseq_attribute in gene_query['refseq']:
-                    refseq_attribute_name = 'refseq_'+refseq_attribute
-                    if isinstance(gene_query['refseq'][refseq_attribute], 
-                                  list):
-                        refseq_attribute_value = add_quotes(
-                            ", ".join(gene_query['refseq'][refseq_attribute]))
-                    else:
-                        refseq_attribute_value = add_quotes(
-                            gene_query['refseq'][refseq_attribute])
-                    self.set_tag_node_attribute(
-                        gene_id, refseq_attribute_name, refseq_attribute_value)
-            
-            if 'go' in gene_query:
-                #self.logging.info(gene_query)
-                for go_category in gene_query['go']:
-                #if 'BP' in gene_query['go']:
-                    go_category_list = gene_query['go'][go_category]
-                    if (isinstance(go_category_list, dict)):
-                        go_category_list = [go_category_list]
-                    
-                    for go_term in go_category_list:
-                        #self.logging.info(go_term)
-                        object_attributes = ['evidence', 'gocategory', 
-                                             'qualifier', 'term']
-                        
-                        evidence_str = "empty_evidence"
-                        qualifier_str = "empty_qualifier"
-                        term_str = "empty_term"
-                        if ('evidence' in go_term.keys()):
-                            evidence_str = go_term['evidence']
-                        if ('qualifier' in go_term.keys()):
-                            qualifier_str = go_term['qualifier']
-                        if ('term' in go_term.keys()):
-                            term_str = go_term['term']
-
-                        object_values = [replace_quotes(evidence_str),
-                                         go_category,
-                                         replace_quotes(qualifier_str),
-                                         replace_quotes(term_str)]
-                        if go_category == "BP":
-                            object_label = "GO_BP"
-                            go_rel = "-[:GO_BP_contains_gene]->"
-                        elif go_category == "MF":
-                            object_label = "GO_MF"
-                            go_rel = "-[:GO_MF_contains_gene]->"
-                        elif go_category == "CC":
-                            object_label = "GO_CC"
-                            go_rel = "-[:GO_CC_contains_gene]->"
-                        else:
-                            raise Exception("wrong go category "+go_category)
-                        self.create_object_for_entity(
-                            entity_label="gene", entity_name="Gene:" \
-                            + str(gene_query['query']), 
-                            object_label = object_label, 
-                            object_name = go_term['id'], 
-                            object_attributes = object_attributes, 
-                            object_values = object_values, 
-                            relationship_str = go_rel)
-                        
-            if 'pathway' in gene_query:
-                #self.logging.info(gene_query)
-                for pathway_category in gene_query['pathway']:
-                #if 'BP' in gene_query['go']:
-                    pathway_category_list = gene_query['pathway']\
-                                            [pathway_category]
-                    if (isinstance(pathway_category_list, dict)):
-                        pathway_category_list = [pathway_category_list]
-                    
-                    for pathway_term in pathway_category_list:
-                        #self.logging.info(go_term)
-                        object_attributes = ['id','label']
-                        object_values = [replace_quotes(pathway_term['id']),
-                                         replace_quotes(pathway_term['name'])]
-                        if pathway_category not in ["kegg", "reactome", 
-                                                    "wikipathways", "netpath",
-                                                    "pid", "biocarta"]:
-                            raise Exception("wrong pathway category " \
-                                            + pathway_category)
-                        else:
-                            object_label = "pathway_"+str(pathway_category)
-                            pathway_rel = "-[:"+pathway_category \
-                                + "_contains_gene]->"
-
-                        self.create_object_for_entity(
-                            entity_label="gene", entity_name="Gene:" \
-                            + str(gene_query['query']), 
-                            object_label = object_label, 
-                            object_name = pathway_term['id'], 
-                            object_attributes = object_attributes, 
-                            object_values = object_values, 
-                            relationship_str = pathway_rel)
-            
-            simple_fields = ["taxid", "symbol", "type_of_gene", "summary",
-                             "entrezgene"]
-            for simple_field in simple_fields:
-                if simple_field in gene_query:
-                    self.set_tag_node_attribute(
-                        gene_id, simple_field, 
-                        add_quotes(gene_query[simple_field]))
-            #"query;_id;alias;_score;ensembl;entrezgene;name;refseq;symbol;
-            # taxid;pathway;go;type_of_gene;summary"
-            index_ginfo = index_ginfo + 1
-
-    def add_species_information(self):
+        ## start the query (batches of 1000 are processed), known genes are
+        # served by the cache
+        if mygene_cache != None:
+            try:
+                refreshed_ids = mygene_cache.refresh_stale(refresh_max_count)
+            except Exception as err:
+                self.logging.info("mygene: refresh of the stale genes failed: "
+                                  + str(err))
+                refreshed_ids = []
+            ## the refreshed genes (of earlier runs) are updated in the graph
+            gene_documents = mygene_cache.get_documents(
+                entrez_gene_ids + refreshed_ids)
+        else:
+            gene_documents = self.mg.querymany(entrez_gene_ids,
+                                               scopes='entrezgene',
+                                               fields=MYGENE_FIELDS,
+                                               returnall = True)['out']
+
+        ## write the mygene information (gene attributes, go-terms and 
+        # pathways) with a few UNWIND transactions
+        gene_rows, object_rows = get_mygene_rows(gene_documents)
+        self.set_node_properties_bulk("gene", gene_rows, rows_per_transaction)
+        self.logging.info("updated " + str(len(gene_rows)) + " genes")
+        for (object_label, relationship_str), rows in object_rows.items():
+            self.create_objects_for_entities_bulk(
+                "gene", object_label, relationship_str, rows,
+                rows_per_transaction)
+            self.logging.info("created " + str(len(rows)) + " "
+                              + object_label + " relationships")
+
+    def add_species_information(self, rows_per_transaction: int = 1000,
+                                taxonomy_index: Taxonomy_Index = None,
+                                integration_run: int = None):
         species_list = self.where_exists_field("species", "current_name", "name", 
-                                            negate = True)
+                                            negate = True,
+                                            integration_run = integration_run)
         self.logging.info("species without current_name: " + str(len(species_list)))
         sum_normalized = 0
         sum_malformated = 0
@@ -1381,6 +1667,20 @@ class Neo4j_Manager:
         ncbi_species_ids = [ species_id.split(":")[1] for species_id in \
                             correct_species_names]
 
+        ## local taxonomy dump (names.dmp / nodes.dmp): one lookup and
+        # batched writes instead of one taxonomy browser page per species
+        if taxonomy_index != None:
+            species_attributes = taxonomy_index.get_attributes(ncbi_species_ids)
+            species_rows = [{"name": "Species:" + str(tax_id),
+                             "properties": attributes}
+                            for tax_id, attributes in species_attributes.items()]
+            self.set_node_properties_bulk("species", species_rows,
+                                          rows_per_transaction)
+            self.logging.info("found " + str(len(species_rows)) + " of "
+                              + str(len(ncbi_species_ids))
+                              + " species in the taxonomy index")
+            return
+
         ## get all information for one gene by using the mygene-package
         ## we are adding more entities: pathways, go-terms
         index_sinfo = 0
@@ -1424,7 +1724,7 @@ class Neo4j_Manager:
                 for simple_field in simple_fields:
                     self.set_tag_node_attribute(
                         species_id, simple_field, 
-                        add_quotes(species_fields[simple_field]))
+                        str(species_fields[simple_field]))
             else:
                 print("no entry found")
                 
@@ -1432,13 +1732,13 @@ class Neo4j_Manager:
             # taxid;pathway;go;type_of_gene;summary"
             index_sinfo = index_sinfo + 1
 
-    def add_disease_information(self):
-        disease_file = "/global/ctdbase_disease.csv"
-        str_header = "DiseaseName,DiseaseID,AltDiseaseIDs,Definition,ParentIDs,TreeNumbers,ParentTreeNumbers,Synonyms,SlimMappings"
-        header = str_header.split(",")
-        df_diseases = pd.read_csv(disease_file, skiprows=29, names = header)
+    def add_disease_information(self, rows_per_transaction: int = 1000,
+                                disease_file: str = "/global/ctdbase_disease.csv",
+                                integration_run: int = None):
+        disease_index = CTD_Disease_Index(disease_file, logging=self.logging)
         diseases_list = self.where_exists_field("disease", "disease_name", "name", 
-                                            negate = True)
+                                            negate = True,
+                                            integration_run = integration_run)
         self.logging.info("disease without current_name: " + str(len(diseases_list)))
         sum_normalized = 0
         sum_malformated = 0
@@ -1452,52 +1752,33 @@ class Neo4j_Manager:
         self.logging.info("There are "+str(sum_normalized)+" normalized disease and " \
               + str(sum_malformated)+" malformated disease names")
 
-        ## transform disease-names
+        ## transform disease-names (the ids need a prefix, i.e. MESH:)
         disease_ids = [ ":".join(dis_id.split(":")[1:]) for dis_id in \
                             correct_disease_names]
-
-        ## get all information for one gene by using the mygene-package
-        ## we are adding more entities: pathways, go-terms
-        for index, disease_id in enumerate(disease_ids):
-            if (index %100 == 0):
-                self.logging.info("index = "+str(index))
-            disease_db_id = str(self.search_id_in_label("disease", "name", "=", "Disease:" \
-                                              + str(disease_id))[0])
-            
-            disease_split = disease_id.split(":")
-            disease_fields = {}
-            if len(disease_split) >= 2:
-                disease = disease_id
-            else:
-                disease = "wrong format"
-
-            data_found = False
-            if (disease in list(df_diseases["DiseaseID"])):
-                disease_fields['disease_id'] = df_diseases.loc[df_diseases["DiseaseID"] == disease, "DiseaseID"].values[0]
-                disease_fields['disease_name']  = df_diseases.loc[df_diseases["DiseaseID"] == disease, "DiseaseName"].values[0]
-                disease_fields['disease_definition']  = df_diseases.loc[df_diseases["DiseaseID"] == disease, "Definition"].values[0]
-                disease_fields['disease_altids']  = df_diseases.loc[df_diseases["DiseaseID"] == disease, "AltDiseaseIDs"].values[0]
-                disease_fields['disease_synonyms']  = df_diseases.loc[df_diseases["DiseaseID"] == disease, "Synonyms"].values[0]
-                data_found = True
-            elif (disease in str(df_diseases["AltDiseaseIDs"])):
-                disease_fields['disease_id']  = df_diseases[df_diseases["AltDiseaseIDs"].fillna("").str.contains(disease)]["DiseaseID"].values[0]
-                disease_fields['disease_name'] = df_diseases[df_diseases["AltDiseaseIDs"].fillna("").str.contains(disease)]["DiseaseName"].values[0]
-                disease_fields['disease_definition'] = df_diseases[df_diseases["AltDiseaseIDs"].fillna("").str.contains(disease)]["Definition"].values[0]
-                disease_fields['disease_altids'] = df_diseases[df_diseases["AltDiseaseIDs"].fillna("").str.contains(disease)]["AltDiseaseIDs"].values[0]
-                disease_fields['disease_synonyms'] = df_diseases[df_diseases["AltDiseaseIDs"].fillna("").str.contains(disease)]["Synonyms"].values[0]
-                data_found = True
-
-            if data_found:
-                simple_fields = ["disease_id", "disease_name", "disease_definition", "disease_altids", "disease_synonyms"]
-                for simple_field in simple_fields:
-                    self.set_tag_node_attribute(
-                        disease_db_id, simple_field, 
-                        add_quotes(disease_fields[simple_field]))
-
-
-    def add_chemical_information(self):
+        disease_ids = [ disease_id for disease_id in disease_ids \
+                            if len(disease_id.split(":")) >= 2 ]
+
+        ## look up all diseases at once (primary and alternative ids) and 
+        # write their attributes in batches
+        disease_rows = []
+        for disease_fields in disease_index.resolve(disease_ids):
+            disease_rows.append({
+                "name": "Disease:" + disease_fields["lookup_id"],
+                "properties": {attribute: str(disease_fields[attribute])
+                               for attribute in DISEASE_ATTRIBUTES}})
+        self.set_node_properties_bulk("disease", disease_rows,
+                                      rows_per_transaction)
+        self.logging.info("found " + str(len(disease_rows)) + " of " 
+                          + str(len(disease_ids)) + " diseases in " 
+                          + disease_file)
+
+
+    def add_chemical_information(self, rows_per_transaction: int = 1000,
+                                 mesh_index: MeSH_Index = None,
+                                 integration_run: int = None):
         chemical_list = self.where_exists_field("chemical", "mesh_name", "name", 
-                                            negate = True)
+                                            negate = True,
+                                            integration_run = integration_run)
         self.logging.info("chemical without current_name: " + str(len(chemical_list)))
         sum_normalized = 0
         sum_malformated = 0
@@ -1517,6 +1798,22 @@ class Neo4j_Manager:
         chemical_ids = [ species_id.split(":")[2] for species_id in \
                             correct_chemicals_names]
 
+        ## local MeSH XML: one lookup and batched writes instead of one 
+        # meshb.nlm.nih.gov page per chemical
+        if mesh_index != None:
+            chemical_attributes = mesh_index.get_attributes(chemical_ids)
+            chemical_rows = [{"name": "Chemical:MESH:" + chemical_id,
+                              "properties": attributes}
+                             for chemical_id, attributes 
+                             in chemical_attributes.items()
+                             if len(attributes["mesh_name"]) > 0]
+            self.set_node_properties_bulk("chemical", chemical_rows,
+                                          rows_per_transaction)
+            self.logging.info("found " + str(len(chemical_rows)) + " of "
+                              + str(len(chemical_ids))
+                              + " chemicals in the MeSH index")
+            return
+
         ## get all information for one gene by using the mygene-package
         ## we are adding more entities: pathways, go-terms
         for index, chemical_id in enumerate(chemical_ids):
@@ -1640,13 +1937,16 @@ class Neo4j_Manager:
                     for simple_field in simple_fields:
                         self.set_tag_node_attribute(
                             chemical_db_id, simple_field, 
-                            add_quotes(chemical_attributes[simple_field]))
+                            str(chemical_attributes[simple_field]))
 
     def run_node_embedding(self,
                            graph_creation: str = None,
                            embedding_attribute_128dim: str = "embedding",
                            embedding_attribute_2dim_prefix: str = "embedding_global",
                            ):
+        embedding_attribute_128dim = cypher_identifier(embedding_attribute_128dim)
+        embedding_attribute_2dim_prefix = cypher_identifier(
+            embedding_attribute_2dim_prefix)
         ## check if the graph structure exists, then delete it
         check_query = '''
         CALL gds.graph.exists('knowledgeGraph')
@@ -1719,16 +2019,16 @@ class Neo4j_Manager:
             for index, row in X_embedded_annotation.iterrows():
                 if index % 5000 == 0:
                     self.logging.info("index = " + str(index))
-                id = row['id']
-                x = row['x']
-                y = row['y']
                 str_query = f'''
                 MATCH (n)
-                WHERE id(n) = {id}
-                SET n.{embedding_attribute_2dim_prefix}_x = {x},
-                n.{embedding_attribute_2dim_prefix}_y = {y}
+                WHERE id(n) = $id
+                SET n.{embedding_attribute_2dim_prefix}_x = $x,
+                n.{embedding_attribute_2dim_prefix}_y = $y
                 '''
-                result = self.query(str_query,log_queries = False)
+                result = self.query(str_query,log_queries = False,
+                                    parameters = {"id": int(row['id']),
+                                                  "x": float(row['x']),
+                                                  "y": float(row['y'])})
             self.logging.info("DONE: writing embedding to neo4j")
         else:
             self.logging.info("Embedding matrix A is None - cannot continue with embedding. Probably the neo4j graph embedding failed.")
@@ -1867,80 +2167,90 @@ class Neo4j_Manager:
         return graph_data
 
 
+    ## store of the cytoscape results (one compressed result per query key,
+    # tagged with the graph version), shared by the api workers and the
+    # manager
+    def get_cytoscape_cache(self, base_output_path: str = "/output") \
+            -> Api_Cache:
+        if self.cytoscape_cache == None:
+            self.cytoscape_cache = Api_Cache(
+                os.path.join(base_output_path, "cytoscape_cache.sqlite"),
+                get_graph_version=self.get_graph_version,
+                logging=self.logging)
+        return self.cytoscape_cache
+
     def get_cytoscape_query(self, query_key: str, 
             base_input_path = "/input",
             base_output_path = "/output",
             run_node_embedding: bool = True
             ) -> None:
-        response = None
-        query_input_path =  os.path.join(base_input_path, "cytoscape_queries.json")
-        query_output_path = os.path.join(base_output_path, "cytoscape_query_results.json")
-
-        ## run the query
-        self.logging.info("accessing cytoscape queries.json")
-        with open(query_output_path) as result_dict_file:
-            result_dict = json.load(result_dict_file)
-            ## return cached result if exists
-            if query_key in result_dict:
-                response = result_dict[query_key]['result']
-            ## else run query and save result in cache
+        cytoscape_cache = self.get_cytoscape_cache(base_output_path)
+        graph_version = cytoscape_cache.get_graph_version()
+        ## return cached result if exists (for the current graph version, an
+        # unknown version is never cached)
+        found, response = False, None
+        if graph_version != None:
+            found, response = cytoscape_cache.get("cytoscape",
+                                                  {"query_key": query_key},
+                                                  graph_version)
+        ## else run query and save result in cache
+        if not found:
+            self.logging.info("accessing cytoscape queries.json")
+            query_input_path =  os.path.join(base_input_path, "cytoscape_queries.json")
+            with open(query_input_path) as json_file:
+                cytoscape_queries = json.load(json_file)
+            if query_key in cytoscape_queries:
+                query = cytoscape_queries[query_key]['query']
+                response = self.neo4j_response_to_json(query, base_path = base_input_path, \
+                    run_node_embedding = run_node_embedding)
+                ## failed / empty responses are not stored
+                if graph_version != None and is_result_cachable(response):
+                    cytoscape_cache.put("cytoscape", {"query_key": query_key},
+                                        response, graph_version)
             else:
-                result_dict[query_key] = {}
-                # open the global json-file and perform the curation
-                with open(query_input_path) as json_file:
-                    cytoscape_queries = json.load(json_file)
-                    if query_key in cytoscape_queries:
-                        query = cytoscape_queries[query_key]['query']
-                        response = self.neo4j_response_to_json(query, base_path = base_input_path, \
-                            run_node_embedding = run_node_embedding)
-                                        # Directly from dictionary
-                        result_dict[query_key]['result'] = response
-                    else:
-                        self.logging.info("Could not find query: entry=" \
-                            + str(query_key) )
-                        response = [{"message": "Could not find query: " \
-                            + str(query_key)}]
-                        
-                with open(query_output_path, 'w') as result_dict_file:
-                    json.dump(result_dict, result_dict_file)
+                self.logging.info("Could not find query: entry=" \
+                    + str(query_key) )
+                response = [{"message": "Could not find query: " \
+                    + str(query_key)}]
         self.logging.info("DONE runnig the query")
         return response
 
-    def cache_cytoscape_results(self, run_node_embedding: bool = True):
+    ## run all cytoscape queries and store their results for the current
+    # graph version (each result is written on its own)
+    def cache_cytoscape_results(self, run_node_embedding: bool = True,
+                                base_input_path = "/input",
+                                base_output_path = "/output"):
         self.logging.info("START caching cytoscape results")
         ## global curation file
-        cytoscape_queries_json = "/input/cytoscape_queries.json"
-         ## cached results
-        cytoscape_results_json = "/output/cytoscape_query_results.json"
-        create_cytoscape_results_json = Path(cytoscape_results_json)
-        create_cytoscape_results_json.touch(exist_ok=True)
+        cytoscape_queries_json = os.path.join(base_input_path,
+                                              "cytoscape_queries.json")
+        cytoscape_cache = self.get_cytoscape_cache(base_output_path)
+        graph_version = cytoscape_cache.get_graph_version()
 
-        result_dict = {}
         with open(cytoscape_queries_json) as queries_json_file:
             cytoscape_queries = json.load(queries_json_file)
-            for query_key in cytoscape_queries:
-                self.logging.info("START with query: " + query_key)
-                result_dict[query_key] = {}
-                query = cytoscape_queries[query_key]['query']
-                response = self.neo4j_response_to_json(query, \
-                    run_node_embedding=run_node_embedding)
-                result_dict[query_key]['result'] = response
-                self.logging.info("DONE with query: " + query_key)
-        with open(cytoscape_results_json, 'w') as result_dict_file:
-            json.dump(result_dict, result_dict_file)
+        for query_key in cytoscape_queries:
+            self.logging.info("START with query: " + query_key)
+            query = cytoscape_queries[query_key]['query']
+            response = self.neo4j_response_to_json(query, \
+                base_path = base_input_path,
+                run_node_embedding=run_node_embedding)
+            if graph_version != None and is_result_cachable(response):
+                cytoscape_cache.put("cytoscape", {"query_key": query_key},
+                                    response, graph_version)
+            self.logging.info("DONE with query: " + query_key)
         self.logging.info("DONE caching cytoscape results")
     
     @staticmethod
     def _set_tag_node_attribute(tx, node_id: int, attribute_name: str, 
                                 attribute_value: str) -> list:
         query = (
-            "MATCH (n)"
-            "WHERE ID(n) = "+str(node_id)+" "
-            "SET n."+str(attribute_name)+" = "+str(attribute_value) + " "
+            "MATCH (n) "
+            "WHERE ID(n) = $node_id "
+            "SET n." + cypher_identifier(attribute_name) + " = $attribute_value "
             "RETURN count(n) AS count_id_results;"
         )
-        result = tx.run(query, node_id = node_id, 
-                        attribute_name = attribute_name, 
+        result = tx.run(query, node_id = int(node_id), 
                         attribute_value = attribute_value)
         return [record["count_id_results"] for record in result]
 
@@ -1949,23 +2259,20 @@ class Neo4j_Manager:
                            node_value: str, attribute_name: str, 
                            attribute_value: str) -> list:
         query = (
-            "MATCH (n:"+str(node_label)+") "
-            "WHERE n."+str(node_attribute)+" = '"+str(node_value)+"' "
-            "SET n."+str(attribute_name)+" = '"+str(attribute_value) + "' "
+            "MATCH (n:" + cypher_identifier(node_label) + ") "
+            "WHERE n." + cypher_identifier(node_attribute) + " = $node_value "
+            "SET n." + cypher_identifier(attribute_name) + " = $attribute_value "
             "RETURN count(n) AS count_id_results;"
         )
-        result = tx.run(query, node_label = node_label, 
-                        node_attribute = node_attribute, 
-                        node_value = node_value,
-                        attribute_name = attribute_name, 
-                        attribute_value = attribute_value)
+        result = tx.run(query, node_value = str(node_value),
+                        attribute_value = str(attribute_value))
         return [record["count_id_results"] for record in result]
 
     @staticmethod
     def _has_gene_any_pathway(tx, gene_name: str) -> list:
         query = (
-            "MATCH (g:gene)--(p:pathway)"
-            "WHERE g.name = '"+gene_name+"' "
+            "MATCH (g:gene)--(p:pathway) "
+            "WHERE g.name = $gene_name "
             "RETURN p.name AS name;"
         )
         result = tx.run(query, gene_name=gene_name)
@@ -1975,11 +2282,11 @@ class Neo4j_Manager:
     def _create_pathway_for_gene(tx, gene_name: str, pathway_name: str,
                                  pathway_label: str) -> list:
         query = (
-            "MATCH (g:gene)"
-            "WHERE g.name = '"+gene_name+"' "
-            "MERGE (p:pathway { name: '" + pathway_name +"' }) "
-            "ON CREATE SET p.label = '"+ pathway_label +"' "
-            "MERGE (p)-[:pathway_contains_gene]->(g)"
+            "MATCH (g:gene) "
+            "WHERE g.name = $gene_name "
+            "MERGE (p:pathway { name: $pathway_name }) "
+            "ON CREATE SET p.label = $pathway_label "
+            "MERGE (p)-[:pathway_contains_gene]->(g) "
             "RETURN p.name AS name;"
         )
         result = tx.run(query, gene_name = gene_name, 
@@ -1996,99 +2303,116 @@ class Neo4j_Manager:
                                   object_values: List[str], 
                                   relationship_str: str, 
                                   entity_identifier: str) -> list:
-        object_attribute_list = []
         if len(object_attributes) != len(object_values):
             raise Exception("Wrong length for attribute list and attribute "\
                             "values: len(object_attribute)=" \
                             + str(len(object_attributes)) \
                             + " vs len(object_values)=" \
                             + str(len(object_values)))
-        else:
-            for index, attribute in enumerate(object_attributes):
-                object_attribute_list.append(
-                    " " + entity_identifier + "." + attribute + "='" \
-                    + object_values[index]+"' ") 
-        
-        object_attribute_str = ",".join(object_attribute_list)
+        object_properties = {cypher_identifier(attribute): object_values[index]
+                             for index, attribute in enumerate(object_attributes)}
+        entity_identifier = cypher_identifier(entity_identifier)
         query = (
-            "MATCH (g:"+entity_label+") "
-            "WHERE g.name = '"+entity_name+"' "
-            "MERGE (p:"+object_label+" { name: '" + object_name +"' }) "
-            "ON CREATE SET "+object_attribute_str+" "
-            "ON MATCH SET "+object_attribute_str+" "
-            "MERGE (p)"+relationship_str+"(g)"
-            "RETURN p.name AS name;"
+            "MATCH (g:" + cypher_identifier(entity_label) + ") "
+            "WHERE g.name = $entity_name "
+            "MERGE (" + entity_identifier + ":" + cypher_identifier(object_label)
+                + " { name: $object_name }) "
+            "SET " + entity_identifier + " += $object_properties "
+            "MERGE (" + entity_identifier + ")"
+                + cypher_relationship(relationship_str) + "(g) "
+            "RETURN " + entity_identifier + ".name AS name;"
         )
-        result = tx.run(query, entity_label = entity_label, 
-                        entity_name = entity_name, 
-                        object_label = object_label,
+        result = tx.run(query, entity_name = entity_name, 
                         object_name = object_name, 
-                        object_attributes = object_attributes, 
-                        object_values = object_values, 
-                        relationship_str = relationship_str, 
-                        entity_identifier = entity_identifier)
+                        object_properties = object_properties)
         return [record["name"] for record in result]
 
 
+    @staticmethod
+    def _set_node_properties_bulk(tx, node_label: str,
+                                  rows: List[dict]) -> None:
+        query = (
+            "UNWIND $rows AS line "
+            "MATCH (n:" + cypher_identifier(node_label) + " { name: line.name }) "
+            "SET n += line.properties"
+        )
+        result = tx.run(query, rows = rows)
+
+    @staticmethod
+    def _create_objects_for_entities_bulk(tx, entity_label: str,
+                                          object_label: str,
+                                          relationship_str: str,
+                                          rows: List[dict]) -> None:
+        query = (
+            "UNWIND $rows AS line "
+            "MATCH (g:" + cypher_identifier(entity_label)
+                + " { name: line.gene }) "
+            "MERGE (p:" + cypher_identifier(object_label)
+                + " { name: line.name }) "
+            "SET p += line.properties "
+            "MERGE (p)" + cypher_relationship(relationship_str) + "(g)"
+        )
+        result = tx.run(query, rows = rows)
+
     @staticmethod
     def _search_term_in_label(tx, concept_label: str, concept_field: str, 
                               search_operator: str, term: str, 
                               return_field: str) -> list:
         query = (
-            "MATCH (p:"+concept_label+") "
-            "WHERE toLower(p." + concept_field+") " + search_operator \
-                + " toLower('"+term +"') "
-            "RETURN p."+return_field+" AS name"
+            "MATCH (p:" + cypher_identifier(concept_label) + ") "
+            "WHERE " + get_cypher_comparison(
+                "toLower(p." + cypher_identifier(concept_field) + ")",
+                search_operator, "term") + " "
+            "RETURN p." + cypher_identifier(return_field) + " AS name"
         )
-        result = tx.run(query, concept_label = concept_label, 
-                        concept_field = concept_field, 
-                        search_operator = search_operator, 
-                        term = term, return_field = return_field)
+        result = tx.run(query, term = str(term).lower())
         return [record["name"] for record in result]
 
     @staticmethod
     def _where_exists_field(tx, concept_label: str, concept_field: str, 
-                            return_field: str, negate: bool = False) -> list:
+                            return_field: str, negate: bool = False,
+                            integration_run: int = None) -> list:
         negate_str = ""
         if negate:
             negate_str = " NOT "
+        integration_run_str = ""
+        if integration_run != None:
+            integration_run_str = " p.integration_run = $integration_run AND "
 
         query_string = '''
                 MATCH (p:{}) 
-                WHERE {} p.{} IS NOT NULL 
+                WHERE {} {} p.{} IS NOT NULL 
                 RETURN p.{} AS name 
-            '''.format(concept_label, negate_str, concept_field, return_field)
+            '''.format(cypher_identifier(concept_label), integration_run_str,
+                       negate_str, cypher_identifier(concept_field),
+                       cypher_identifier(return_field))
         query = (
             query_string
         )
-        result = tx.run(query, concept_label = concept_label, negate = negate,
-                        concept_field = concept_field, 
-                        return_field = return_field)
+        result = tx.run(query, integration_run = integration_run)
         return [record["name"] for record in result]
 
     @staticmethod
     def _search_id_in_label(tx, concept_label: str, concept_field: str, 
                             search_operator: str, term: str) -> list:
         query = (
-            "MATCH (p:"+concept_label+") "
-            "WHERE toLower(p."+concept_field+") " + search_operator \
-                + " toLower('" + term + "') "
+            "MATCH (p:" + cypher_identifier(concept_label) + ") "
+            "WHERE " + get_cypher_comparison(
+                "toLower(p." + cypher_identifier(concept_field) + ")",
+                search_operator, "term") + " "
             "RETURN ID(p) AS n_id"
         )
-        result = tx.run(query, concept_label = concept_label, 
-                        concept_field = concept_field, 
-                        search_operator = search_operator, term=term)
+        result = tx.run(query, term = str(term).lower())
         return [record["n_id"] for record in result]
 
     @staticmethod
     def _get_all_nodes_for_label(tx, concept_label: str, return_field: str) \
             -> list:
         query = (
-            "MATCH (p:"+concept_label+") "
-            "RETURN p."+return_field+" AS name"
+            "MATCH (p:" + cypher_identifier(concept_label) + ") "
+            "RETURN p." + cypher_identifier(return_field) + " AS name"
         )
-        result = tx.run(query, concept_label = concept_label, 
-                        return_field = return_field)
+        result = tx.run(query)
         return [record["name"] for record in result]
 
     @staticmethod
@@ -2104,17 +2428,21 @@ class Neo4j_Manager:
         return [record["count_n"] for record in result]
     
     @staticmethod
-    def _add_age_for_all_articles(tx):
+    def _add_age_for_all_articles(tx, integration_run: int = None):
+        integration_run_str = ""
+        if integration_run != None:
+            integration_run_str = "n.integration_run = $integration_run AND "
         query = (
             "MATCH (n:Article) " 
-            "WHERE size(n.epubdate) = 10 AND size(n.date_integration) = 10 "
+            "WHERE " + integration_run_str + "size(n.epubdate) = 10 AND "
+            "size(n.date_integration) = 10 "
             "SET n.age_in_days = duration.inDays(date(n.epubdate), "\
                 "date(n.date_integration)).days, n.age_in_months = "\
                 "duration.inMonths(date(n.epubdate), "\
                 "date(n.date_integration)).months "
             "RETURN count(n) as count_n"
             )
-        result = tx.run(query)
+        result = tx.run(query, integration_run = integration_run)
         return [record["count_n"] for record in result]
 
     @staticmethod
@@ -2125,8 +2453,23 @@ class Neo4j_Manager:
 
 
     @staticmethod
-    def _cleanup_null_nodes(tx) -> None:
-        result = tx.run("MATCH (n) WHERE n.name=\"Null\" DETACH DELETE n;")
+    def _cleanup_null_nodes(tx, labels: List[str] = None,
+                            integration_run: int = None) -> None:
+        if labels == None:
+            if integration_run != None:
+                result = tx.run("MATCH (n)--(m) WHERE n.name=\"Null\" "
+                                "SET m.integration_run = $integration_run;",
+                                integration_run = integration_run)
+            result = tx.run("MATCH (n) WHERE n.name=\"Null\" DETACH DELETE n;")
+            return
+        for label in labels:
+            if integration_run != None:
+                result = tx.run("MATCH (n:" + cypher_identifier(label) + " "
+                                "{name: \"Null\"})--(m) "
+                                "SET m.integration_run = $integration_run;",
+                                integration_run = integration_run)
+            result = tx.run("MATCH (n:" + cypher_identifier(label) + " "
+                            "{name: \"Null\"}) DETACH DELETE n;")
         
     @staticmethod
     def _clear_graph(tx) -> None:
@@ -2150,6 +2493,10 @@ class Neo4j_Manager:
             "CREATE INDEX IF NOT EXISTS FOR (n:mutation) ON (n.name);")
         result = tx.run(
             "CREATE INDEX IF NOT EXISTS FOR (n:cellline) ON (n.name);")
+        ## nodes of an integration run (post processing)
+        for label in ["Article", "disease", "gene", "chemical", "species"]:
+            result = tx.run("CREATE INDEX IF NOT EXISTS FOR (n:" + label
+                            + ") ON (n.integration_run);")
 
     @staticmethod
     def _calculate_and_write_article_rank(tx) -> None:
@@ -2185,57 +2532,29 @@ class Neo4j_Manager:
             """
             result = tx.run(query)
 
+    @staticmethod
+    def _start_integration_run(tx, increment: int) -> int:
+        query = (
+            "MERGE (s:Stats {name: 'global_stats'}) "
+            "SET s.integration_run = coalesce(s.integration_run, 0) "
+            "+ $increment "
+            "RETURN s.integration_run AS integration_run"
+        )
+        result = tx.run(query, increment = increment)
+        return result.single()["integration_run"]
 
     @staticmethod
-    def _create_citation_graph(tx, bioconcepts: str) -> None:
-        str_adding_annotations = neo4j_create_entities_command(bioconcepts)
-        date_now = str(datetime.now().strftime('%Y-%m-%d'))
+    def _create_citation_graph(tx, bioconcepts: str,
+                               integration_run: int = None) -> None:
         query = ("LOAD CSV WITH HEADERS FROM 'file:///data/citations.csv' "\
-                 "AS line FIELDTERMINATOR '|' "
-                "MERGE (p1:Article { name: line.article }) "
-                "ON CREATE SET p1.a_name = line.article, "\
-                    "p1.label = line.article, "\
-                    "p1.b_title = line.article_title, "\
-                    "p1.pmc_id = line.article_pmc_id, "\
-                    "p1.epubdate = line.article_epubdate, "\
-                    "p1.authors = line.article_authors, "\
-                    "p1.journal = line.article_journal, "\
-                    "p1.z_abstract = line.article_abstract, "\
-                    "p1.date_integration = '" + date_now + "' "
-                "ON MATCH SET p1.a_name = line.article, "\
-                    "p1.label = line.article, "\
-                    "p1.b_title = line.article_title, "\
-                    "p1.pmc_id = line.article_pmc_id, "\
-                    "p1.epubdate = line.article_epubdate, "\
-                    "p1.authors = line.article_authors, "\
-                    "p1.journal = line.article_journal, "\
-                    "p1.z_abstract = line.article_abstract, "\
-                    "p1.date_integration = '" + date_now + "' "
-                "MERGE (p2:Article { name: line.reference }) "
-                "ON CREATE SET p2.a_name = line.reference, "\
-                    "p2.label = line.reference, "\
-                    "p2.b_title = line.reference_title, "\
-                    "p2.pmc_id = line.reference_pmc_id, "\
-                    "p2.epubdate = line.reference_epubdate, "\
-                    "p2.authors = line.reference_authors, "\
-                    "p2.journal = line.reference_journal, "\
-                    "p2.z_abstract = line.reference_abstract, "\
-                    "p2.date_integration = '" + date_now + "' "
-                "ON MATCH SET p2.a_name = line.reference, "\
-                    "p2.label = line.reference, "\
-                    "p2.b_title = line.reference_title, "\
-                    "p2.pmc_id = line.reference_pmc_id, "\
-                    "p2.epubdate = line.reference_epubdate, "\
-                    "p2.authors = line.reference_authors, "\
-                    "p2.journal = line.reference_journal, "\
-                    "p2.z_abstract = line.reference_abstract, "\
-                    "p2.date_integration = '" + date_now + "' "
-                "FOREACH (keyword1 in split(line.article_keywords, ',') | "\
-                    "MERGE (k1:Keyword { name: keyword1 }) MERGE "\
-                    "(p1)-[:contains]->(k1) ) " ""
-                "FOREACH (keyword2 in split(line.reference_keywords, ',') | "\
-                    "MERGE (k2:Keyword { name: keyword2 }) "\
-                    "MERGE (p2)-[:contains]->(k2) ) " \
-                    + str_adding_annotations \
-                    + "MERGE (p1)-[:citing]->(p2);")
-        result = tx.run(query)
\ No newline at end of file
+                 "AS line FIELDTERMINATOR '|' " \
+                 + neo4j_create_citation_graph_command(bioconcepts) + ";")
+        result = tx.run(query, integration_run=integration_run)
+
+    ## bulk import: all rows of the chunk in one transaction
+    @staticmethod
+    def _create_citation_graph_bulk(tx, rows: List[dict], bioconcepts: str,
+                                    integration_run: int = None) -> None:
+        query = ("UNWIND $rows AS line " \
+                 + neo4j_create_citation_graph_command(bioconcepts))
+        result = tx.run(query, rows=rows, integration_run=integration_run)
@@ -0,0 +1,178 @@
+## neo4j_import.py
+## cold build: write the citation rows as node and relationship csv files in
+# the neo4j-admin database import format, the neo4j container imports them
+# (and swaps the database) on its next start (see
+# knowledge-graph-neo4j/cold-build-entrypoint.sh)
+import csv
+import os
+import time
+from logging import Logger
+from typing import List
+
+
+## marker files in the import directory: the manager writes ready, the neo4j
+# container answers with done or failed
+READY_MARKER = "import.ready"
+DONE_MARKER = "import.done"
+FAILED_MARKER = "import.failed"
+ARGS_FILE = "import.args"
+
+ARTICLE_PROPERTIES = [
+    "a_name",
+    "label",
+    "b_title",
+    "pmc_id",
+    "epubdate",
+    "authors",
+    "journal",
+    "z_abstract",
+    "date_integration",
+    "query",
+]
+## csv column (of the citation rows) for each article property
+ARTICLE_COLUMNS = {
+    "b_title": "_title",
+    "pmc_id": "_pmc_id",
+    "epubdate": "_epubdate",
+    "authors": "_authors",
+    "journal": "_journal",
+    "z_abstract": "_abstract",
+}
+
+
+## the nodes are identified by their name (in one id space per label), like
+# the MERGE of the incremental import: the first row of a node wins (the
+# meta data of an article is the same in every row), relationships are only
+# written once
+class Neo4j_Import_Writer:
+    def __init__(self, import_dir: str, bioconcepts: str,
+                 main_article_ids: List[str], date_integration: str,
+                 neo4j_import_dir: str = None) -> None:
+        self.import_dir = import_dir
+        ## the import directory as seen from the neo4j container
+        self.neo4j_import_dir = neo4j_import_dir if neo4j_import_dir \
+            else import_dir
+        self.bioconcepts = bioconcepts.split(",")
+        self.main_article_ids = set(main_article_ids)
+        self.date_integration = date_integration
+        os.makedirs(import_dir, exist_ok=True)
+        for marker in [READY_MARKER, DONE_MARKER, FAILED_MARKER]:
+            if os.path.exists(os.path.join(import_dir, marker)):
+                os.remove(os.path.join(import_dir, marker))
+
+        self.files = {}
+        self.writers = {}
+        self.node_names = {}
+        self.relationships = {}
+        self._open("Article", "nodes", ["name:ID(Article)"] + ARTICLE_PROPERTIES)
+        self._open("Keyword", "nodes", ["name:ID(Keyword)"])
+        for bioconcept in self.bioconcepts:
+            self._open(bioconcept, "nodes",
+                       ["name:ID(" + bioconcept + ")", "label"])
+        self._open("citing", "relationships",
+                   [":START_ID(Article)", ":END_ID(Article)"])
+        self._open("contains", "relationships",
+                   [":START_ID(Article)", ":END_ID(Keyword)"])
+        for bioconcept in self.bioconcepts:
+            self._open("has_named_entity_" + bioconcept, "relationships",
+                       [":START_ID(Article)", ":END_ID(" + bioconcept + ")"])
+
+    def _open(self, name: str, kind: str, header: List[str]) -> None:
+        file_name = kind + "_" + name + ".csv"
+        self.files[name] = open(os.path.join(self.import_dir, file_name), "w",
+                                newline="")
+        self.writers[name] = csv.writer(self.files[name])
+        self.writers[name].writerow(header)
+        if kind == "nodes":
+            self.node_names[name] = set()
+        else:
+            self.relationships[name] = set()
+
+    def _add_node(self, label: str, name: str, properties: List[str]) -> None:
+        if name not in self.node_names[label]:
+            self.node_names[label].add(name)
+            self.writers[label].writerow([name] + properties)
+
+    def _add_relationship(self, relationship: str, start: str,
+                          end: str) -> None:
+        if (start, end) not in self.relationships[relationship]:
+            self.relationships[relationship].add((start, end))
+            self.writers[relationship].writerow([start, end])
+
+    def _add_article(self, row: dict, prefix: str) -> str:
+        name = row[prefix]
+        properties = {"a_name": name, "label": name,
+                      "date_integration": self.date_integration,
+                      "query": "main" if name in self.main_article_ids
+                      else None}
+        for property_name, column in ARTICLE_COLUMNS.items():
+            properties[property_name] = row.get(prefix + column)
+        self._add_node("Article", name,
+                       [properties[_] for _ in ARTICLE_PROPERTIES])
+        ## keywords and named entities (split like the FOREACH of the import)
+        if row.get(prefix + "_keywords") != None:
+            for keyword in row[prefix + "_keywords"].split(","):
+                self._add_node("Keyword", keyword, [])
+                self._add_relationship("contains", name, keyword)
+        for bioconcept in self.bioconcepts:
+            if row.get(prefix + "_" + bioconcept) != None:
+                for annotation in row[prefix + "_" + bioconcept].split(","):
+                    annotation_split = annotation.split(";")
+                    entity_name = annotation_split[0]
+                    entity_label = annotation_split[1] \
+                        if len(annotation_split) > 1 else None
+                    self._add_node(bioconcept, entity_name, [entity_label])
+                    self._add_relationship("has_named_entity_" + bioconcept,
+                                           name, entity_name)
+        return name
+
+    ## add the citation rows (see neo4j_helper.get_citation_rows)
+    def add_rows(self, rows: List[dict]) -> None:
+        for row in rows:
+            article = self._add_article(row, "article")
+            reference = self._add_article(row, "reference")
+            self._add_relationship("citing", article, reference)
+
+    def get_statistics(self) -> dict:
+        statistics = {label: len(names)
+                      for label, names in self.node_names.items()}
+        statistics.update({relationship: len(pairs) for relationship, pairs
+                           in self.relationships.items()})
+        return statistics
+
+    ## close the csv files and write the arguments for neo4j-admin
+    def close(self) -> None:
+        for csv_file in self.files.values():
+            csv_file.close()
+        import_args = []
+        for label in self.node_names:
+            import_args.append("--nodes=" + label + "=" + os.path.join(
+                self.neo4j_import_dir, "nodes_" + label + ".csv"))
+        for relationship in self.relationships:
+            relationship_type = "has_named_entity" \
+                if relationship.startswith("has_named_entity_") \
+                else relationship
+            import_args.append(
+                "--relationships=" + relationship_type + "=" + os.path.join(
+                    self.neo4j_import_dir,
+                    "relationships_" + relationship + ".csv"))
+        with open(os.path.join(self.import_dir, ARGS_FILE), "w") as f:
+            f.write("\n".join(import_args) + "\n")
+
+
+## hand the import over to the neo4j container and wait until the database
+# has been swapped (True) or the import failed (False)
+def run_import(import_dir: str, logging: Logger = None,
+               timeout: float = 24 * 3600) -> bool:
+    with open(os.path.join(import_dir, READY_MARKER), "w") as f:
+        f.write(str(time.time()))
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if os.path.exists(os.path.join(import_dir, DONE_MARKER)):
+            return True
+        if os.path.exists(os.path.join(import_dir, FAILED_MARKER)):
+            return False
+        if logging != None:
+            logging.info("waiting for neo4j-admin import in " + import_dir)
+        time.sleep(10)
+    return False
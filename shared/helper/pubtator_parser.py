@@ -0,0 +1,122 @@
+## pubtator_parser.py
+## parsers for the PubTator3 responses (BioC XML of the full texts)
+import io
+import xml.etree.ElementTree as ET
+from logging import Logger
+from typing import Iterator, List, Tuple
+
+
+## PubTator marks mentions without a normalized identifier with "-"
+MISSING_IDENTIFIERS = {"Null", "-"}
+
+
+## stream the passage annotations of a BioC XML (in memory, no temp file)
+# and yield (type, identifier, text) for each annotation, infons that are
+# missing are "Null" (like the former bioc.load based parser)
+def iter_bioc_annotations(bioc_text: str) -> Iterator[Tuple[str, str, str]]:
+    tag_stack = []
+    for event, element in ET.iterparse(io.BytesIO(bioc_text.encode("utf-8")),
+                                       events=("start", "end")):
+        if event == "start":
+            tag_stack.append(element.tag)
+            continue
+        tag_stack.pop()
+        if element.tag == "annotation" and len(tag_stack) > 0 \
+                and tag_stack[-1] == "passage":
+            ner_type = "Null"
+            ner_identifier = "Null"
+            ner_text = None
+            for child in element:
+                if child.tag == "infon":
+                    if child.get("key") == "type":
+                        ner_type = child.text or ""
+                    elif child.get("key") == "identifier":
+                        ner_identifier = child.text or ""
+                elif child.tag == "text":
+                    ner_text = child.text or ""
+            yield ner_type, ner_identifier, ner_text
+        elif element.tag == "passage":
+            ## the passage (and its annotations) is processed
+            element.clear()
+
+
+## build the annotation string (one entry per bioconcept, separated by "|")
+# from the annotations of a BioC XML: the first annotation of each type is
+# always taken, further annotations only once per (normalized) identifier;
+# returns None if there are no annotations (or the XML is invalid)
+def get_bioc_annotation_string(bioc_text: str, bioconcepts_list: List[str],
+                               logging: Logger = None,
+                               error_message: str = "") -> str:
+    ner_dict = {}
+    ner_identifiers = {}
+    try:
+        for ner_type, ner_identifier, text in iter_bioc_annotations(bioc_text):
+            ner_text = str(ner_type) + ":" + str(ner_identifier) + ";" \
+                + str(text)
+            ner_type_lower = ner_type.lower()
+            if ner_type_lower in ner_dict:
+                if ner_identifier and ner_identifier not in MISSING_IDENTIFIERS \
+                        and ner_identifier not in ner_identifiers[ner_type_lower]:
+                    ner_dict[ner_type_lower].append(ner_text)
+                    ner_identifiers[ner_type_lower].add(ner_identifier)
+            else:
+                ner_dict[ner_type_lower] = [ner_text]
+                ner_identifiers[ner_type_lower] = {ner_identifier}
+    except ET.ParseError:
+        if logging != None:
+            logging.info("Error: collection for " + error_message)
+        return None
+    if len(ner_dict) == 0:
+        return None
+    return "|".join([",".join(ner_dict[bioconcept]) if bioconcept in ner_dict
+                     else "Null" for bioconcept in bioconcepts_list])
+
+
+## parse the pubtator export (pubtator format) and return a dict:
+# pubmed_id -> {title, abstract, annotations}
+## single pass: every annotation line is split once and put into an ordered
+# set (dict) per concept, the annotation strings are joined at the end
+def parse_pubtator_text(pubtator_text: str, bioconcepts_list: List[str],
+                        logging: Logger = None) -> dict:
+    pubtator_meta = {}
+    bioconcepts_lower = [bioconcept.lower() for bioconcept in bioconcepts_list]
+    for entry in pubtator_text.split("\n\n")[:-1]:
+        lines = entry.split("\n")
+        title_split = lines[0].split("|")
+        if len(title_split) == 3:
+            pubmed_id_pubtator = title_split[0]
+            title_pubtator = title_split[2]
+        elif logging != None:
+            logging.info("error: not the pubtator format")
+            logging.info(lines[0])
+        if len(lines) > 1:
+            abstract_split = lines[1].split("|")
+            if len(abstract_split) == 3:
+                abstract_pubtator = abstract_split[2]
+            elif logging != None:
+                logging.info("error: not the pubtator format")
+                logging.info(lines[1])
+
+        ## concept -> ordered set of unique annotations
+        concept_annotations = {bioconcept: {} for bioconcept in bioconcepts_lower}
+        for line in lines[2:]:
+            fields = line.split("\t")
+            if len(fields) > 5:
+                concept = fields[4]
+                concept_lower = concept.lower()
+                if concept_lower in concept_annotations:
+                    concept_annotations[concept_lower][
+                        concept + ":" + fields[5] + ";" + fields[3]] = None
+
+        annotations_all = []
+        for bioconcept in bioconcepts_lower:
+            if len(concept_annotations[bioconcept]) > 0:
+                annotations_all.append(",".join(concept_annotations[bioconcept]))
+            else:
+                annotations_all.append("Null")
+        pubtator_meta[pubmed_id_pubtator] = {
+            "title": title_pubtator,
+            "abstract": abstract_pubtator,
+            "annotations": "|".join(annotations_all),
+        }
+    return pubtator_meta
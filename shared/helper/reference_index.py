@@ -0,0 +1,306 @@
+## reference_index.py
+## local indices of the reference dumps (no scraping of the web pages): the
+# MeSH descriptor / supplementary XML (https://nlmpubs.nlm.nih.gov/projects/
+# mesh/MESH_FILES/xmlmesh/) and the NCBI taxonomy names.dmp / nodes.dmp /
+# merged.dmp (https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/taxdump.tar.gz) are
+# loaded
+# into a SQLite database, which is rebuilt when a dump changes
+import json
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from logging import Logger
+from typing import Dict, Iterator, List, Tuple
+
+
+## the rows are inserted in batches while the dumps are streamed
+INSERT_BATCH_SIZE = 10000
+
+
+## SQLite index of dump files: the signatures (mtime, size) of the dumps are
+# stored in the database, a changed dump rebuilds the whole index (into a
+# temporary file, which replaces the old index)
+class Reference_Index(ABC):
+    schema = []
+
+    def __init__(self, index_path: str, source_paths: List[str],
+                 logging: Logger = None) -> None:
+        self.index_path = index_path
+        self.source_paths = list(source_paths)
+        self.logging = logging
+        if not self._is_up_to_date():
+            self._build()
+        self.connection = sqlite3.connect(self.index_path,
+                                          check_same_thread=False)
+
+    def _log(self, message: str) -> None:
+        if self.logging != None:
+            self.logging.info(message)
+
+    ## the signatures of the dumps and the schema (a changed schema rebuilds
+    # the index, too)
+    def _get_signatures(self) -> str:
+        signatures = {"schema": self.schema}
+        for path in self.source_paths:
+            stat_result = os.stat(path)
+            signatures[path] = [stat_result.st_mtime, stat_result.st_size]
+        return json.dumps(signatures, sort_keys=True)
+
+    def _is_up_to_date(self) -> bool:
+        if not os.path.isfile(self.index_path):
+            return False
+        try:
+            connection = sqlite3.connect(self.index_path)
+            try:
+                row = connection.execute(
+                    "SELECT value FROM meta WHERE key = 'signatures'"
+                ).fetchone()
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError:
+            return False
+        return row != None and row[0] == self._get_signatures()
+
+    def _build(self) -> None:
+        self._log("build the index " + self.index_path + " from "
+                  + ", ".join(self.source_paths))
+        index_path_temp = self.index_path + ".tmp"
+        if os.path.exists(index_path_temp):
+            os.remove(index_path_temp)
+        connection = sqlite3.connect(index_path_temp)
+        try:
+            connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, "
+                               "value TEXT)")
+            for statement in self.schema:
+                connection.execute(statement)
+            self.load(connection)
+            connection.execute("INSERT INTO meta VALUES ('signatures', ?)",
+                               (self._get_signatures(),))
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(index_path_temp, self.index_path)
+
+    ## fill the tables (implemented by the subclasses)
+    @abstractmethod
+    def load(self, connection: sqlite3.Connection) -> None:
+        pass
+
+    def _insert_batches(self, connection: sqlite3.Connection, statement: str,
+                        rows: Iterator[tuple]) -> int:
+        batch = []
+        count_rows = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                connection.executemany(statement, batch)
+                count_rows += len(batch)
+                batch = []
+        connection.executemany(statement, batch)
+        return count_rows + len(batch)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _get_text(element: ET.Element, path: str) -> str:
+    found_element = element.find(path)
+    if found_element == None or found_element.text == None:
+        return ""
+    return found_element.text.strip()
+
+
+## the attributes of a MeSH descriptor or supplementary record (like the
+# fields of the former meshb.nlm.nih.gov scraper)
+def get_mesh_record_attributes(record: ET.Element,
+                               record_type: str) -> Tuple[str, dict]:
+    if record_type == "descriptor":
+        record_ui = _get_text(record, "DescriptorUI")
+        mesh_name = _get_text(record, "DescriptorName/String")
+    else:
+        record_ui = _get_text(record, "SupplementalRecordUI")
+        mesh_name = _get_text(record, "SupplementalRecordName/String")
+    attributes = {"mesh_name": mesh_name}
+    if record_type == "supplementary":
+        attributes["note"] = _get_text(record, "Note")
+        attributes["source"] = ", ".join(
+            [source.text.strip() for source in record.iter("Source")
+             if source.text])
+    attributes["scope_note"] = _get_text(
+        record, "ConceptList/Concept[@PreferredConceptYN='Y']/ScopeNote")
+    entry_terms = []
+    for term_string in record.findall("ConceptList/Concept/TermList/Term/String"):
+        if term_string.text and term_string.text != mesh_name \
+                and term_string.text not in entry_terms:
+            entry_terms.append(term_string.text)
+    attributes["entry_terms"] = ", ".join(entry_terms)
+    attributes["pharmacological_actions"] = ", ".join(
+        [_get_text(action, "DescriptorReferredTo/DescriptorName/String")
+         for action in record.findall(
+             "PharmacologicalActionList/PharmacologicalAction")])
+    attributes["previous_indexing"] = ", ".join(
+        [previous.text.strip() for previous
+         in record.findall("PreviousIndexingList/PreviousIndexing")
+         if previous.text])
+    return record_ui, attributes
+
+
+## MeSH descriptors (desc*.xml) and supplementary concepts (supp*.xml)
+class MeSH_Index(Reference_Index):
+    schema = ["CREATE TABLE mesh (ui TEXT PRIMARY KEY, record_type TEXT, "
+              "attributes TEXT)"]
+
+    def _iter_records(self, path: str) -> Iterator[tuple]:
+        for event, element in ET.iterparse(path, events=("end",)):
+            if element.tag in ["DescriptorRecord", "SupplementalRecord"]:
+                record_type = "descriptor" \
+                    if element.tag == "DescriptorRecord" else "supplementary"
+                record_ui, attributes = get_mesh_record_attributes(
+                    element, record_type)
+                element.clear()
+                yield (record_ui, record_type, json.dumps(attributes))
+
+    def load(self, connection: sqlite3.Connection) -> None:
+        for path in self.source_paths:
+            count_records = self._insert_batches(
+                connection, "INSERT OR REPLACE INTO mesh VALUES (?, ?, ?)",
+                self._iter_records(path))
+            self._log("loaded " + str(count_records) + " MeSH records from "
+                      + path)
+
+    ## MeSH ui (i.e. D000001 or C000002) -> attributes of the found records
+    def get_attributes(self, mesh_uis: List[str]) -> Dict[str, dict]:
+        attributes = {}
+        mesh_uis = list(dict.fromkeys(mesh_uis))
+        for index in range(0, len(mesh_uis), 500):
+            batch = mesh_uis[index:index + 500]
+            for mesh_ui, attributes_json in self.connection.execute(
+                    "SELECT ui, attributes FROM mesh WHERE ui IN ("
+                    + ",".join(["?"] * len(batch)) + ")", batch):
+                attributes[mesh_ui] = json.loads(attributes_json)
+        return attributes
+
+
+def _split_dmp_line(line: str) -> List[str]:
+    return [field.strip() for field in line.rstrip("\t|\n").split("\t|\t")]
+
+
+## NCBI taxonomy: names.dmp, nodes.dmp and (optional) merged.dmp
+# (source_paths = [names, nodes] or [names, nodes, merged]), the taxa, which
+# have been merged into another taxon, are looked up by their current id
+class Taxonomy_Index(Reference_Index):
+    schema = ["CREATE TABLE names (tax_id INTEGER PRIMARY KEY, "
+              "scientific_name TEXT, common_name TEXT, blast_name TEXT)",
+              "CREATE TABLE nodes (tax_id INTEGER PRIMARY KEY, "
+              "parent_tax_id INTEGER)",
+              "CREATE TABLE merged (old_tax_id INTEGER PRIMARY KEY, "
+              "tax_id INTEGER)"]
+    ## name class of names.dmp -> column
+    name_classes = {"scientific name": "scientific_name",
+                    "genbank common name": "common_name",
+                    "blast name": "blast_name"}
+
+    def _iter_names(self, path: str) -> Iterator[tuple]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = _split_dmp_line(line)
+                if len(fields) >= 4 and fields[3] in self.name_classes:
+                    yield (int(fields[0]), self.name_classes[fields[3]],
+                           fields[1])
+
+    def _iter_nodes(self, path: str) -> Iterator[tuple]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = _split_dmp_line(line)
+                if len(fields) >= 2:
+                    yield (int(fields[0]), int(fields[1]))
+
+    ## merged.dmp: old tax id -> current tax id
+    def _iter_merged(self, path: str) -> Iterator[tuple]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = _split_dmp_line(line)
+                if len(fields) >= 2:
+                    yield (int(fields[0]), int(fields[1]))
+
+    def load(self, connection: sqlite3.Connection) -> None:
+        names_path, nodes_path = self.source_paths[:2]
+        ## one pass over names.dmp into a staging table, then one row per
+        # taxon (there is one name per taxon and name class)
+        connection.execute("CREATE TEMP TABLE names_raw (tax_id INTEGER, "
+                           "name_class TEXT, name TEXT)")
+        count_names = self._insert_batches(
+            connection, "INSERT INTO names_raw VALUES (?, ?, ?)",
+            self._iter_names(names_path))
+        connection.execute(
+            "INSERT INTO names SELECT tax_id, "
+            + ", ".join(["max(CASE WHEN name_class = '" + name_class
+                         + "' THEN name END)"
+                         for name_class in self.name_classes.values()])
+            + " FROM names_raw GROUP BY tax_id")
+        connection.execute("DROP TABLE names_raw")
+        count_nodes = self._insert_batches(
+            connection, "INSERT OR REPLACE INTO nodes VALUES (?, ?)",
+            self._iter_nodes(nodes_path))
+        count_merged = 0
+        if len(self.source_paths) > 2:
+            count_merged = self._insert_batches(
+                connection, "INSERT OR REPLACE INTO merged VALUES (?, ?)",
+                self._iter_merged(self.source_paths[2]))
+        self._log("loaded " + str(count_names) + " taxonomy names, "
+                  + str(count_nodes) + " nodes and " + str(count_merged)
+                  + " merged taxa")
+
+    ## taxonomy id -> current taxonomy id (of the merged taxa, the other ids
+    # are current)
+    def get_current_tax_ids(self, tax_ids: List[int]) -> Dict[int, int]:
+        current_tax_ids = {tax_id: tax_id for tax_id in tax_ids}
+        for index in range(0, len(tax_ids), 500):
+            batch = tax_ids[index:index + 500]
+            for old_tax_id, tax_id in self.connection.execute(
+                    "SELECT old_tax_id, tax_id FROM merged WHERE old_tax_id "
+                    "IN (" + ",".join(["?"] * len(batch)) + ")", batch):
+                current_tax_ids[old_tax_id] = tax_id
+        return current_tax_ids
+
+    ## the blast name is inherited from the closest ancestor with a blast
+    # name (like the taxonomy browser)
+    def get_blast_name(self, tax_id: int) -> str:
+        visited = set()
+        while tax_id != None and tax_id not in visited:
+            visited.add(tax_id)
+            row = self.connection.execute(
+                "SELECT names.blast_name, nodes.parent_tax_id FROM nodes "
+                "LEFT JOIN names ON names.tax_id = nodes.tax_id "
+                "WHERE nodes.tax_id = ?", (tax_id,)).fetchone()
+            if row == None:
+                return ""
+            if row[0]:
+                return row[0]
+            tax_id = row[1]
+        return ""
+
+    ## taxonomy id -> {current_name, common_name, blast_name} of the found
+    # taxa (with a scientific name), a merged taxon gets the attributes of
+    # its current taxon (like the taxonomy browser)
+    def get_attributes(self, tax_ids: List[int]) -> Dict[int, dict]:
+        tax_ids = list(dict.fromkeys([int(tax_id) for tax_id in tax_ids]))
+        current_tax_ids = self.get_current_tax_ids(tax_ids)
+        current_attributes = {}
+        lookup_ids = list(dict.fromkeys(current_tax_ids.values()))
+        for index in range(0, len(lookup_ids), 500):
+            batch = lookup_ids[index:index + 500]
+            for tax_id, scientific_name, common_name in \
+                    self.connection.execute(
+                        "SELECT tax_id, scientific_name, common_name "
+                        "FROM names WHERE scientific_name IS NOT NULL AND "
+                        "tax_id IN (" + ",".join(["?"] * len(batch)) + ")",
+                        batch):
+                current_attributes[tax_id] = {
+                    "current_name": scientific_name,
+                    "common_name": common_name or "",
+                    "blast_name": self.get_blast_name(tax_id)}
+        return {tax_id: current_attributes[current_tax_id]
+                for tax_id, current_tax_id in current_tax_ids.items()
+                if current_tax_id in current_attributes}
@@ -0,0 +1,148 @@
+## response_cache.py
+## persistent (sqlite) cache for the http responses of the NCBI APIs
+import hashlib
+import json
+import time
+from typing import Dict
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+from helper.sqlite_blob_store import Sqlite_Blob_Store
+
+
+## increase the version to invalidate all cached responses (i.e. if the
+# parsing of the APIs changes)
+API_VERSION = "1"
+
+## time to live in seconds for each endpoint (0 = no caching), esearch
+# results change with every new publication -> never cached
+DEFAULT_TTL = {
+    "pubtator_export": 30 * 24 * 3600,
+    "pubtator_biocxml": 30 * 24 * 3600,
+    "esummary": 7 * 24 * 3600,
+    "elink": 24 * 3600,
+    "esearch": 0,
+    "default": 0,
+}
+
+
+def get_endpoint(url: str) -> str:
+    parsed_url = urlparse(url)
+    if "/research/pubtator" in parsed_url.path:
+        if "biocxml" in parsed_url.path:
+            return "pubtator_biocxml"
+        return "pubtator_export"
+    for endpoint in ["esummary", "elink", "esearch"]:
+        if parsed_url.path.endswith(endpoint + ".fcgi"):
+            return endpoint
+    return "default"
+
+
+## the order of the query parameters does not change the response
+def normalize_url(url: str) -> str:
+    parsed_url = urlparse(url.strip())
+    query = urlencode(sorted(parse_qsl(parsed_url.query,
+                                       keep_blank_values=True)))
+    return parsed_url._replace(scheme=parsed_url.scheme.lower(),
+                               netloc=parsed_url.netloc.lower(),
+                               query=query, fragment="").geturl()
+
+
+## minimal replacement for requests.Response (the fields used by the
+# manager: status_code, content, text, json())
+class Cached_Response:
+    def __init__(self, url: str, status_code: int, content: bytes,
+                 encoding: str) -> None:
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.from_cache = True
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self) -> dict:
+        return json.loads(self.text)
+
+
+class Response_Cache(Sqlite_Blob_Store):
+    def __init__(self, path: str, max_size_bytes: int = 2 * 1024 ** 3,
+                 ttl: Dict[str, int] = None,
+                 api_version: str = API_VERSION) -> None:
+        super().__init__(path, "responses",
+                         ["url TEXT", "endpoint TEXT", "status_code INTEGER",
+                          "encoding TEXT", "fetched_at REAL"],
+                         max_size_bytes)
+        self.ttl = dict(DEFAULT_TTL)
+        if ttl != None:
+            self.ttl.update(ttl)
+        self.api_version = api_version
+
+    def get_key(self, url: str) -> str:
+        key_string = self.api_version + "|" + normalize_url(url)
+        return hashlib.sha256(key_string.encode("utf-8")).hexdigest()
+
+    def get_ttl(self, url: str) -> int:
+        return self.ttl.get(get_endpoint(url), self.ttl["default"])
+
+    ## return the cached response or None (missing or expired)
+    def get(self, url: str) -> Cached_Response:
+        ttl = self.get_ttl(url)
+        if ttl <= 0:
+            return None
+        now = time.time()
+        row = self.get_row(self.get_key(url),
+                           ["status_code", "encoding", "fetched_at"],
+                           lambda columns: now - columns[2] <= ttl)
+        if row == None:
+            return None
+        (status_code, encoding, fetched_at), content = row
+        return Cached_Response(url, status_code, content, encoding)
+
+    ## only successful responses of cachable endpoints are stored
+    def put(self, url: str, response) -> None:
+        if response.status_code != 200 or self.get_ttl(url) <= 0:
+            return
+        encoding = getattr(response, "encoding", None) or "utf-8"
+        self.put_row(self.get_key(url),
+                     {"url": url, "endpoint": get_endpoint(url),
+                      "status_code": response.status_code,
+                      "encoding": encoding, "fetched_at": time.time()},
+                     response.content)
+
+
+## the response cache is shared by all request_with_delay implementations
+# (None = caching disabled)
+response_cache = None
+
+
+def configure_response_cache(path: str, max_size_bytes: int,
+                             ttl: Dict[str, int] = None) -> Response_Cache:
+    global response_cache
+    if response_cache != None:
+        if response_cache.path == path:
+            response_cache.max_size_bytes = max_size_bytes
+            response_cache.ttl = dict(DEFAULT_TTL)
+            if ttl != None:
+                response_cache.ttl.update(ttl)
+            return response_cache
+        response_cache.close()
+        response_cache = None
+    if path:
+        response_cache = Response_Cache(path, max_size_bytes, ttl)
+    return response_cache
+
+
+def get_response_cache() -> Response_Cache:
+    return response_cache
+
+
+## parse the ttl config, i.e. "esummary:604800,elink:86400"
+def parse_ttl_string(ttl_string: str) -> Dict[str, int]:
+    ttl = {}
+    for ttl_entry in ttl_string.split(","):
+        if ":" in ttl_entry:
+            endpoint, seconds = ttl_entry.split(":")
+            ttl[endpoint.strip()] = int(seconds)
+    return ttl
@@ -0,0 +1,169 @@
+## run_journal.py
+## durable journal of an integration run: the article list of the run, the
+# stage of every batch (meta_data, citation_links, rows, written), a pointer
+# to the stored payload of the batch (the meta data, the citation links or
+# the built citation rows of its last stage) and the next reference_id, so a
+# restarted run continues where the last run stopped
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+from logging import Logger
+from typing import List
+
+
+class Run_Journal:
+    def __init__(self, journal_dir: str, logging: Logger = None) -> None:
+        self.journal_dir = journal_dir
+        self.logging = logging
+        self.lock = threading.Lock()
+        self.run_id = None
+        os.makedirs(journal_dir, exist_ok=True)
+        self.connection = sqlite3.connect(
+            os.path.join(journal_dir, "journal.sqlite"), check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY "
+                "AUTOINCREMENT, settings TEXT, article_ids TEXT, status TEXT, "
+                "next_reference_id INTEGER, started_at REAL, updated_at REAL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS batches (run_id INTEGER, "
+                "first_index INTEGER, stage TEXT, payload_path TEXT, "
+                "updated_at REAL, PRIMARY KEY (run_id, first_index))")
+            self.connection.commit()
+
+    def _log(self, message: str) -> None:
+        if self.logging != None:
+            self.logging.info(message)
+
+    def _get_payload_dir(self, run_id: int) -> str:
+        return os.path.join(self.journal_dir, "run_" + str(run_id))
+
+    ## resume the unfinished run with the same settings (returns the article
+    # ids of the run, None = no run to resume)
+    def resume_run(self, settings: dict) -> List[str]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT run_id, settings, article_ids FROM runs "
+                "WHERE status = 'running' ORDER BY run_id DESC").fetchone()
+        if row == None:
+            return None
+        if row[1] != json.dumps(settings, sort_keys=True):
+            self._log("run journal: settings changed -> discard run "
+                      + str(row[0]))
+            self._finish(row[0], "discarded")
+            return None
+        self.run_id = row[0]
+        self._log("run journal: resume run " + str(self.run_id) + " ("
+                  + str(self.get_statistics()) + ")")
+        return json.loads(row[2])
+
+    def start_run(self, article_ids: List[str], settings: dict) -> None:
+        now = time.time()
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (settings, article_ids, status, "
+                "next_reference_id, started_at, updated_at) "
+                "VALUES (?, ?, 'running', 0, ?, ?)",
+                (json.dumps(settings, sort_keys=True),
+                 json.dumps(list(article_ids)), now, now))
+            self.connection.commit()
+            self.run_id = cursor.lastrowid
+
+    def get_stage(self, first_index: int) -> str:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT stage FROM batches WHERE run_id = ? AND "
+                "first_index = ?", (self.run_id, first_index)).fetchone()
+        return row[0] if row != None else None
+
+    ## the stage of the batch is done (the payload is stored first, the
+    # pointer is only written for a complete payload file)
+    def set_stage(self, first_index: int, stage: str,
+                  payload: object = None) -> None:
+        payload_path = None
+        if payload != None:
+            payload_dir = self._get_payload_dir(self.run_id)
+            os.makedirs(payload_dir, exist_ok=True)
+            payload_path = os.path.join(payload_dir, "batch_"
+                                        + str(first_index) + ".pkl")
+            with open(payload_path + ".tmp", "wb") as f:
+                pickle.dump(payload, f)
+            os.replace(payload_path + ".tmp", payload_path)
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO batches VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (run_id, first_index) DO UPDATE SET "
+                "stage = excluded.stage, payload_path = coalesce("
+                "excluded.payload_path, batches.payload_path), "
+                "updated_at = excluded.updated_at",
+                (self.run_id, first_index, stage, payload_path, time.time()))
+            self.connection.commit()
+
+    ## the stored payload of the batch (None, if there is no payload)
+    def load_payload(self, first_index: int) -> object:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT payload_path FROM batches WHERE run_id = ? AND "
+                "first_index = ?", (self.run_id, first_index)).fetchone()
+        if row == None or row[0] == None or not os.path.isfile(row[0]):
+            return None
+        try:
+            with open(row[0], "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    ## the batch is in the graph: stage and next reference_id are written in
+    # one transaction
+    def set_written(self, first_index: int, next_reference_id: int) -> None:
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO batches VALUES (?, ?, 'written', NULL, ?) "
+                "ON CONFLICT (run_id, first_index) DO UPDATE SET "
+                "stage = 'written', updated_at = excluded.updated_at",
+                (self.run_id, first_index, now))
+            self.connection.execute(
+                "UPDATE runs SET next_reference_id = ?, updated_at = ? "
+                "WHERE run_id = ?", (next_reference_id, now, self.run_id))
+            self.connection.commit()
+
+    def get_next_reference_id(self) -> int:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT next_reference_id FROM runs WHERE run_id = ?",
+                (self.run_id,)).fetchone()
+        return row[0] if row != None else 0
+
+    def _finish(self, run_id: int, status: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                "UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                (status, time.time(), run_id))
+            self.connection.execute("DELETE FROM batches WHERE run_id = ?",
+                                    (run_id,))
+            self.connection.commit()
+        shutil.rmtree(self._get_payload_dir(run_id), ignore_errors=True)
+
+    ## the run is complete: the payloads are removed
+    def finish_run(self) -> None:
+        if self.run_id != None:
+            self._finish(self.run_id, "done")
+            self.run_id = None
+
+    def get_statistics(self) -> dict:
+        with self.lock:
+            statistics = {stage: count for stage, count in
+                          self.connection.execute(
+                              "SELECT stage, count(*) FROM batches WHERE "
+                              "run_id = ? GROUP BY stage", (self.run_id,))}
+        statistics["run_id"] = self.run_id
+        return statistics
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,72 @@
+## scheduler.py
+## event driven scheduling of the manager: file watching (the watched files
+# are checked by their modification time and size, which costs one stat call
+# per file and interval) and a cron-like cadence for periodic jobs
+import os
+import time
+from typing import List, Tuple
+
+
+## aliases for the cadence of periodic jobs (seconds)
+CADENCE_ALIASES = {
+    "@never": 0,
+    "@minutely": 60,
+    "@hourly": 3600,
+    "@daily": 24 * 3600,
+    "@weekly": 7 * 24 * 3600,
+}
+
+
+## parse the cadence: an alias (i.e. "@hourly") or the seconds between two
+# runs (0 = never)
+def parse_cadence(cadence: str) -> int:
+    cadence = cadence.strip().lower()
+    if cadence in CADENCE_ALIASES:
+        return CADENCE_ALIASES[cadence]
+    return int(cadence)
+
+
+class File_Watcher:
+    def __init__(self, paths: List[str]) -> None:
+        self.paths = list(paths)
+        self.snapshots = {path: self._get_snapshot(path) for path in self.paths}
+
+    def _get_snapshot(self, path: str) -> Tuple[float, int]:
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat_result.st_mtime, stat_result.st_size)
+
+    ## return the paths, which have changed since the last call
+    def get_changed_paths(self) -> List[str]:
+        changed_paths = []
+        for path in self.paths:
+            snapshot = self._get_snapshot(path)
+            if snapshot != self.snapshots[path]:
+                self.snapshots[path] = snapshot
+                changed_paths.append(path)
+        return changed_paths
+
+
+class Cadence_Schedule:
+    def __init__(self, interval_seconds: int, run_at_start: bool = True) -> None:
+        self.interval_seconds = interval_seconds
+        self.last_run = None if run_at_start else time.time()
+
+    def configure(self, interval_seconds: int) -> None:
+        self.interval_seconds = interval_seconds
+
+    def is_due(self) -> bool:
+        if self.interval_seconds <= 0:
+            return False
+        return self.last_run == None \
+            or time.time() - self.last_run >= self.interval_seconds
+
+    def mark_run(self) -> None:
+        self.last_run = time.time()
+
+    ## the next check of is_due is True
+    def run_now(self) -> None:
+        self.last_run = None
+
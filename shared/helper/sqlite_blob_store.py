@@ -0,0 +1,128 @@
+## sqlite_blob_store.py
+## base of the persistent (sqlite) caches: one compressed blob per key with
+# the columns of the cache, the size of the blobs is bounded, the least
+# recently used rows are evicted
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, List, Tuple
+
+
+class Sqlite_Blob_Store:
+    ## columns: the column definitions of the cache besides key, content,
+    # size and last_access (i.e. ["url TEXT", "fetched_at REAL"])
+    def __init__(self, path: str, table: str, columns: List[str],
+                 max_size_bytes: int) -> None:
+        self.path = path
+        self.table = table
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60,
+                                          check_same_thread=False)
+        ## WAL: readers (i.e. other processes) do not block the writer
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS " + table + " ("
+            "key TEXT PRIMARY KEY, " + ", ".join(columns) + ", "
+            "content BLOB, size INTEGER, last_access REAL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS " + table + "_last_access "
+            "ON " + table + " (last_access)")
+        self.connection.commit()
+        self.size_bytes = self._get_size_bytes()
+
+    ## (columns, content) of the key, if is_valid(columns), else None (the
+    # access time of a valid row is updated)
+    def get_row(self, key: str, columns: List[str],
+                is_valid: Callable = None) -> Tuple[tuple, bytes]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT " + ", ".join(columns + ["content"]) + " FROM "
+                + self.table + " WHERE key = ?", (key,)).fetchone()
+            if row == None or (is_valid != None and not is_valid(row[:-1])):
+                self.misses += 1
+                return None
+            self.connection.execute(
+                "UPDATE " + self.table + " SET last_access = ? WHERE key = ?",
+                (time.time(), key))
+            self.connection.commit()
+            self.hits += 1
+        return row[:-1], zlib.decompress(row[-1])
+
+    ## store the content (one compressed blob per key, the write replaces the
+    # row in one transaction)
+    def put_row(self, key: str, values: dict, content: bytes) -> None:
+        content = zlib.compress(content)
+        columns = ["key"] + list(values.keys()) + ["content", "size",
+                                                   "last_access"]
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO " + self.table + " ("
+                + ", ".join(columns) + ") VALUES ("
+                + ", ".join(["?"] * len(columns)) + ")",
+                [key] + list(values.values())
+                + [content, len(content), time.time()])
+            self.connection.commit()
+            self.size_bytes += len(content)
+            if self.size_bytes > self.max_size_bytes:
+                self._evict()
+
+    ## delete the rows of the condition (i.e. "graph_version != ?")
+    def delete_rows(self, condition: str, parameters: tuple = ()) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM " + self.table + " WHERE "
+                                    + condition, parameters)
+            self.connection.commit()
+            self.size_bytes = self._get_size_bytes()
+
+    ## delete the least recently used rows until the cache is 10% below its
+    # maximum size
+    def _evict(self) -> None:
+        self.size_bytes = self._get_size_bytes()
+        target_size = 0.9 * self.max_size_bytes
+        if self.size_bytes <= self.max_size_bytes:
+            return
+        rows = self.connection.execute(
+            "SELECT key, size FROM " + self.table
+            + " ORDER BY last_access ASC")
+        delete_keys = []
+        for key, size in rows:
+            if self.size_bytes <= target_size:
+                break
+            delete_keys.append((key,))
+            self.size_bytes -= size
+        self.connection.executemany(
+            "DELETE FROM " + self.table + " WHERE key = ?", delete_keys)
+        self.connection.commit()
+
+    def _get_size_bytes(self) -> int:
+        row = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM " + self.table).fetchone()
+        return row[0]
+
+    def get_statistics(self) -> dict:
+        with self.lock:
+            count_entries = self.connection.execute(
+                "SELECT count(*) FROM " + self.table).fetchone()[0]
+            count_requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / count_requests, 4) \
+                    if count_requests > 0 else 0.0,
+                "entries": count_entries,
+                "size_bytes": self.size_bytes,
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM " + self.table)
+            self.connection.commit()
+            self.size_bytes = 0
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,77 @@
+## test the api cache: the results are keyed by the normalized arguments,
+# shared by several connections (workers), invalidated by the graph version
+# and evicted by their last access
+
+from helper.api_cache import Api_Cache
+import logging
+import os
+import tempfile
+import time
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    graph_version = {"value": 1}
+    count_calls = {"value": 0}
+
+    def compute():
+        count_calls["value"] += 1
+        return "score;name\n1.0;" + str(count_calls["value"]) + "\n"
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        path = os.path.join(cache_dir, "api_cache.sqlite")
+        api_cache = Api_Cache(path, get_graph_version=lambda: graph_version["value"],
+                              version_check_seconds=0, logging=logging)
+        ## a second worker with its own connection
+        api_cache_worker = Api_Cache(path, get_graph_version=lambda: graph_version["value"],
+                                     version_check_seconds=0)
+        result = api_cache.get_or_compute(
+            "label_abundance", {"goal_entity_label": "gene", "sort_string": "score"},
+            compute)
+        ## same arguments in another order, served by the other worker
+        assert api_cache_worker.get_or_compute(
+            "label_abundance", {"sort_string": "score", "goal_entity_label": "gene"},
+            compute) == result
+        assert count_calls["value"] == 1
+
+        ## new graph version: the result is computed again
+        graph_version["value"] = 2
+        assert api_cache.get_or_compute(
+            "label_abundance", {"goal_entity_label": "gene", "sort_string": "score"},
+            compute) != result
+        assert count_calls["value"] == 2
+        print(api_cache.get_statistics())
+        assert api_cache.get_statistics()["entries"] == 1
+
+        ## failed results (None, messages) are not cached
+        assert api_cache.get_or_compute("search", {"search_terms": "x"},
+                                        lambda: [{"message": "no result found"}])
+        assert not api_cache.get("search", {"search_terms": "x"}, 2)[0]
+        assert api_cache.get_or_compute("label_abundance", {"x": 1}, lambda: None) == None
+        assert not api_cache.get("label_abundance", {"x": 1}, 2)[0]
+        api_cache.get_or_compute("label_abundance", {"x": 2},
+                                 lambda: "error: wrong goal_entity_operator")
+        assert not api_cache.get("label_abundance", {"x": 2}, 2)[0]
+
+        ## a failed version read keeps the cached results
+        graph_version["value"] = None
+        assert api_cache.get_graph_version() == "2"
+        assert api_cache.get_statistics()["entries"] == 1
+
+        graph_version["value"] = 2
+        ## eviction of the least recently used results
+        api_cache.max_size_bytes = 200
+        for index in range(10):
+            api_cache.put("search", {"search_terms": str(index)}, "x" * 100 + str(index),
+                          graph_version=2)
+            time.sleep(0.01)
+        print(api_cache.get_statistics())
+        assert api_cache.get_statistics()["size_bytes"] <= 200
+        assert api_cache.get("search", {"search_terms": "9"}, 2)[0]
+        assert not api_cache.get("search", {"search_terms": "0"}, 2)[0]
+        api_cache_worker.close()
+        api_cache.close()
+
+
+if __name__ == "__main__":
+    main()
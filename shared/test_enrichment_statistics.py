@@ -0,0 +1,64 @@
+## test the vectorized p-values / q-values of the label abundance against the
+# scalar scipy tests (hypergeometric distribution and Fisher's exact test)
+
+from helper.enrichment_statistics import add_enrichment_statistics, \
+    fisher_two_sided, get_q_values, hypergeometric_tail, sort_label_abundance
+import numpy as np
+import pandas as pd
+from scipy.stats import fisher_exact, hypergeom
+import time
+
+
+def main() -> None:
+    random_state = np.random.RandomState(1)
+    count_entities = 50000
+    N = np.full(count_entities, 1000000.0)
+    K = random_state.randint(10, 20000, count_entities).astype(float)
+    n = np.full(count_entities, 20000.0)
+    k = np.minimum(random_state.binomial(
+        n.astype(int), K / N * random_state.uniform(0.5, 3, count_entities)),
+        K).astype(float)
+    start_time = time.time()
+    p_values = hypergeometric_tail(k, N, K, n)
+    print("p-values of " + str(count_entities) + " entities in "
+          + str(round(time.time() - start_time, 3)) + " seconds")
+    expected = hypergeom.sf(k - 1, N, K, n)
+    assert np.allclose(p_values, expected, rtol=1e-6, atol=1e-12)
+    expected = hypergeom.cdf(k, N, K, n)
+    assert np.allclose(hypergeometric_tail(k, N, K, n, upper=False),
+                       expected, rtol=1e-6, atol=1e-12)
+
+    ## Benjamini-Hochberg: q = min over the larger p-values of p * m / rank
+    p_values = np.array([0.01, 0.04, 0.03, 0.2])
+    assert np.allclose(get_q_values(p_values), [0.04, 0.16 / 3, 0.16 / 3, 0.2])
+
+    ## two subsets: two sided Fisher's exact test of the 2x2 table
+    df_result = pd.DataFrame({"score": [1.0, 2.0, 3.0],
+                              "absolute_mentions": [50, 60, 70],
+                              "absolute_subset_mentions_1": [5, 20, 3],
+                              "absolute_subset_mentions_2": [9, 4, 3]})
+    df_result = add_enrichment_statistics(df_result, 1000, 40, 30)
+    for row in df_result.itertuples():
+        odds_ratio, p_value = fisher_exact(
+            [[row.absolute_subset_mentions_2, 30 - row.absolute_subset_mentions_2],
+             [row.absolute_subset_mentions_1, 40 - row.absolute_subset_mentions_1]])
+        print(row.p_value, p_value)
+        assert np.isclose(row.p_value, p_value, rtol=1e-6, atol=1e-12)
+    ## tables on both sides of the mode, the mode and tables with ties
+    for table in [[[3, 1], [1, 3]], [[0, 10], [10, 0]], [[8, 2], [1, 5]],
+                  [[2, 2], [2, 2]], [[1, 9], [11, 3]], [[0, 5], [0, 7]],
+                  [[120, 880], [80, 920]]]:
+        (k, n_minus_k), (other_k, other_n_minus_k) = table
+        n = k + n_minus_k
+        p_value = fisher_two_sided(k, n + other_k + other_n_minus_k,
+                                   k + other_k, n)[0]
+        print(table, p_value, fisher_exact(table)[1])
+        assert np.isclose(p_value, fisher_exact(table)[1], rtol=1e-6,
+                          atol=1e-12)
+    df_result = sort_label_abundance(df_result, "q_value, score DESC")
+    print(df_result)
+    assert list(df_result["q_value"]) == sorted(df_result["q_value"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+## test the date windows of the esearch harvester with a stubbed esearch
+# (fixed number of records per day): the planned and the fetched windows
+# cover the date range without gaps, every fetched window holds at most
+# MAX_RECORDS_PER_WINDOW records and all pubmed ids are harvested
+
+from helper.esearch_harvester import (
+    DATE_FORMAT,
+    MAX_RECORDS_PER_WINDOW,
+    MIN_DATE,
+    Esearch_Harvester,
+    previous_date,
+    split_into_periods,
+)
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from urllib.parse import parse_qs, urlparse
+import logging
+import os
+import tempfile
+
+
+SEARCH_QUERY = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?" \
+    "db=pubmed&retmode=json&retmax=50000&term=amyotrophic+lateral+sclerosis"
+
+
+## records per day: a few before 2020, 2020 has too many records for one
+# year window, 2021/03 too many for one month window (-> halving)
+def get_count_day(date: datetime) -> int:
+    if date.year == 2021 and date.month == 3:
+        return 500
+    if date.year == 2020:
+        return 40
+    if 2015 <= date.year <= 2019:
+        return 3
+    return 0
+
+
+class Stub_Response:
+    def __init__(self, result_json: dict) -> None:
+        self.result_json = result_json
+
+    def json(self) -> dict:
+        return self.result_json
+
+
+class Stub_Esearch:
+    def __init__(self, count_day_function=get_count_day) -> None:
+        self.count_day_function = count_day_function
+        self.environments = {}
+        ## date windows, which have been fetched (not only probed)
+        self.fetched_windows = []
+
+    def get_ids(self, min_date: str, max_date: str) -> List[str]:
+        pubmed_ids = []
+        date = datetime.strptime(min_date, DATE_FORMAT)
+        end_date = datetime.strptime(max_date, DATE_FORMAT)
+        while date <= end_date:
+            for index in range(self.count_day_function(date)):
+                pubmed_ids.append(date.strftime("%Y%m%d") + str(index).zfill(5))
+            date += timedelta(days=1)
+        return pubmed_ids
+
+    def request(self, url: str) -> Stub_Response:
+        parameters = {key: values[0] for key, values in
+                      parse_qs(urlparse(url).query).items()}
+        if "WebEnv" in parameters:
+            min_date, max_date = self.environments[parameters["WebEnv"]]
+        else:
+            min_date, max_date = parameters["mindate"], parameters["maxdate"]
+        pubmed_ids = self.get_ids(min_date, max_date)
+        retstart = int(parameters["retstart"])
+        retmax = int(parameters["retmax"])
+        ## esearch only returns the first 9999 records
+        if retstart >= MAX_RECORDS_PER_WINDOW:
+            return Stub_Response({"esearchresult": {"ERROR": "retstart"}})
+        result = {"count": str(len(pubmed_ids)), "idlist": pubmed_ids[
+            retstart:min(retstart + retmax, MAX_RECORDS_PER_WINDOW)]}
+        if parameters.get("usehistory") == "y" and "WebEnv" not in parameters:
+            webenv = "webenv_" + str(len(self.environments))
+            self.environments[webenv] = (min_date, max_date)
+            result["webenv"] = webenv
+            result["querykey"] = "1"
+            if len(pubmed_ids) <= MAX_RECORDS_PER_WINDOW:
+                self.fetched_windows.append((min_date, max_date))
+        return Stub_Response({"esearchresult": result})
+
+
+## the windows are sorted, start at min_date, end at max_date and each
+# window starts the day after the previous window
+def assert_no_gaps(windows: List[Tuple[str, str]], min_date: str,
+                   max_date: str) -> None:
+    windows = sorted(windows)
+    assert windows[0][0] == min_date, windows[0]
+    assert windows[-1][1] == max_date, windows[-1]
+    for window, next_window in zip(windows, windows[1:]):
+        assert window[0] <= window[1], window
+        assert previous_date(next_window[0]) == window[1], \
+            "gap or overlap between " + str(window) + " and " + str(next_window)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    today = datetime.now().strftime(DATE_FORMAT)
+
+    ## periods: cut at min_date and max_date, months across the year end
+    assert split_into_periods("2019/02/10", "2021/03/05", "year") == [
+        ("2019/02/10", "2019/12/31"), ("2020/01/01", "2020/12/31"),
+        ("2021/01/01", "2021/03/05")]
+    assert split_into_periods("2020/11/15", "2021/02/03", "month") == [
+        ("2020/11/15", "2020/11/30"), ("2020/12/01", "2020/12/31"),
+        ("2021/01/01", "2021/01/31"), ("2021/02/01", "2021/02/03")]
+
+    with tempfile.TemporaryDirectory() as watermark_dir:
+        watermark_path = os.path.join(watermark_dir, "watermarks.json")
+        stub_esearch = Stub_Esearch()
+        harvester = Esearch_Harvester(stub_esearch.request, watermark_path,
+                                      page_size=1000, logging=logging)
+
+        ## planned windows: no gaps, only single months (2021/03) may hold
+        # more records than one window (they are halved by the harvest)
+        planned_windows = harvester.plan_windows(SEARCH_QUERY, MIN_DATE, today)
+        assert_no_gaps(planned_windows, MIN_DATE, today)
+        for min_date, max_date in planned_windows:
+            count_window = len(stub_esearch.get_ids(min_date, max_date))
+            if count_window > MAX_RECORDS_PER_WINDOW:
+                assert (min_date, max_date) == ("2021/03/01", "2021/03/31"), \
+                    (min_date, max_date, count_window)
+        ## the years of 2020 are planned as months
+        assert ("2020/01/01", "2020/12/31") not in planned_windows
+
+        ## full harvest: the fetched windows cover the range without gaps,
+        # each with at most MAX_RECORDS_PER_WINDOW records
+        pubmed_ids = harvester.harvest(SEARCH_QUERY)
+        assert_no_gaps(stub_esearch.fetched_windows, MIN_DATE, today)
+        for min_date, max_date in stub_esearch.fetched_windows:
+            assert len(stub_esearch.get_ids(min_date, max_date)) \
+                <= MAX_RECORDS_PER_WINDOW, (min_date, max_date)
+        ## 2021/03 is halved
+        assert ("2021/03/01", "2021/03/31") not in stub_esearch.fetched_windows
+        expected_ids = stub_esearch.get_ids(MIN_DATE, today)
+        assert len(expected_ids) > MAX_RECORDS_PER_WINDOW * 3
+        assert sorted(pubmed_ids) == sorted(expected_ids), \
+            str(len(pubmed_ids)) + " != " + str(len(expected_ids))
+        assert harvester.failed_windows == []
+        assert harvester.get_watermark(SEARCH_QUERY) == today
+
+        ## incremental harvest: one window since the watermark
+        stub_esearch.fetched_windows = []
+        assert harvester.harvest(SEARCH_QUERY) == []
+        assert stub_esearch.fetched_windows == [(today, today)]
+        assert harvester.count_requests == 1
+
+        ## a single day with too many records: the first records are
+        # fetched, the window is failed and the watermark is kept
+        os.remove(watermark_path)
+        stub_esearch_day = Stub_Esearch(
+            lambda date: MAX_RECORDS_PER_WINDOW + 100
+            if date.strftime(DATE_FORMAT) == "2022/06/15" else 0)
+        harvester = Esearch_Harvester(stub_esearch_day.request, watermark_path,
+                                      page_size=5000, logging=logging)
+        pubmed_ids = harvester.harvest(SEARCH_QUERY)
+        assert len(pubmed_ids) == MAX_RECORDS_PER_WINDOW
+        assert harvester.failed_windows == [("2022/06/15", "2022/06/15")]
+        assert harvester.get_watermark(SEARCH_QUERY) == None
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+## test the mention matrices with a small in-memory graph: the export reads
+# the graph through a stubbed driver, the label abundance of the matrices is
+# compared with the path counts of the cypher query
+
+from helper.mention_matrix import Mention_Matrix, export_mention_matrices
+import logging
+import random
+import re
+import tempfile
+
+
+class Stub_Record(dict):
+    def values(self):
+        return list(dict.values(self))
+
+
+class Stub_Session:
+    def __init__(self, graph: "Stub_Graph") -> None:
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    ## the queries of export_mention_matrices
+    def run(self, query: str):
+        match = re.match(r"MATCH \((\w):(\w+)\)(-->\((\w):(\w+)\))?", query)
+        label = match.group(2)
+        if match.group(3) != None:
+            end_label = match.group(5)
+            return [Stub_Record(start_id=start_id, end_id=end_id)
+                    for start_id, end_id in self.graph.edges
+                    if self.graph.labels[start_id] == label
+                    and self.graph.labels[end_id] == end_label]
+        properties = re.findall(r"e\.(\w+) AS", query)
+        return [Stub_Record([("db_id" if label != "Article" else "id",
+                              node_id)]
+                            + [(_, self.graph.properties[node_id].get(_))
+                               for _ in properties])
+                for node_id in sorted(self.graph.labels)
+                if self.graph.labels[node_id] == label]
+
+
+class Stub_Graph:
+    def __init__(self, seed: int = 1) -> None:
+        random.seed(seed)
+        self.labels = {}
+        self.properties = {}
+        self.edges = []
+        counts = {"Article": 300, "gene": 40, "disease": 20, "chemical": 10,
+                  "GO_BP": 8}
+        for label, count in counts.items():
+            for index in range(count):
+                node_id = len(self.labels) * 3 + 7
+                self.labels[node_id] = label
+                self.properties[node_id] = {
+                    "name": label + ":" + str(index),
+                    "label": label.lower() + " " + str(index)}
+                ## some chemicals without a label
+                if label == "chemical" and index % 3 == 0:
+                    del self.properties[node_id]["label"]
+        self.driver = self
+        nodes = {label: [node_id for node_id in self.labels
+                         if self.labels[node_id] == label] for label in counts}
+        for article_id in nodes["Article"]:
+            for label in ["gene", "disease", "chemical"]:
+                for _ in range(random.randint(0, 3)):
+                    ## duplicated mentions are possible
+                    self.edges.append((article_id,
+                                       random.choice(nodes[label])))
+        for go_id in nodes["GO_BP"]:
+            for gene_id in random.sample(nodes["gene"], 5):
+                self.edges.append((go_id, gene_id))
+
+    def session(self):
+        return Stub_Session(self)
+
+    def neighbors(self, node_id: int) -> list:
+        return [end_id for start_id, end_id in self.edges
+                if start_id == node_id]
+
+    ## mentions of the entity in the articles like the cypher paths
+    # (entity)-->(:gene)<--(article) or (entity)<--(article)
+    def count_mentions(self, entity_id: int, article_ids: list) -> int:
+        if self.labels[entity_id] == "GO_BP":
+            return sum([self.count_mentions(gene_id, article_ids)
+                        for gene_id in self.neighbors(entity_id)])
+        return sum([self.neighbors(article_id).count(entity_id)
+                    for article_id in article_ids])
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    graph = Stub_Graph()
+    articles = [node_id for node_id in sorted(graph.labels)
+                if graph.labels[node_id] == "Article"]
+    with tempfile.TemporaryDirectory() as matrix_dir:
+        manifest = export_mention_matrices(graph, matrix_dir, graph_version=1,
+                                           logging=logging)
+        assert manifest["count_articles"] == len(articles)
+        mention_matrix = Mention_Matrix(matrix_dir, logging=logging)
+        ## one filter entity (disease:1) and several (disease 1, 10, 11, ...)
+        for attribute, operator, value, matches in [
+                ("name", "=", "Disease:1", lambda name: name == "disease:1"),
+                ("label", "contains", "disease 1",
+                 lambda label: "disease 1" in label)]:
+            disease_ids = [node_id for node_id in graph.labels
+                           if graph.labels[node_id] == "disease" and matches(
+                               graph.properties[node_id][attribute])]
+            ## subset paths (the size of the subset) and the subset articles
+            # (the mentions are counted once per article like
+            # apoc.coll.toSet of the cypher query)
+            subset = [article_id for article_id in articles
+                      for end_id in graph.neighbors(article_id)
+                      if end_id in disease_ids]
+            subset_articles = sorted(set(subset))
+            for goal_entity_label in ["gene", "GO_BP"]:
+                df_result = mention_matrix.get_label_abundance_frame(
+                    goal_entity_label, ["disease"], [attribute], [operator],
+                    [value], goal_entity_min_mentions=0)
+                print(df_result.head())
+                for row in df_result.itertuples():
+                    absolute_mentions = graph.count_mentions(row.db_id,
+                                                             articles)
+                    subset_mentions = graph.count_mentions(row.db_id,
+                                                           subset_articles)
+                    assert row.absolute_mentions == absolute_mentions
+                    assert row.absolute_subset_mentions_1 == subset_mentions
+                    assert row.score == round(
+                        subset_mentions / len(subset)
+                        / (absolute_mentions / len(articles)), 4)
+                assert list(df_result["score"]) == sorted(df_result["score"],
+                                                          reverse=True)
+        ## article filters are answered by cypher
+        assert mention_matrix.get_label_abundance(
+            "gene", ["disease"], ["name"], ["="], ["disease:1"],
+            list_article_attributes=["age_in_days"]) == None
+        ## null semantics like cypher: a comparison with null is not true
+        chemical_ids = [node_id for node_id in graph.labels
+                        if graph.labels[node_id] == "chemical"]
+        for operator, value, matches in [
+                ("<>", "chemical 1", lambda label: label != None
+                 and label != "chemical 1"),
+                ("contains", "none", lambda label: False),
+                ("is null", None, lambda label: label == None),
+                ("IS  NOT NULL", None, lambda label: label != None)]:
+            matching_ids = [node_id for node_id in chemical_ids
+                            if matches(graph.properties[node_id].get("label"))]
+            count_rows = sum([graph.neighbors(article_id).count(node_id)
+                              for article_id in articles
+                              for node_id in matching_ids])
+            build = mention_matrix.load()
+            rows, count_subset = build.get_subset(["chemical"], ["label"],
+                                                  [operator], [value])
+            assert count_subset == count_rows, (operator, count_subset,
+                                                count_rows)
+        print(mention_matrix.get_label_abundance(
+            "disease", ["gene"], ["label"], ["contains"], ["gene 1"],
+            ["chemical"], ["name"], ["starts with"], ["chemical"],
+            goal_entity_min_mentions=0)[:300])
+
+
+if __name__ == "__main__":
+    main()
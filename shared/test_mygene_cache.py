@@ -0,0 +1,61 @@
+## test the mygene cache with a stubbed mygene client: new genes are queried
+# in batches, known genes are served from the cache and stale genes are
+# refreshed in the background
+
+from helper.mygene_cache import Mygene_Cache
+import logging
+import os
+import tempfile
+import time
+
+
+class Stub_Mygene_Client:
+    def __init__(self) -> None:
+        self.queried_ids = []
+        self.count_calls = 0
+
+    def querymany(self, ids, scopes=None, fields=None, returnall=False):
+        self.count_calls += 1
+        self.queried_ids.extend(ids)
+        documents = []
+        for entrez_id in ids:
+            if entrez_id == "0":
+                documents.append({"query": entrez_id, "notfound": True})
+            else:
+                documents.append({"query": entrez_id, "_id": entrez_id,
+                                  "entrezgene": int(entrez_id),
+                                  "symbol": "GENE" + entrez_id,
+                                  "fetched": time.time()})
+        return {"out": documents, "missing": [], "dup": []}
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = Stub_Mygene_Client()
+        mygene_cache = Mygene_Cache(os.path.join(cache_dir, "mygene.sqlite"),
+                                    client, max_age_seconds=3600,
+                                    batch_size=2, logging=logging)
+        ## first run: all genes are queried (in batches of 2)
+        documents = mygene_cache.get_documents(["1017", "5468", "0"])
+        print([document.get("symbol") for document in documents])
+        assert client.count_calls == 2
+
+        ## second run: only the new gene is queried
+        documents = mygene_cache.get_documents(["1017", "5468", "0", "7157"])
+        print(client.queried_ids)
+        assert client.queried_ids == ["1017", "5468", "0", "7157"]
+        assert len(documents) == 4
+
+        ## nothing is stale yet, then all entries are stale
+        assert mygene_cache.get_stale_ids() == []
+        mygene_cache.max_age_seconds = 0
+        mygene_cache.start_background_refresh()
+        mygene_cache.refresh_thread.join()
+        print(mygene_cache.get_statistics())
+        assert mygene_cache.get_statistics()["refreshed"] == 4
+        mygene_cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+## test (and benchmark) the set based pubtator parser against the former
+# string based parser on pubtator exports, which are built from the
+# checked-in BioC response (pubtator_response.xml), and the iterparse based
+# BioC parser against the former bioc.load based parser
+
+from helper.pubtator_parser import (
+    get_bioc_annotation_string,
+    iter_bioc_annotations,
+    parse_pubtator_text,
+)
+import bioc
+import io
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+from typing import List
+
+
+## former (string based) parser of the pubtator export, reference for the
+# results and the runtime of the set based parser
+def parse_pubtator_text_string_based(
+    pubtator_text: str, bioconcepts_list: List[str]
+) -> dict:
+    pubtator_meta = {}
+    pubtator_text_split = pubtator_text.split("\n\n")[:-1]
+    for entry in pubtator_text_split:
+        concept_annotation = ""
+        annotations_all = ""
+        entry_meta = {}
+        for index, text in enumerate(entry.split("\n")):
+            if index > 1:
+                break
+            else:
+                if index == 0:
+                    if len(text.split("|")) == 3:
+                        pubmed_id_pubtator = text.split("|")[0]
+                        title_pubtator = text.split("|")[2]
+                    else:
+                        logging.info("error: not the pubtator format")
+                        logging.info(text)
+                else:
+                    if len(text.split("|")) == 3:
+                        abstract_pubtator = text.split("|")[2]
+                    else:
+                        logging.info("error: not the pubtator format")
+                        logging.info(text)
+        entry_meta["title"] = title_pubtator
+        entry_meta["abstract"] = abstract_pubtator
+
+        for bioconcept in bioconcepts_list:
+            annotations_pubtator = "Null"
+            for index, text in enumerate(entry.split("\n")):
+                if index <= 1:
+                    ## title and abstract -> skip
+                    pass
+
+                else:
+                    if len(text.split("\t")) > 3:
+                        annotation = text.split("\t")[3]
+                        concept = text.split("\t")[4]
+                        ## only treat the current bioconcept
+                        # (we need to process the concepts in
+                        # correct order)
+                        if concept.lower() == bioconcept.lower():
+                            normalized_annotation = text.split("\t")[5]
+                            concept_annotation = (
+                                concept
+                                + ":"
+                                + normalized_annotation
+                                + ";"
+                                + annotation
+                            )
+                            if annotations_pubtator.endswith(concept_annotation):
+                                continue
+                            else:
+                                if concept_annotation + "," in annotations_pubtator:
+                                    # skip if the annotation is
+                                    # already part of the annotation
+                                    # (we are only interested in unique annotations)
+                                    continue
+                                else:
+                                    annotations_pubtator = ",".join(
+                                        [
+                                            annotations_pubtator,
+                                            concept_annotation,
+                                        ]
+                                    )
+                        else:
+                            continue
+            ## if there is more than just "Null"
+            if len(annotations_pubtator) > 4:
+                annotations_pubtator = annotations_pubtator[5:]
+            annotations_all = "|".join([annotations_all, annotations_pubtator])
+        if len(annotations_all) > 0:
+            annotations_all = annotations_all[1:]
+        entry_meta["annotations"] = annotations_all
+        pubtator_meta[pubmed_id_pubtator] = entry_meta
+    return pubtator_meta
+
+
+## build a pubtator export (pubtator format) with count_articles articles,
+# each with the passages and annotations of the BioC response
+def get_pubtator_text(bioc_text: str, count_articles: int) -> str:
+    root = ET.fromstring(bioc_text)
+    passages = [passage.findtext("text") or ""
+                for passage in root.iter("passage")]
+    title = passages[0].replace("|", ";").replace("\n", " ")
+    abstract = " ".join(passages[1:3]).replace("|", ";").replace("\n", " ")
+    annotations = list(iter_bioc_annotations(bioc_text))
+    pubtator_text = ""
+    for index in range(count_articles):
+        pubmed_id = str(30000000 + index)
+        pubtator_text += pubmed_id + "|t|" + title + "\n"
+        pubtator_text += pubmed_id + "|a|" + abstract + "\n"
+        for ner_type, ner_identifier, ner_text in annotations:
+            pubtator_text += "\t".join([pubmed_id, "0", "0", str(ner_text),
+                                        ner_type, ner_identifier]) + "\n"
+        pubtator_text += "\n"
+    return pubtator_text
+
+
+## former (bioc.load based) parser of the full texts, reference for the
+# annotation strings of the iterparse based parser
+def get_bioc_annotation_string_bioc_based(
+    bioc_text: str, bioconcepts_list: List[str]
+) -> str:
+    ner_dict = {}
+    collection = bioc.load(io.BytesIO(bioc_text.encode("utf-8")))
+    for document in collection.documents:
+        for passage in document.passages:
+            for annotation in passage.annotations:
+                ner_type = "Null"
+                ner_identifier = "Null"
+                if "type" in annotation.infons:
+                    ner_type = annotation.infons["type"]
+                if "identifier" in annotation.infons:
+                    ner_identifier = annotation.infons["identifier"]
+                ner_text = (
+                    str(ner_type) + ":" + str(ner_identifier) + ";"
+                    + str(annotation.text)
+                )
+                if ner_type.lower() in ner_dict:
+                    if ner_identifier:
+                        if (ner_identifier != "Null") and not (
+                            ner_identifier in ner_dict[ner_type.lower()]
+                        ):
+                            ner_dict[ner_type.lower()] += "," + ner_text
+                else:
+                    ner_dict[ner_type.lower()] = ner_text
+    if len(ner_dict) == 0:
+        return None
+    return "|".join([ner_dict[bioconcept] if bioconcept in ner_dict
+                     else "Null" for bioconcept in bioconcepts_list])
+
+
+## small BioC fixture: a passage annotation without identifier, mentions
+# without a normalized identifier ("-"), a repeated identifier and an
+# annotation outside of a passage (which is ignored)
+BIOC_FIXTURE = """<?xml version='1.0' encoding='UTF-8'?>
+<collection><source>PubTator</source><date></date><key>BioC.key</key>
+<document><id>1</id>
+<passage><offset>0</offset><text>SOD1 and ALS</text>
+<annotation id="1"><infon key="identifier">6647</infon>
+<infon key="type">Gene</infon><text>SOD1</text></annotation>
+<annotation id="2"><infon key="identifier">MESH:D000690</infon>
+<infon key="type">Disease</infon><text>ALS</text></annotation>
+<annotation id="3"><infon key="identifier">-</infon>
+<infon key="type">Disease</infon><text>motor weakness</text></annotation>
+</passage>
+<passage><offset>13</offset><text>SOD1, TDP-43 and ALS</text>
+<annotation id="4"><infon key="identifier">6647</infon>
+<infon key="type">Gene</infon><text>SOD1</text></annotation>
+<annotation id="5"><infon key="identifier">23435</infon>
+<infon key="type">Gene</infon><text>TDP-43</text></annotation>
+<annotation id="6"><infon key="type">Chemical</infon>
+<text>riluzole</text></annotation>
+</passage>
+<annotation id="7"><infon key="identifier">9606</infon>
+<infon key="type">Species</infon><text>human</text></annotation>
+</document></collection>
+"""
+
+
+def test_bioc_parser(bioc_text: str, bioconcepts_list: List[str]) -> None:
+    ## the checked-in full text: identical to the bioc.load based parser
+    assert get_bioc_annotation_string(bioc_text, bioconcepts_list) \
+        == get_bioc_annotation_string_bioc_based(bioc_text, bioconcepts_list), \
+        "the iterparse based parser differs from the bioc.load based parser"
+
+    assert list(iter_bioc_annotations(BIOC_FIXTURE)) == [
+        ("Gene", "6647", "SOD1"),
+        ("Disease", "MESH:D000690", "ALS"),
+        ("Disease", "-", "motor weakness"),
+        ("Gene", "6647", "SOD1"),
+        ("Gene", "23435", "TDP-43"),
+        ("Chemical", "Null", "riluzole"),
+    ]
+    assert get_bioc_annotation_string(BIOC_FIXTURE, bioconcepts_list) \
+        == "Gene:6647;SOD1,Gene:23435;TDP-43|Disease:MESH:D000690;ALS" \
+        "|Chemical:Null;riluzole|Null|Null|Null"
+    ## the only difference to the bioc.load based parser: further mentions
+    # without a normalized identifier ("-") are skipped like "Null"
+    assert get_bioc_annotation_string_bioc_based(
+        BIOC_FIXTURE, bioconcepts_list) \
+        == "Gene:6647;SOD1,Gene:23435;TDP-43|Disease:MESH:D000690;ALS," \
+        "Disease:-;motor weakness|Chemical:Null;riluzole|Null|Null|Null"
+    ## no annotations or invalid XML -> None
+    assert get_bioc_annotation_string(
+        "<collection><document><passage><text>ALS</text></passage>"
+        "</document></collection>", bioconcepts_list) == None
+    assert get_bioc_annotation_string("<collection><document>",
+                                      bioconcepts_list) == None
+    print("BioC parser: OK")
+
+
+# Defining main function
+def main():
+    bioconcepts_list = ['gene', 'disease', 'chemical', 'species', 'mutation',
+                        'cellline']
+    fixture_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "pubtator_response.xml")
+    with open(fixture_path, "r") as f:
+        bioc_text = f.read()
+
+    test_bioc_parser(bioc_text, bioconcepts_list)
+
+    for count_articles in [1, 10, 100]:
+        pubtator_text = get_pubtator_text(bioc_text, count_articles)
+
+        start_time = time.time()
+        result_string_based = parse_pubtator_text_string_based(
+            pubtator_text, bioconcepts_list)
+        time_string_based = time.time() - start_time
+
+        start_time = time.time()
+        result_set_based = parse_pubtator_text(pubtator_text, bioconcepts_list)
+        time_set_based = time.time() - start_time
+
+        assert result_string_based == result_set_based, \
+            "the set based parser differs from the string based parser"
+        print(str(count_articles) + " articles: string based = "
+              + str(round(time_string_based, 4)) + " s, set based = "
+              + str(round(time_set_based, 4)) + " s, speedup = "
+              + str(round(time_string_based / max(time_set_based, 1e-9), 1)))
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
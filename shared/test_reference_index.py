@@ -0,0 +1,156 @@
+## test the local MeSH and taxonomy indices offline: small fixture files in
+# the official formats (MeSH XML, names.dmp / nodes.dmp) are indexed and
+# looked up
+
+from helper.reference_index import MeSH_Index, Taxonomy_Index
+import logging
+import os
+import tempfile
+
+
+MESH_DESCRIPTOR_XML = """<?xml version="1.0"?>
+<DescriptorRecordSet>
+<DescriptorRecord DescriptorClass="1">
+  <DescriptorUI>D000077236</DescriptorUI>
+  <DescriptorName><String>Riluzole</String></DescriptorName>
+  <PharmacologicalActionList>
+    <PharmacologicalAction><DescriptorReferredTo>
+      <DescriptorUI>D018696</DescriptorUI>
+      <DescriptorName><String>Neuroprotective Agents</String></DescriptorName>
+    </DescriptorReferredTo></PharmacologicalAction>
+    <PharmacologicalAction><DescriptorReferredTo>
+      <DescriptorUI>D018691</DescriptorUI>
+      <DescriptorName><String>Excitatory Amino Acid Antagonists</String></DescriptorName>
+    </DescriptorReferredTo></PharmacologicalAction>
+  </PharmacologicalActionList>
+  <PreviousIndexingList>
+    <PreviousIndexing>Thiazoles (1991-2017)</PreviousIndexing>
+  </PreviousIndexingList>
+  <ConceptList>
+    <Concept PreferredConceptYN="Y">
+      <ScopeNote>A glutamate antagonist used as an anticonvulsant.</ScopeNote>
+      <TermList>
+        <Term><String>Riluzole</String></Term>
+        <Term><String>Rilutek</String></Term>
+      </TermList>
+    </Concept>
+    <Concept PreferredConceptYN="N">
+      <TermList><Term><String>2-Amino-6-trifluoromethoxybenzothiazole</String></Term></TermList>
+    </Concept>
+  </ConceptList>
+</DescriptorRecord>
+</DescriptorRecordSet>
+"""
+
+MESH_SUPPLEMENTARY_XML = """<?xml version="1.0"?>
+<SupplementalRecordSet>
+<SupplementalRecord SCRClass="1">
+  <SupplementalRecordUI>C000002</SupplementalRecordUI>
+  <SupplementalRecordName><String>bevonium</String></SupplementalRecordName>
+  <Note>structure given in first source</Note>
+  <SourceList><Source>Int J Clin Pharmacol 1975</Source></SourceList>
+  <ConceptList>
+    <Concept PreferredConceptYN="Y">
+      <TermList>
+        <Term><String>bevonium</String></Term>
+        <Term><String>bevonium methyl sulfate</String></Term>
+      </TermList>
+    </Concept>
+  </ConceptList>
+</SupplementalRecord>
+</SupplementalRecordSet>
+"""
+
+TAXONOMY_NAMES_DMP = """1\t|\tall\t|\t\t|\tsynonym\t|
+1\t|\troot\t|\t\t|\tscientific name\t|
+9443\t|\tPrimates\t|\t\t|\tscientific name\t|
+9443\t|\tprimates\t|\t\t|\tblast name\t|
+9605\t|\tHomo\t|\t\t|\tscientific name\t|
+9606\t|\tHomo sapiens\t|\t\t|\tscientific name\t|
+9606\t|\thuman\t|\t\t|\tgenbank common name\t|
+9606\t|\thuman\t|\t\t|\tcommon name\t|
+"""
+
+TAXONOMY_NODES_DMP = """1\t|\t1\t|\tno rank\t|
+9443\t|\t1\t|\torder\t|
+9605\t|\t9443\t|\tgenus\t|
+9606\t|\t9605\t|\tspecies\t|
+"""
+
+
+## 9607 has been merged into 9606
+TAXONOMY_MERGED_DMP = """9607\t|\t9606\t|
+"""
+
+
+def write_file(path: str, content: str) -> str:
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        mesh_paths = [
+            write_file(os.path.join(fixture_dir, "desc.xml"), MESH_DESCRIPTOR_XML),
+            write_file(os.path.join(fixture_dir, "supp.xml"), MESH_SUPPLEMENTARY_XML),
+        ]
+        mesh_index = MeSH_Index(
+            os.path.join(fixture_dir, "mesh_index.sqlite"), mesh_paths, logging=logging
+        )
+        mesh_attributes = mesh_index.get_attributes(["D000077236", "C000002", "D999"])
+        for mesh_ui, attributes in mesh_attributes.items():
+            print(mesh_ui, attributes)
+        assert set(mesh_attributes.keys()) == {"D000077236", "C000002"}
+        assert mesh_attributes["D000077236"]["pharmacological_actions"] == (
+            "Neuroprotective Agents, Excitatory Amino Acid Antagonists"
+        )
+        assert mesh_attributes["C000002"]["entry_terms"] == "bevonium methyl sulfate"
+        mesh_index.close()
+
+        taxonomy_paths = [
+            write_file(os.path.join(fixture_dir, "names.dmp"), TAXONOMY_NAMES_DMP),
+            write_file(os.path.join(fixture_dir, "nodes.dmp"), TAXONOMY_NODES_DMP),
+        ]
+        taxonomy_index = Taxonomy_Index(
+            os.path.join(fixture_dir, "taxonomy_index.sqlite"),
+            taxonomy_paths,
+            logging=logging,
+        )
+        taxonomy_attributes = taxonomy_index.get_attributes(["9606", "12345"])
+        print(taxonomy_attributes)
+        assert taxonomy_attributes == {
+            9606: {
+                "current_name": "Homo sapiens",
+                "common_name": "human",
+                "blast_name": "primates",
+            }
+        }
+        taxonomy_index.close()
+
+        ## the second index is loaded from the SQLite file (no rebuild)
+        taxonomy_index = Taxonomy_Index(
+            os.path.join(fixture_dir, "taxonomy_index.sqlite"),
+            taxonomy_paths,
+            logging=logging,
+        )
+        print(taxonomy_index.get_attributes([9605]))
+        taxonomy_index.close()
+
+        ## merged taxa: the old tax id gets the names of the current taxon
+        taxonomy_index = Taxonomy_Index(
+            os.path.join(fixture_dir, "taxonomy_index.sqlite"),
+            taxonomy_paths
+            + [write_file(os.path.join(fixture_dir, "merged.dmp"), TAXONOMY_MERGED_DMP)],
+            logging=logging,
+        )
+        taxonomy_attributes = taxonomy_index.get_attributes([9607, 9606])
+        print(taxonomy_attributes)
+        assert taxonomy_attributes[9607] == taxonomy_attributes[9606]
+        assert taxonomy_attributes[9607]["current_name"] == "Homo sapiens"
+        taxonomy_index.close()
+
+
+if __name__ == "__main__":
+    main()